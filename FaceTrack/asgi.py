@@ -3,6 +3,10 @@ ASGI config for FaceTrack project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+HTTP requests are served by Django; WebSocket connections (facial
+recognition frame stream) are handled by ``school.recognition.websocket``.
+Run with an ASGI server, e.g. ``uvicorn FaceTrack.asgi:application``.
+
 For more information on this file, see
 https://docs.djangoproject.com/en/4.2/howto/deployment/asgi/
 """
@@ -13,4 +17,13 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'FaceTrack.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+from school.recognition.websocket import websocket_application  # noqa: E402  (après django.setup())
+
+
+async def application(scope, receive, send):
+    if scope['type'] == 'websocket':
+        await websocket_application(scope, receive, send)
+    else:
+        await django_application(scope, receive, send)
@@ -82,6 +82,24 @@ DATABASES = {
 }
 
 
+# Cache
+# Partagé par tous les processus (serveurs web, dispatch_emails) : listes
+# d'appel, versions des empreintes faciales et du flux des présences.
+# Table créée par la migration school 0008 (ou « manage.py createcachetable »).
+# Chaque processus garde en plus les listes d'appel et les empreintes faciales
+# qu'il a lues, et ne relit leur version qu'au plus une fois par seconde (un
+# scan ne lit donc pas le cache). En production, Redis évite une requête SQL
+# par lecture restante :
+# 'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': 'redis://127.0.0.1:6379'
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': 'facetrack_cache',
+    }
+}
+
+
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
 
@@ -138,6 +156,14 @@ AUTH_USER_MODEL = 'school.User'
 # Login URL
 LOGIN_URL = '/login/'
 
+# Reconnaissance faciale (voir school/recognition/config.py pour les valeurs par défaut)
+FACIAL_RECOGNITION = {
+    'DETECTION_WIDTH': 640,
+    'EMBEDDING_BACKEND': 'auto',
+    # Processus d'analyse d'images (fork après chargement du modèle)
+    'WORKERS': 2,
+}
+
 # Email Configuration
 EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
 EMAIL_HOST = 'smtp.gmail.com'  # Ou votre serveur SMTP
@@ -147,6 +173,17 @@ EMAIL_HOST_USER = 'lionelbieko@gmail.com'  # À configurer
 EMAIL_HOST_PASSWORD = 'kjgt xmfq znvg goet'  # À configurer
 DEFAULT_FROM_EMAIL = 'FaceTrack <lionelbieko@gmail.com>'
 
+# File d'envoi des emails aux parents, traitée par `python manage.py dispatch_emails`
+# (voir school/outbox.py pour les valeurs par défaut)
+EMAIL_OUTBOX = {
+    # Emails envoyés par seconde au maximum
+    'RATE_LIMIT': 5,
+    'MAX_ATTEMPTS': 5,
+    # Récapitulatif envoyé au plus tard 10 minutes après le premier changement de statut
+    'DIGEST_DELAY': 600,
+    'DAILY_DIGEST_TIME': '18:00',
+}
+
 # Configuration pour développement (console)
 if DEBUG:
     EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
@@ -10,7 +10,6 @@ import django
 from datetime import date, timedelta
 import random
 from faker import Faker
-import qrcode
 
 # Configuration Django
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'FaceTrack.settings')
@@ -18,6 +17,7 @@ django.setup()
 
 from django.contrib.auth.hashers import make_password
 from school.models import User, Classe, Eleve, Parent, Enseignant, Matiere
+from django.core.management import call_command
 from django.db import transaction
 from django.conf import settings
 
@@ -63,38 +63,6 @@ def create_user_with_role(username, email, password, role, first_name, last_name
         print(f"Erreur lors de la création de l'utilisateur {username}: {e}")
         return None
 
-def generate_qr_code_for_student(matricule, nom_eleve):
-    """Génère et sauvegarde le QR code pour un élève"""
-    try:
-        # Créer le QR code
-        qr = qrcode.QRCode(
-            version=1,
-            error_correction=qrcode.constants.ERROR_CORRECT_L,
-            box_size=10,
-            border=4,
-        )
-        qr.add_data(matricule)
-        qr.make(fit=True)
-        
-        # Créer l'image
-        img = qr.make_image(fill_color="black", back_color="white")
-        
-        # Créer le dossier s'il n'existe pas
-        qr_dir = os.path.join(settings.MEDIA_ROOT, 'qr_codes_eleves')
-        os.makedirs(qr_dir, exist_ok=True)
-        
-        # Nom du fichier avec le nom de l'élève pour plus de clarté
-        qr_filename = f"QR_{matricule}_{nom_eleve.replace(' ', '_')}.png"
-        file_path = os.path.join(qr_dir, qr_filename)
-        
-        # Sauvegarder l'image
-        img.save(file_path, format='PNG')
-        
-        return qr_filename
-    except Exception as e:
-        print(f"    ⚠️  Erreur lors de la génération du QR code: {e}")
-        return None
-
 def create_eleve_with_parent_and_qr(classe, numero):
     """Crée un élève, son parent et génère son QR code"""
     
@@ -163,16 +131,7 @@ def create_eleve_with_parent_and_qr(classe, numero):
             classe=classe,
             parent=parent
         )
-        
-        # Générer le QR code pour cet élève
-        nom_complet = f"{prenom_eleve}_{nom_famille}"
-        qr_filename = generate_qr_code_for_student(eleve.matricule, nom_complet)
-        
-        if qr_filename:
-            print(f"    🎯 QR code généré: {qr_filename}")
-        else:
-            print(f"    ⚠️  QR code non généré")
-            
+
     except Exception as e:
         print(f"Erreur lors de la création de l'élève {username_eleve}: {e}")
         eleve_user.delete()
@@ -278,6 +237,10 @@ def main():
             
             print(f"  📊 Classe {classe.nom}: {eleves_classe} élèves, {parents_classe} parents, {qr_codes_classe} QR codes")
     
+    # Cartes QR de tous les élèves (rendu en parallèle, PDF imprimable par classe)
+    print("\n🎫 Génération des cartes QR...")
+    call_command('generate_qr_cards')
+    
     # Résumé final
     print("\n" + "=" * 70)
     print("🎉 CRÉATION TERMINÉE !")
@@ -294,8 +257,8 @@ def main():
     print("  • Parents: username = parent_nom_prenom_numero, password = parent123")
     print("  • Enseignants: username = enseignant_nom_prenom, password = enseignant123")
     
-    print(f"\n📁 QR codes sauvegardés dans: {os.path.join(settings.MEDIA_ROOT, 'qr_codes_eleves')}")
-    print(f"🔗 URL d'accès: /media/qr_codes_eleves/")
+    print(f"\n📁 Cartes QR sauvegardées dans: {os.path.join(settings.MEDIA_ROOT, 'qr_codes_eleves')}")
+    print(f"🔗 URL d'accès: /media/qr_codes_eleves/<classe>/cartes_<classe>.pdf")
     
     print("\n⚠️  ATTENTION: Changez ces mots de passe en production !")
 
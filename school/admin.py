@@ -2,7 +2,7 @@
 from django.contrib import admin
 from .models import (
     User, Classe, Matiere, Parent, Enseignant, Eleve,
-    Cours, Presence, Notification
+    Cours, Presence, Notification, PhotoReference, EmailSortant
 )
 from django.shortcuts import redirect
 
@@ -38,7 +38,8 @@ class MatiereAdmin(admin.ModelAdmin):
 # ============================
 @admin.register(Parent)
 class ParentAdmin(admin.ModelAdmin):
-    list_display = ("user",)
+    list_display = ("user", "recap_quotidien")
+    list_filter = ("recap_quotidien",)
     search_fields = ("user__username", "user__first_name", "user__last_name")
 
 
@@ -55,6 +56,14 @@ class EleveAdmin(admin.ModelAdmin):
     search_fields = ("user__first_name", "user__last_name")
 
 
+@admin.register(PhotoReference)
+class PhotoReferenceAdmin(admin.ModelAdmin):
+    list_display = ("eleve", "qualite", "active", "date_ajout")
+    list_filter = ("active",)
+    search_fields = ("eleve__user__first_name", "eleve__user__last_name", "eleve__matricule")
+    readonly_fields = ("qualite",)  # calculée à l'enregistrement de la photo
+
+
 # ============================
 # COURS & PRESENCE
 # ============================
@@ -79,6 +88,13 @@ class NotificationAdmin(admin.ModelAdmin):
     search_fields = ()
 
 
+@admin.register(EmailSortant)
+class EmailSortantAdmin(admin.ModelAdmin):
+    list_display = ("id", "type_email", "destinataire", "statut", "tentatives", "prochain_essai", "date_envoi")
+    list_filter = ("statut", "type_email")
+    search_fields = ("destinataire",)
+
+
 # Supprime ou adapte la vue suivante si inutile
 def some_view(request):
     if request.user.is_authenticated:
@@ -1,174 +1,378 @@
-from django.core.mail import send_mail
-from django.template.loader import render_to_string
-from django.utils.html import strip_tags
+from django.core.mail import EmailMultiAlternatives
+from django.template.loader import get_template
 from django.conf import settings
 from django.utils import timezone
 from .models import Eleve, Parent, Presence, Cours, SessionAppel
+import functools
 import logging
 
 logger = logging.getLogger(__name__)
 
+
+@functools.lru_cache(maxsize=None)
+def _compiled_template(name):
+    return get_template(name)
+
+
+def _template(name):
+    """Template compilé, chargé une seule fois par processus"""
+    if settings.DEBUG:
+        # Modifications des templates prises en compte sans redémarrage
+        return get_template(name)
+    return _compiled_template(name)
+
+
 class ParentNotificationService:
     """
     Service pour envoyer des notifications par email aux parents
+    
+    Les méthodes build_* construisent le message d'une présence sans l'envoyer
+    (utilisées par la file d'envoi, voir school/outbox.py) ; les méthodes
+    send_* l'envoient immédiatement. Les récapitulatifs d'un lot sont
+    construits à partir de présences chargées en une requête
+    (recap_presences_by_session, recap_presences_by_day).
+    
+    Chaque email a une version HTML (emails/<nom>.html) et une version texte
+    (emails/<nom>.txt).
     """
     
+    # Relations chargées avec une présence pour construire ses emails
+    PRESENCE_RELATED = (
+        'eleve__user',
+        'eleve__parent__user',
+        'eleve__classe',
+        'session_appel__cours__matiere',
+        'session_appel__cours__classe',
+        'session_appel__cours__enseignant__user'
+    )
+    
+    # Relations chargées avec les présences d'un récapitulatif
+    RECAP_RELATED = (
+        'eleve__user',
+        'session_appel__cours__matiere',
+        'session_appel__cours__classe',
+    )
+    
     @staticmethod
-    def send_presence_confirmation_email(presence_id):
+    def _base_context(presence):
+        """Contexte commun aux emails d'une présence"""
+        eleve = presence.eleve
+        parent = presence.eleve.parent
+        cours = presence.session_appel.cours
+        enseignant = presence.session_appel.cours.enseignant
+        return {
+            'eleve_nom': eleve.user.get_full_name(),
+            'parent_nom': parent.user.get_full_name(),
+            'cours_matiere': cours.matiere.nom,
+            'cours_classe': cours.classe.nom,
+            'cours_date': cours.date.strftime('%d/%m/%Y'),
+            'cours_heure': f"{cours.heure_debut.strftime('%H:%M')} - {cours.heure_fin.strftime('%H:%M')}",
+            'cours_salle': cours.salle,
+            'enseignant_nom': enseignant.user.get_full_name(),
+            'ecole_nom': 'FaceTrack École',
+            'ecole_email': settings.DEFAULT_FROM_EMAIL,
+        }
+    
+    @staticmethod
+    def _message(parent, subject, template, context):
+        """Email HTML (avec sa version texte) adressé à un parent"""
+        html_message = _template(f'{template}.html').render(context)
+        plain_message = _template(f'{template}.txt').render(context)
+        
+        message = EmailMultiAlternatives(
+            subject=subject,
+            body=plain_message,
+            from_email=settings.DEFAULT_FROM_EMAIL,
+            to=[parent.user.email],
+        )
+        message.attach_alternative(html_message, 'text/html')
+        return message
+    
+    @staticmethod
+    def build_presence_confirmation_email(presence):
         """
-        Envoie un email de confirmation de présence au parent de l'élève
+        Construit l'email de confirmation de présence
         
         Args:
-            presence_id: ID de l'objet Presence
+            presence: Presence (relations PRESENCE_RELATED chargées)
+        
+        Returns:
+            EmailMultiAlternatives, ou None si l'élève n'a pas de parent
         """
-        try:
-            # Récupérer la présence avec toutes les informations nécessaires
-            presence = Presence.objects.select_related(
-                'eleve__user',
-                'eleve__parent__user',
-                'eleve__classe',
-                'session_appel__cours__matiere',
-                'session_appel__cours__enseignant__user'
-            ).get(id=presence_id)
-            
-            # Vérifier que l'élève a un parent
-            if not presence.eleve.parent:
-                logger.warning(f"L'élève {presence.eleve.user.get_full_name()} n'a pas de parent associé")
-                return False
-            
-            # Informations de base
-            eleve = presence.eleve
-            parent = presence.eleve.parent
+        if not presence.eleve.parent:
+            logger.warning(f"L'élève {presence.eleve.user.get_full_name()} n'a pas de parent associé")
+            return None
+        
+        eleve = presence.eleve
+        cours = presence.session_appel.cours
+        
+        # Préparer le contexte pour le template
+        context = ParentNotificationService._base_context(presence)
+        context.update({
+            'presence_heure': presence.heure_arrivee.strftime('%H:%M') if presence.heure_arrivee else None,
+            'presence_methode': presence.get_methode_detection_display(),
+            'confirmation_date': timezone.now().strftime('%d/%m/%Y à %H:%M'),
+        })
+        
+        # Sujet de l'email
+        subject = f"✅ Présence confirmée - {eleve.user.first_name} {eleve.user.last_name} - {cours.matiere.nom}"
+        return ParentNotificationService._message(presence.eleve.parent, subject, 'emails/presence_confirmation', context)
+    
+    @staticmethod
+    def build_absence_notification_email(presence):
+        """
+        Construit l'email de notification d'absence
+        
+        Args:
+            presence: Presence (relations PRESENCE_RELATED chargées)
+        
+        Returns:
+            EmailMultiAlternatives, ou None si l'élève n'a pas de parent
+        """
+        if not presence.eleve.parent:
+            logger.warning(f"L'élève {presence.eleve.user.get_full_name()} n'a pas de parent associé")
+            return None
+        
+        eleve = presence.eleve
+        cours = presence.session_appel.cours
+        
+        # Préparer le contexte pour le template
+        context = ParentNotificationService._base_context(presence)
+        context.update({
+            'notification_date': timezone.now().strftime('%d/%m/%Y à %H:%M'),
+        })
+        
+        # Sujet de l'email
+        subject = f"⚠️ Absence signalée - {eleve.user.first_name} {eleve.user.last_name} - {cours.matiere.nom}"
+        return ParentNotificationService._message(presence.eleve.parent, subject, 'emails/absence_notification', context)
+    
+    @staticmethod
+    def build_retard_notification_email(presence):
+        """
+        Construit l'email de notification de retard
+        
+        Args:
+            presence: Presence (relations PRESENCE_RELATED chargées)
+        
+        Returns:
+            EmailMultiAlternatives, ou None si l'élève n'a pas de parent
+        """
+        if not presence.eleve.parent:
+            logger.warning(f"L'élève {presence.eleve.user.get_full_name()} n'a pas de parent associé")
+            return None
+        
+        eleve = presence.eleve
+        cours = presence.session_appel.cours
+        
+        # Calculer le retard
+        retard_minutes = None
+        if presence.heure_arrivee and cours.heure_debut:
+            from datetime import datetime
+            heure_debut = datetime.combine(cours.date, cours.heure_debut)
+            heure_arrivee = datetime.combine(cours.date, presence.heure_arrivee)
+            retard_minutes = int((heure_arrivee - heure_debut).total_seconds() / 60)
+        
+        # Préparer le contexte pour le template
+        context = ParentNotificationService._base_context(presence)
+        context.update({
+            'presence_heure': presence.heure_arrivee.strftime('%H:%M') if presence.heure_arrivee else None,
+            'retard_minutes': retard_minutes,
+            'notification_date': timezone.now().strftime('%d/%m/%Y à %H:%M'),
+        })
+        
+        # Sujet de l'email
+        subject = f"⏰ Retard signalé - {eleve.user.first_name} {eleve.user.last_name} - {cours.matiere.nom}"
+        return ParentNotificationService._message(presence.eleve.parent, subject, 'emails/retard_notification', context)
+    
+    @staticmethod
+    def build_email(type_email, presence):
+        """Construit l'email d'un type donné (PRESENCE, ABSENCE ou RETARD) pour une présence"""
+        builders = {
+            'PRESENCE': ParentNotificationService.build_presence_confirmation_email,
+            'ABSENCE': ParentNotificationService.build_absence_notification_email,
+            'RETARD': ParentNotificationService.build_retard_notification_email,
+        }
+        return builders[type_email](presence)
+    
+    @staticmethod
+    def build_recap_email(parent, presences, titre, subject):
+        """
+        Construit un email récapitulatif des présences des enfants d'un parent
+        
+        Args:
+            parent: Parent (avec son utilisateur)
+            presences: présences à récapituler (relations RECAP_RELATED chargées)
+            titre: titre affiché dans l'email
+            subject: sujet de l'email
+        
+        Returns:
+            EmailMultiAlternatives, ou None s'il n'y a aucune présence
+        """
+        if not presences:
+            return None
+        
+        lignes = []
+        for presence in presences:
             cours = presence.session_appel.cours
-            enseignant = presence.session_appel.cours.enseignant
-            
-            # Préparer le contexte pour le template
-            context = {
-                'eleve_nom': eleve.user.get_full_name(),
-                'parent_nom': parent.user.get_full_name(),
+            lignes.append({
+                'eleve_nom': presence.eleve.user.get_full_name(),
                 'cours_matiere': cours.matiere.nom,
                 'cours_classe': cours.classe.nom,
                 'cours_date': cours.date.strftime('%d/%m/%Y'),
                 'cours_heure': f"{cours.heure_debut.strftime('%H:%M')} - {cours.heure_fin.strftime('%H:%M')}",
-                'cours_salle': cours.salle,
-                'enseignant_nom': enseignant.user.get_full_name(),
+                'statut': presence.statut,
+                'statut_display': presence.get_statut_display(),
                 'presence_heure': presence.heure_arrivee.strftime('%H:%M') if presence.heure_arrivee else None,
-                'presence_methode': presence.get_methode_detection_display(),
-                'confirmation_date': timezone.now().strftime('%d/%m/%Y à %H:%M'),
-                'ecole_nom': 'FaceTrack École',
-                'ecole_email': settings.DEFAULT_FROM_EMAIL,
-            }
-            
-            # Générer le contenu HTML de l'email
-            html_message = render_to_string('emails/presence_confirmation.html', context)
-            
-            # Générer le contenu texte simple
-            plain_message = strip_tags(html_message)
-            
-            # Sujet de l'email
-            subject = f"✅ Présence confirmée - {eleve.user.first_name} {eleve.user.last_name} - {cours.matiere.nom}"
-            
-            # Envoyer l'email
-            success = send_mail(
-                subject=subject,
-                message=plain_message,
-                from_email=settings.DEFAULT_FROM_EMAIL,
-                recipient_list=[parent.user.email],
-                html_message=html_message,
-                fail_silently=False,
+            })
+        
+        context = {
+            'titre': titre,
+            'parent_nom': parent.user.get_full_name(),
+            'lignes': lignes,
+            'absences': sum(1 for presence in presences if presence.statut == 'ABSENT'),
+            'notification_date': timezone.now().strftime('%d/%m/%Y à %H:%M'),
+            'ecole_nom': 'FaceTrack École',
+            'ecole_email': settings.DEFAULT_FROM_EMAIL,
+        }
+        return ParentNotificationService._message(parent, subject, 'emails/recap_presences', context)
+    
+    @staticmethod
+    def recap_presences_by_session(keys):
+        """
+        Présences de plusieurs récapitulatifs de séance, en une requête
+        
+        Args:
+            keys: couples (parent_id, session_appel_id)
+        
+        Returns:
+            dict {(parent_id, session_appel_id): [présences]}
+        """
+        grouped = {key: [] for key in keys}
+        if not grouped:
+            return grouped
+        presences = (
+            Presence.objects.filter(
+                eleve__parent_id__in={parent_id for parent_id, _ in grouped},
+                session_appel_id__in={session_id for _, session_id in grouped},
             )
-            
-            if success:
-                logger.info(f"Email de confirmation envoyé avec succès à {parent.user.email} pour {eleve.user.get_full_name()}")
-                return True
-            else:
-                logger.error(f"Échec de l'envoi de l'email à {parent.user.email}")
-                return False
-                
-        except Presence.DoesNotExist:
-            logger.error(f"Presence avec l'ID {presence_id} n'existe pas")
-            return False
-        except Exception as e:
-            logger.error(f"Erreur lors de l'envoi de l'email de confirmation: {str(e)}")
-            return False
+            .select_related(*ParentNotificationService.RECAP_RELATED)
+            .order_by('eleve__user__first_name')
+        )
+        for presence in presences:
+            key = (presence.eleve.parent_id, presence.session_appel_id)
+            if key in grouped:
+                grouped[key].append(presence)
+        return grouped
     
     @staticmethod
-    def send_absence_notification_email(presence_id):
+    def recap_presences_by_day(keys):
         """
-        Envoie un email de notification d'absence au parent de l'élève
+        Présences de plusieurs récapitulatifs quotidiens, en une requête
         
         Args:
-            presence_id: ID de l'objet Presence
+            keys: couples (parent_id, date)
+        
+        Returns:
+            dict {(parent_id, date): [présences]}
         """
+        grouped = {key: [] for key in keys}
+        if not grouped:
+            return grouped
+        presences = (
+            Presence.objects.filter(
+                eleve__parent_id__in={parent_id for parent_id, _ in grouped},
+                session_appel__cours__date__in={date for _, date in grouped},
+            )
+            .select_related(*ParentNotificationService.RECAP_RELATED)
+            .order_by('session_appel__cours__heure_debut', 'eleve__user__first_name')
+        )
+        for presence in presences:
+            key = (presence.eleve.parent_id, presence.session_appel.cours.date)
+            if key in grouped:
+                grouped[key].append(presence)
+        return grouped
+    
+    @staticmethod
+    def build_recap_session_email(parent, session_appel_id, presences=None):
+        """
+        Récapitulatif d'une séance pour tous les enfants d'un parent
+        
+        Args:
+            presences: présences du récapitulatif si déjà chargées
+                (recap_presences_by_session)
+        """
+        if presences is None:
+            key = (parent.id, session_appel_id)
+            presences = ParentNotificationService.recap_presences_by_session([key])[key]
+        if not presences:
+            return None
+        
+        cours = presences[0].session_appel.cours
+        prenoms = ', '.join(presence.eleve.user.first_name for presence in presences)
+        subject = f"📋 Appel de {cours.matiere.nom} du {cours.date.strftime('%d/%m/%Y')} - {prenoms}"
+        return ParentNotificationService.build_recap_email(parent, presences, f"Appel de {cours.matiere.nom}", subject)
+    
+    @staticmethod
+    def build_recap_jour_email(parent, date, presences=None):
+        """
+        Récapitulatif d'une journée (séances terminées ou en cours) pour tous les enfants d'un parent
+        
+        Args:
+            presences: présences du récapitulatif si déjà chargées
+                (recap_presences_by_day)
+        """
+        if presences is None:
+            presences = ParentNotificationService.recap_presences_by_day([(parent.id, date)])[(parent.id, date)]
+        subject = f"📋 Récapitulatif des présences du {date.strftime('%d/%m/%Y')}"
+        return ParentNotificationService.build_recap_email(parent, presences, "Récapitulatif de la journée", subject)
+    
+    @staticmethod
+    def _send(presence_id, type_email, label):
         try:
             # Récupérer la présence avec toutes les informations nécessaires
             presence = Presence.objects.select_related(
-                'eleve__user',
-                'eleve__parent__user',
-                'eleve__classe',
-                'session_appel__cours__matiere',
-                'session_appel__cours__enseignant__user'
+                *ParentNotificationService.PRESENCE_RELATED
             ).get(id=presence_id)
             
-            # Vérifier que l'élève a un parent
-            if not presence.eleve.parent:
-                logger.warning(f"L'élève {presence.eleve.user.get_full_name()} n'a pas de parent associé")
+            message = ParentNotificationService.build_email(type_email, presence)
+            if message is None:
                 return False
             
-            # Informations de base
-            eleve = presence.eleve
-            parent = presence.eleve.parent
-            cours = presence.session_appel.cours
-            enseignant = presence.session_appel.cours.enseignant
-            
-            # Préparer le contexte pour le template
-            context = {
-                'eleve_nom': eleve.user.get_full_name(),
-                'parent_nom': parent.user.get_full_name(),
-                'cours_matiere': cours.matiere.nom,
-                'cours_classe': cours.classe.nom,
-                'cours_date': cours.date.strftime('%d/%m/%Y'),
-                'cours_heure': f"{cours.heure_debut.strftime('%H:%M')} - {cours.heure_fin.strftime('%H:%M')}",
-                'cours_salle': cours.salle,
-                'enseignant_nom': enseignant.user.get_full_name(),
-                'notification_date': timezone.now().strftime('%d/%m/%Y à %H:%M'),
-                'ecole_nom': 'FaceTrack École',
-                'ecole_email': settings.DEFAULT_FROM_EMAIL,
-            }
-            
-            # Générer le contenu HTML de l'email
-            html_message = render_to_string('emails/absence_notification.html', context)
-            
-            # Générer le contenu texte simple
-            plain_message = strip_tags(html_message)
-            
-            # Sujet de l'email
-            subject = f"⚠️ Absence signalée - {eleve.user.first_name} {eleve.user.last_name} - {cours.matiere.nom}"
-            
             # Envoyer l'email
-            success = send_mail(
-                subject=subject,
-                message=plain_message,
-                from_email=settings.DEFAULT_FROM_EMAIL,
-                recipient_list=[parent.user.email],
-                html_message=html_message,
-                fail_silently=False,
-            )
-            
-            if success:
-                logger.info(f"Email d'absence envoyé avec succès à {parent.user.email} pour {eleve.user.get_full_name()}")
+            if message.send(fail_silently=False):
+                logger.info(f"Email {label} envoyé avec succès à {message.to[0]} pour {presence.eleve.user.get_full_name()}")
                 return True
             else:
-                logger.error(f"Échec de l'envoi de l'email d'absence à {parent.user.email}")
+                logger.error(f"Échec de l'envoi de l'email {label} à {message.to[0]}")
                 return False
                 
         except Presence.DoesNotExist:
             logger.error(f"Presence avec l'ID {presence_id} n'existe pas")
             return False
         except Exception as e:
-            logger.error(f"Erreur lors de l'envoi de l'email d'absence: {str(e)}")
+            logger.error(f"Erreur lors de l'envoi de l'email {label}: {str(e)}")
             return False
     
+    @staticmethod
+    def send_presence_confirmation_email(presence_id):
+        """
+        Envoie un email de confirmation de présence au parent de l'élève
+        
+        Args:
+            presence_id: ID de l'objet Presence
+        """
+        return ParentNotificationService._send(presence_id, 'PRESENCE', 'de confirmation')
+    
+    @staticmethod
+    def send_absence_notification_email(presence_id):
+        """
+        Envoie un email de notification d'absence au parent de l'élève
+        
+        Args:
+            presence_id: ID de l'objet Presence
+        """
+        return ParentNotificationService._send(presence_id, 'ABSENCE', 'd\'absence')
+    
     @staticmethod
     def send_retard_notification_email(presence_id):
         """
@@ -177,81 +381,4 @@ class ParentNotificationService:
         Args:
             presence_id: ID de l'objet Presence
         """
-        try:
-            # Récupérer la présence avec toutes les informations nécessaires
-            presence = Presence.objects.select_related(
-                'eleve__user',
-                'eleve__parent__user',
-                'eleve__classe',
-                'session_appel__cours__matiere',
-                'session_appel__cours__enseignant__user'
-            ).get(id=presence_id)
-            
-            # Vérifier que l'élève a un parent
-            if not presence.eleve.parent:
-                logger.warning(f"L'élève {presence.eleve.user.get_full_name()} n'a pas de parent associé")
-                return False
-            
-            # Informations de base
-            eleve = presence.eleve
-            parent = presence.eleve.parent
-            cours = presence.session_appel.cours
-            enseignant = presence.session_appel.cours.enseignant
-            
-            # Calculer le retard
-            retard_minutes = None
-            if presence.heure_arrivee and cours.heure_debut:
-                from datetime import datetime, time
-                heure_debut = datetime.combine(cours.date, cours.heure_debut)
-                heure_arrivee = datetime.combine(cours.date, presence.heure_arrivee)
-                retard_minutes = int((heure_arrivee - heure_debut).total_seconds() / 60)
-            
-            # Préparer le contexte pour le template
-            context = {
-                'eleve_nom': eleve.user.get_full_name(),
-                'parent_nom': parent.user.get_full_name(),
-                'cours_matiere': cours.matiere.nom,
-                'cours_classe': cours.classe.nom,
-                'cours_date': cours.date.strftime('%d/%m/%Y'),
-                'cours_heure': f"{cours.heure_debut.strftime('%H:%M')} - {cours.heure_fin.strftime('%H:%M')}",
-                'cours_salle': cours.salle,
-                'enseignant_nom': enseignant.user.get_full_name(),
-                'presence_heure': presence.heure_arrivee.strftime('%H:%M') if presence.heure_arrivee else None,
-                'retard_minutes': retard_minutes,
-                'notification_date': timezone.now().strftime('%d/%m/%Y à %H:%M'),
-                'ecole_nom': 'FaceTrack École',
-                'ecole_email': settings.DEFAULT_FROM_EMAIL,
-            }
-            
-            # Générer le contenu HTML de l'email
-            html_message = render_to_string('emails/retard_notification.html', context)
-            
-            # Générer le contenu texte simple
-            plain_message = strip_tags(html_message)
-            
-            # Sujet de l'email
-            subject = f"⏰ Retard signalé - {eleve.user.first_name} {eleve.user.last_name} - {cours.matiere.nom}"
-            
-            # Envoyer l'email
-            success = send_mail(
-                subject=subject,
-                message=plain_message,
-                from_email=settings.DEFAULT_FROM_EMAIL,
-                recipient_list=[parent.user.email],
-                html_message=html_message,
-                fail_silently=False,
-            )
-            
-            if success:
-                logger.info(f"Email de retard envoyé avec succès à {parent.user.email} pour {eleve.user.get_full_name()}")
-                return True
-            else:
-                logger.error(f"Échec de l'envoi de l'email de retard à {parent.user.email}")
-                return False
-                
-        except Presence.DoesNotExist:
-            logger.error(f"Presence avec l'ID {presence_id} n'existe pas")
-            return False
-        except Exception as e:
-            logger.error(f"Erreur lors de l'envoi de l'email de retard: {str(e)}")
-            return False
+        return ParentNotificationService._send(presence_id, 'RETARD', 'de retard')
@@ -0,0 +1,54 @@
+"""
+Fin d'une session d'appel et historique des présences.
+
+``finalize_session`` est le chemin commun de ``api_finish_call`` et
+``api_validate_session`` : la session est terminée et l'historique de ses
+présences écrit dans une seule transaction, avec un nombre de requêtes
+indépendant de la taille de la classe. Une session déjà terminée peut être
+validée à nouveau : son historique est mis à jour (upsert sur
+``(eleve, cours, date)``) au lieu d'être dupliqué.
+"""
+from django.db import transaction
+from django.utils import timezone
+
+from .models import HistoriquePresence, Presence
+
+HISTORIQUE_FIELDS = ['statut', 'heure_arrivee', 'methode_detection', 'commentaire']
+
+
+def finalize_session(session_appel):
+    """
+    Termine une session d'appel et enregistre l'historique de ses présences.
+
+    Args:
+        session_appel: SessionAppel (avec son cours, idéalement chargé par
+            select_related)
+
+    Returns:
+        statistiques de la session : {'present', 'retard', 'absent', 'total'}
+    """
+    cours = session_appel.cours
+    with transaction.atomic():
+        session_appel.statut = 'TERMINE'
+        session_appel.date_fin = timezone.now()
+        session_appel.save()
+
+        presences = list(Presence.objects.filter(session_appel=session_appel).values('eleve_id', *HISTORIQUE_FIELDS))
+        HistoriquePresence.objects.bulk_create(
+            [
+                HistoriquePresence(eleve_id=presence['eleve_id'], cours=cours, date=cours.date,
+                                   **{field: presence[field] for field in HISTORIQUE_FIELDS})
+                for presence in presences
+            ],
+            update_conflicts=True,
+            unique_fields=['eleve', 'cours', 'date'],
+            update_fields=HISTORIQUE_FIELDS,
+        )
+
+    statuts = [presence['statut'] for presence in presences]
+    return {
+        'present': statuts.count('PRESENT'),
+        'retard': statuts.count('RETARD'),
+        'absent': statuts.count('ABSENT'),
+        'total': len(statuts),
+    }
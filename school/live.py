@@ -0,0 +1,176 @@
+"""
+Flux en direct des présences d'une session d'appel (Server-Sent Events).
+
+Chaque session a un compteur de version dans le cache Django, incrémenté
+(après commit) à chaque modification d'une de ses présences et à la fin de
+la session. Un flux ouvert ne lit que ce compteur tant que rien ne change,
+de moins en moins souvent (de ``POLL_INTERVAL`` à ``POLL_MAX_INTERVAL``)
+tant que la session reste inactive. Quand la version change, seules les
+présences modifiées depuis le dernier envoi (``date_modification``) sont
+lues et envoyées.
+
+Sous ASGI (uvicorn), le flux reste ouvert ``STREAM_DURATION`` secondes sans
+occuper de thread. Sous WSGI, la réponse se termine après la première
+lecture : un flux long bloquerait un thread du serveur. Dans les deux cas
+EventSource se reconnecte avec le dernier curseur reçu (``Last-Event-ID``).
+"""
+import asyncio
+import json
+import time
+from datetime import timedelta
+
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .models import Presence, SessionAppel
+
+VERSION_KEY = 'appel:presences_version:{session_id}'
+
+# Intervalle de lecture du compteur de version (s), doublé à chaque lecture
+# sans changement jusqu'à POLL_MAX_INTERVAL
+POLL_INTERVAL = 0.25
+POLL_MAX_INTERVAL = 5
+# Commentaire envoyé pour garder la connexion ouverte (s)
+KEEPALIVE_INTERVAL = 15
+# Durée maximale d'un flux avant reconnexion du navigateur (s)
+STREAM_DURATION = 300
+# Délai de reconnexion demandé au navigateur (ms)
+RETRY_DELAY = 2000
+# Fenêtre relue à chaque lecture : une écriture validée après une écriture
+# plus récente n'est pas perdue
+CURSOR_LAG = timedelta(seconds=2)
+
+
+def presence_version(session_id):
+    """Version courante des présences d'une session"""
+    return cache.get(VERSION_KEY.format(session_id=session_id), 0)
+
+
+def bump_presence_version(session_id):
+    key = VERSION_KEY.format(session_id=session_id)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, 1, 24 * 3600)
+
+
+def notify_presence_change(session_id):
+    """Signale aux flux ouverts, après commit, une modification des présences d'une session"""
+    transaction.on_commit(lambda: bump_presence_version(session_id))
+
+
+def serialize_presence(presence):
+    return {
+        'presence_id': presence.id,
+        'eleve_id': presence.eleve_id,
+        'eleve_name': presence.eleve.user.get_full_name(),
+        'statut': presence.statut,
+        'heure_arrivee': presence.heure_arrivee.strftime('%H:%M') if presence.heure_arrivee else None,
+        'methode_detection': presence.methode_detection,
+        'updated_at': presence.date_modification.isoformat(),
+    }
+
+
+def _event(event, data, event_id=None):
+    lines = []
+    if event_id:
+        lines.append(f'id: {event_id}')
+    lines.append(f'event: {event}')
+    lines.append(f'data: {json.dumps(data)}')
+    return '\n'.join(lines) + '\n\n'
+
+
+class PresenceFeed:
+    """
+    État d'un flux : curseur, présences déjà envoyées et version vue.
+
+    ``poll()`` est synchrone (accès au cache et à la base) et retourne les
+    événements à envoyer.
+    """
+
+    def __init__(self, session_id, since=None):
+        self.session_id = session_id
+        try:
+            cursor = parse_datetime(since or '')
+        except ValueError:
+            cursor = None
+        if cursor is not None and timezone.is_naive(cursor):
+            cursor = timezone.make_aware(cursor)
+        self.cursor = cursor or timezone.now()
+        # Le client a déjà tout ce qui précède son curseur initial
+        self.floor = self.cursor
+        self.sent = {}
+        self.version = None
+        self.closed = False
+        self.last_sent = time.monotonic()
+        # Attente avant la prochaine lecture
+        self.interval = POLL_INTERVAL
+
+    def start(self):
+        chunks = [f'retry: {RETRY_DELAY}\n\n']
+        return chunks + self.poll()
+
+    def poll(self):
+        chunks = []
+        version = presence_version(self.session_id)
+        if version != self.version:
+            self.version = version
+            self.interval = POLL_INTERVAL
+            chunks.extend(self._changes())
+        else:
+            self.interval = min(self.interval * 2, POLL_MAX_INTERVAL)
+
+        if not chunks and time.monotonic() - self.last_sent >= KEEPALIVE_INTERVAL:
+            chunks.append(': keepalive\n\n')
+        if chunks:
+            self.last_sent = time.monotonic()
+        return chunks
+
+    def _changes(self):
+        presences = (
+            Presence.objects.filter(
+                session_appel_id=self.session_id,
+                date_modification__gt=max(self.floor, self.cursor - CURSOR_LAG),
+            )
+            .select_related('eleve__user')
+            .order_by('date_modification')
+        )
+        updates = []
+        for presence in presences:
+            if self.sent.get(presence.id) == presence.date_modification:
+                continue
+            self.sent[presence.id] = presence.date_modification
+            self.cursor = max(self.cursor, presence.date_modification)
+            updates.append(serialize_presence(presence))
+
+        chunks = []
+        if updates:
+            chunks.append(_event('presences', {'updates': updates}, self.cursor.isoformat()))
+
+        statut = SessionAppel.objects.filter(pk=self.session_id).values_list('statut', flat=True).first()
+        if statut != 'EN_COURS':
+            self.closed = True
+            chunks.append(_event('session_closed', {'statut': statut}))
+        return chunks
+
+
+def stream(feed):
+    """
+    Réponse synchrone (WSGI) : modifications depuis le curseur, puis fin de
+    la réponse ; le navigateur se reconnecte après ``RETRY_DELAY``
+    """
+    yield from feed.start()
+
+
+async def astream(feed):
+    """Flux asynchrone (ASGI) : l'attente entre deux lectures n'occupe aucun thread"""
+    deadline = time.monotonic() + STREAM_DURATION
+    for chunk in await sync_to_async(feed.start, thread_sensitive=False)():
+        yield chunk
+    while not feed.closed and time.monotonic() < deadline:
+        await asyncio.sleep(feed.interval)
+        for chunk in await sync_to_async(feed.poll, thread_sensitive=False)():
+            yield chunk
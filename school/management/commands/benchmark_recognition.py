@@ -0,0 +1,97 @@
+import json
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from school.recognition.benchmark import (
+    SyntheticClassroom, environment, find_regressions, run_benchmark,
+)
+from school.recognition.config import get_setting
+from school.recognition.embeddings import create_embedder, match_threshold
+
+
+class Command(BaseCommand):
+    help = 'Mesurer les performances de la reconnaissance faciale sur des classes synthétiques'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--students', type=int, nargs='+', default=[30], help='Tailles de classe')
+        parser.add_argument('--faces', type=int, nargs='+', default=[1, 10, 25], help='Visages par image')
+        parser.add_argument('--frames', type=int, default=30, help='Images par configuration')
+        parser.add_argument('--photos', type=int, default=1, help='Photos de référence par élève')
+        parser.add_argument('--detection-widths', type=int, nargs='+', default=[get_setting('DETECTION_WIDTH')])
+        parser.add_argument('--scale-factors', type=float, nargs='+', default=[get_setting('SCALE_FACTOR')])
+        parser.add_argument('--min-neighbors', type=int, nargs='+', default=[get_setting('MIN_NEIGHBORS')])
+        parser.add_argument('--thresholds', type=float, nargs='+',
+                            help='Seuils de correspondance (défaut : seuil calibré du calculateur)')
+        parser.add_argument('--embedder', default=get_setting('EMBEDDING_BACKEND'), help="auto, dlib ou pixels")
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--output', default='bench_output.json', help='Fichier JSON des résultats')
+        parser.add_argument('--baseline', help='Résultats de référence (JSON) à ne pas dégrader')
+        parser.add_argument('--tolerance', type=float, default=0.15,
+                            help='Baisse relative de fps / hausse de latence p99 tolérée')
+        parser.add_argument('--accuracy-tolerance', type=float, default=0.02,
+                            help="Baisse absolue du taux d'identification tolérée")
+
+    def handle(self, *args, **options):
+        embedder = create_embedder(options['embedder'])
+        options['thresholds'] = options['thresholds'] or [match_threshold(embedder)]
+        results = []
+
+        for students in options['students']:
+            classroom = SyntheticClassroom(students, seed=options['seed'])
+            for faces in options['faces']:
+                if faces > students:
+                    self.stdout.write(self.style.WARNING(f"⚠️ {faces} visages > {students} élèves, ignoré"))
+                    continue
+                frames = classroom.frames(options['frames'], faces)
+
+                for width in options['detection_widths']:
+                    for scale_factor in options['scale_factors']:
+                        for min_neighbors in options['min_neighbors']:
+                            for result in run_benchmark(
+                                classroom, frames, embedder, options['thresholds'],
+                                width, scale_factor, min_neighbors, photos=options['photos'],
+                            ):
+                                results.append(result)
+                                self.print_result(result)
+
+        report = {
+            'generated_at': datetime.now().isoformat(timespec='seconds'),
+            'environment': environment(),
+            'parameters': {
+                name: options[name] for name in (
+                    'students', 'faces', 'frames', 'photos', 'detection_widths', 'scale_factors',
+                    'min_neighbors', 'thresholds', 'seed',
+                )
+            },
+            'results': results,
+        }
+        with open(options['output'], 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        self.stdout.write(self.style.SUCCESS(f"📊 {len(results)} configurations écrites dans {options['output']}"))
+
+        if options['baseline']:
+            try:
+                with open(options['baseline'], encoding='utf-8') as f:
+                    baseline = json.load(f)
+            except (OSError, json.JSONDecodeError) as e:
+                raise CommandError(f"Référence illisible: {e}")
+
+            regressions = find_regressions(
+                results, baseline, options['tolerance'], options['accuracy_tolerance']
+            )
+            if regressions:
+                for message in regressions:
+                    self.stdout.write(self.style.ERROR(f"❌ {message}"))
+                raise CommandError(f"{len(regressions)} régression(s) par rapport à {options['baseline']}")
+            self.stdout.write(self.style.SUCCESS(f"✅ Aucune régression par rapport à {options['baseline']}"))
+
+    def print_result(self, result):
+        accuracy = result['accuracy']
+        self.stdout.write(
+            f"{result['students']:>4} élèves {result['faces']:>3} visages | "
+            f"largeur {result['detection_width']} scale {result['scale_factor']} "
+            f"voisins {result['min_neighbors']} seuil {result['threshold']} | "
+            f"{result['fps']:>7} img/s p50 {result['latency_ms']['p50']} ms p99 {result['latency_ms']['p99']} ms | "
+            f"détection {accuracy['detection_recall']:.0%} identification {accuracy['identification_rate']:.0%} "
+            f"confusions {accuracy['false_match_rate']:.0%}"
+        )
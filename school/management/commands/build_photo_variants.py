@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+from school.models import Eleve
+from school.photos import generate_variants
+
+
+class Command(BaseCommand):
+    help = 'Générer les miniatures manquantes des photos de référence des élèves'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--classe', help='Limiter à une classe (nom, ex: 6A)')
+
+    def handle(self, *args, **options):
+        eleves = Eleve.objects.exclude(photo_reference='').exclude(photo_reference__isnull=True)
+        if options['classe']:
+            eleves = eleves.filter(classe__nom=options['classe'])
+
+        crees = erreurs = 0
+        for matricule, photo in eleves.values_list('matricule', 'photo_reference'):
+            try:
+                crees += len(generate_variants(photo))
+            except Exception as e:
+                erreurs += 1
+                self.stdout.write(self.style.ERROR(f"❌ {matricule}: {str(e)}"))
+
+        self.stdout.write(self.style.SUCCESS(f"🖼️ {crees} miniatures créées, {erreurs} photos en erreur"))
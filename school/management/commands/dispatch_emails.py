@@ -0,0 +1,31 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from school.outbox import dispatch_batch
+
+
+class Command(BaseCommand):
+    help = 'Envoyer les emails en attente aux parents (processus à laisser tourner en arrière-plan)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Vider la file puis s\'arrêter')
+        parser.add_argument('--interval', type=float, default=2.0,
+                            help='Attente (s) entre deux lectures de la file vide')
+        parser.add_argument('--batch-size', type=int, help='Nombre maximum d\'emails par lot')
+
+    def handle(self, *args, **options):
+        total = 0
+        try:
+            while True:
+                count = dispatch_batch(options['batch_size'])
+                total += count
+                if count:
+                    continue
+                if options['once']:
+                    break
+                time.sleep(options['interval'])
+                close_old_connections()
+        except KeyboardInterrupt:
+            pass
+        self.stdout.write(self.style.SUCCESS(f"📧 {total} email(s) traité(s)"))
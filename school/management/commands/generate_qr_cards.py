@@ -0,0 +1,101 @@
+import json
+import os
+import re
+import time
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from school import qrcards
+from school.models import Eleve
+
+
+def _slug(value):
+    return re.sub(r'[^\w-]+', '_', value).strip('_') or 'classe'
+
+
+class Command(BaseCommand):
+    help = 'Générer les cartes QR des élèves et un fichier imprimable (PDF/ZIP) par classe'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--classe', help='Limiter à une classe (nom, ex: 6A)')
+        parser.add_argument('--output', default=os.path.join(settings.MEDIA_ROOT, 'qr_codes_eleves'),
+                            help='Dossier de sortie (un sous-dossier par classe)')
+        parser.add_argument('--format', choices=['pdf', 'zip', 'both', 'none'], default='pdf',
+                            help='Fichier imprimable généré par classe')
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                            help='Processus de rendu (0 : dans le processus courant)')
+        parser.add_argument('--force', action='store_true', help='Tout régénérer')
+
+    def handle(self, *args, **options):
+        eleves = Eleve.objects.order_by('classe__nom', 'user__last_name', 'user__first_name')
+        if options['classe']:
+            eleves = eleves.filter(classe__nom=options['classe'])
+
+        classes = defaultdict(list)
+        for eleve in eleves.select_related('user', 'classe'):
+            classes[eleve.classe.nom].append(eleve)
+
+        start = time.monotonic()
+        jobs, manifests = [], {}
+        for classe, eleves_classe in classes.items():
+            directory = os.path.join(options['output'], _slug(classe))
+            os.makedirs(directory, exist_ok=True)
+            manifest_path = os.path.join(directory, 'manifest.json')
+            previous = {} if options['force'] else self.read_manifest(manifest_path)
+
+            cards = {}
+            for eleve in eleves_classe:
+                nom = eleve.user.get_full_name()
+                payload = eleve.get_qr_payload()
+                key = qrcards.card_key(payload, nom, eleve.matricule, classe)
+                path = os.path.join(directory, f'{eleve.matricule}.png')
+                cards[eleve.matricule] = key
+                if previous.get('cards', {}).get(eleve.matricule) != key or not os.path.exists(path):
+                    jobs.append((path, payload, nom, eleve.matricule, classe))
+            manifests[classe] = (directory, manifest_path, previous, cards)
+
+        total = sum(len(eleves_classe) for eleves_classe in classes.values())
+        self.stdout.write(f"🎫 {len(jobs)} cartes à générer, {total - len(jobs)} inchangées")
+
+        if options['workers'] and len(jobs) > 1:
+            with ProcessPoolExecutor(max_workers=options['workers']) as executor:
+                list(executor.map(qrcards.render_card_file, jobs, chunksize=16))
+        else:
+            for job in jobs:
+                qrcards.render_card_file(job)
+
+        for classe, (directory, manifest_path, previous, cards) in manifests.items():
+            self.write_bundles(classe, directory, previous, cards, options)
+            with open(manifest_path, 'w', encoding='utf-8') as f:
+                json.dump({'cards': cards, 'formats': self.formats(options)}, f, indent=2)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ {len(jobs)} cartes générées pour {len(classes)} classe(s) en {time.monotonic() - start:.1f} s "
+            f"({options['output']})"
+        ))
+
+    def formats(self, options):
+        return {'pdf': ['pdf'], 'zip': ['zip'], 'both': ['pdf', 'zip'], 'none': []}[options['format']]
+
+    def read_manifest(self, path):
+        try:
+            with open(path, encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return {}
+
+    def write_bundles(self, classe, directory, previous, cards, options):
+        """Fichiers imprimables de la classe, refaits seulement si une carte a changé"""
+        card_paths = [os.path.join(directory, f'{matricule}.png') for matricule in cards]
+        unchanged = previous.get('cards') == cards
+        for extension in self.formats(options):
+            path = os.path.join(directory, f'cartes_{_slug(classe)}.{extension}')
+            if unchanged and extension in previous.get('formats', []) and os.path.exists(path):
+                continue
+            if extension == 'pdf':
+                qrcards.build_pdf(card_paths, path)
+            else:
+                qrcards.build_zip(card_paths, path)
+            self.stdout.write(f"📄 {classe}: {os.path.basename(path)} ({len(card_paths)} cartes)")
@@ -0,0 +1,153 @@
+import io
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+from PIL import Image
+from school.models import Eleve, EmpreinteFaciale
+from school.photos import generate_variants
+from school.recognition import ingest
+from school.recognition.cache import bump_embeddings_version
+from school.recognition.config import get_setting
+from school.recognition.embeddings import create_embedder
+
+
+class Command(BaseCommand):
+    help = "Importer en masse les photos de référence des élèves (dossier ou zip, fichiers nommés par matricule)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('source', help='Dossier ou archive zip de photos (ex: 2025-3-AB12.jpg)')
+        parser.add_argument('--classe', help='Limiter à une classe (nom, ex: 6A)')
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                            help='Processus de préparation (0 : dans le processus courant)')
+        parser.add_argument('--batch-size', type=int, default=200, help='Élèves écrits par transaction')
+        parser.add_argument('--replace', action='store_true', help='Remplacer les photos existantes')
+        parser.add_argument('--dry-run', action='store_true', help="Préparer sans rien écrire")
+
+    def handle(self, *args, **options):
+        source = options['source']
+        if not os.path.exists(source):
+            raise CommandError(f"Source introuvable: {source}")
+
+        eleves = Eleve.objects.all()
+        if options['classe']:
+            eleves = eleves.filter(classe__nom=options['classe'])
+        index = {
+            matricule.upper(): (eleve_id, classe_id, photo)
+            for eleve_id, matricule, classe_id, photo in eleves.values_list(
+                'id', 'matricule', 'classe_id', 'photo_reference'
+            )
+        }
+
+        photos, inconnus, ignores, vus = [], [], 0, set()
+        for name, matricule in ingest.list_photos(source):
+            if matricule not in index:
+                inconnus.append(name)
+            elif index[matricule][2] and not options['replace']:
+                ignores += 1
+            elif matricule in vus:
+                self.stdout.write(self.style.WARNING(f"⚠️ Plusieurs photos pour {matricule}, {name} ignorée"))
+            else:
+                vus.add(matricule)
+                photos.append((name, matricule))
+
+        self.stdout.write(
+            f"📷 {len(photos)} photos à importer, {ignores} élèves ayant déjà une photo, "
+            f"{len(inconnus)} fichiers sans élève correspondant"
+        )
+        for name in inconnus[:20]:
+            self.stdout.write(self.style.WARNING(f"⚠️ Matricule inconnu: {name}"))
+
+        backend = get_setting('EMBEDDING_BACKEND')
+        modele = create_embedder(backend).name
+        start = time.monotonic()
+        importes = erreurs = 0
+        batch = []
+        for result in self.prepare(source, photos, backend, options['workers']):
+            if 'error' in result:
+                erreurs += 1
+                self.stdout.write(self.style.ERROR(f"❌ {result['name']}: {result['error']}"))
+                continue
+            if result['reason']:
+                self.stdout.write(self.style.WARNING(
+                    f"⚠️ {result['name']}: qualité {result['qualite']} ({result['reason']})"
+                ))
+            batch.append(result)
+            if len(batch) >= options['batch_size']:
+                importes += self.write(batch, index, modele, options['dry_run'])
+                batch = []
+                self.stdout.write(f"… {importes} élèves importés ({time.monotonic() - start:.0f} s)")
+        importes += self.write(batch, index, modele, options['dry_run'])
+
+        duree = time.monotonic() - start
+        message = f"✅ {importes} photos importées, {erreurs} en erreur en {duree:.1f} s"
+        if options['dry_run']:
+            message += " (simulation, rien n'a été écrit)"
+        self.stdout.write(self.style.SUCCESS(message))
+
+    def prepare(self, source, photos, backend, workers):
+        """Prépare les photos dans un pool de processus (fork), dans l'ordre de la liste"""
+        args = ([source] * len(photos), [name for name, _ in photos], [matricule for _, matricule in photos])
+        if workers and 'fork' in multiprocessing.get_all_start_methods():
+            with ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context('fork'),
+                initializer=ingest.init_worker,
+                initargs=(backend,),
+            ) as executor:
+                yield from executor.map(ingest.prepare_photo, *args, chunksize=8)
+        else:
+            ingest.load_models(backend)
+            yield from map(ingest.prepare_photo, *args)
+
+    def write(self, batch, index, modele, dry_run):
+        """Enregistre un lot : fichiers et miniatures, photos des élèves et empreintes, en quelques requêtes"""
+        if not batch or dry_run:
+            return len(batch)
+
+        eleves, classes = [], set()
+        for result in batch:
+            eleve_id, classe_id, _ = index[result['matricule']]
+            result['source'] = default_storage.save(
+                f"photos_eleves/{result['matricule']}.jpg", ContentFile(result['jpeg'])
+            )
+            generate_variants(result['source'], Image.open(io.BytesIO(result['jpeg'])), result['face_box'])
+            eleves.append(Eleve(id=eleve_id, photo_reference=result['source']))
+            classes.add(classe_id)
+
+        # Les opérations en masse ne déclenchent pas les signaux : pas de
+        # recalcul des empreintes, et invalidation explicite du cache
+        def invalider():
+            for classe_id in classes:
+                bump_embeddings_version(classe_id)
+
+        with transaction.atomic():
+            Eleve.objects.bulk_update(eleves, ['photo_reference'])
+            existantes = {
+                empreinte.eleve_id: empreinte
+                for empreinte in EmpreinteFaciale.objects.filter(
+                    eleve_id__in=[eleve.id for eleve in eleves], photo_reference__isnull=True, modele=modele
+                )
+            }
+            nouvelles, now = [], timezone.now()
+            for result in batch:
+                eleve_id = index[result['matricule']][0]
+                empreinte = existantes.get(eleve_id) or EmpreinteFaciale(
+                    eleve_id=eleve_id, photo_reference=None, modele=modele
+                )
+                empreinte.source = result['source']
+                empreinte.vecteur = result['vecteur']
+                empreinte.qualite = result['qualite']
+                empreinte.date_calcul = now
+                if empreinte.pk is None:
+                    nouvelles.append(empreinte)
+            EmpreinteFaciale.objects.bulk_update(existantes.values(), ['source', 'vecteur', 'qualite', 'date_calcul'])
+            EmpreinteFaciale.objects.bulk_create(nouvelles)
+            transaction.on_commit(invalider)
+        return len(batch)
@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+from school.models import Eleve, EmpreinteFaciale
+from school.recognition import get_engine
+from school.recognition.store import sync_eleve
+
+
+class Command(BaseCommand):
+    help = 'Calculer les empreintes faciales manquantes ou obsolètes des photos de référence'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--classe', help='Limiter à une classe (nom, ex: 6A)')
+        parser.add_argument('--force', action='store_true', help='Tout recalculer')
+
+    def handle(self, *args, **options):
+        engine = get_engine()
+        eleves = Eleve.objects.select_related('user').prefetch_related('photoreference_set')
+        if options['classe']:
+            eleves = eleves.filter(classe__nom=options['classe'])
+
+        if options['force']:
+            EmpreinteFaciale.objects.filter(eleve__in=eleves, modele=engine.embedder.name).delete()
+
+        total = 0
+        for eleve in eleves:
+            sync_eleve(eleve, engine)
+            total += 1
+
+        nb_empreintes = EmpreinteFaciale.objects.filter(eleve__in=eleves, modele=engine.embedder.name).count()
+        self.stdout.write(
+            self.style.SUCCESS(f"🧬 {nb_empreintes} empreintes à jour pour {total} élèves (modèle {engine.embedder.name})")
+        )
@@ -0,0 +1,29 @@
+# Generated by Django 4.2.11 on 2026-10-17 10:07
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('school', '0002_alter_eleve_photo_reference_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EmpreinteFaciale',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source', models.CharField(max_length=255)),
+                ('modele', models.CharField(max_length=20)),
+                ('vecteur', models.BinaryField()),
+                ('date_calcul', models.DateTimeField(auto_now=True)),
+                ('eleve', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='empreintes', to='school.eleve')),
+                ('photo_reference', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='school.photoreference')),
+            ],
+            options={
+                'unique_together': {('eleve', 'photo_reference', 'modele')},
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.11 on 2026-10-17 14:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('school', '0003_empreintefaciale'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='empreintefaciale',
+            name='qualite',
+            field=models.FloatField(default=1.0),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 4.2.11 on 2026-10-17 16:05
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('school', '0004_empreintefaciale_qualite'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EmailSortant',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('type_email', models.CharField(choices=[('PRESENCE', 'Confirmation de présence'), ('ABSENCE', 'Absence'), ('RETARD', 'Retard')], max_length=20)),
+                ('statut', models.CharField(choices=[('EN_ATTENTE', 'En attente'), ('ENVOYE', 'Envoyé'), ('ECHEC', 'Échec'), ('ANNULE', 'Annulé')], default='EN_ATTENTE', max_length=20)),
+                ('destinataire', models.EmailField(blank=True, max_length=254)),
+                ('tentatives', models.PositiveSmallIntegerField(default=0)),
+                ('prochain_essai', models.DateTimeField(default=django.utils.timezone.now)),
+                ('derniere_erreur', models.TextField(blank=True)),
+                ('date_creation', models.DateTimeField(auto_now_add=True)),
+                ('date_envoi', models.DateTimeField(blank=True, null=True)),
+                ('presence', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='emails', to='school.presence')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['statut', 'prochain_essai'], name='school_emai_statut_202abb_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,52 @@
+# Generated by Django 4.2.11 on 2026-10-17 16:40
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('school', '0005_emailsortant'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='emailsortant',
+            name='date',
+            field=models.DateField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='emailsortant',
+            name='parent',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='school.parent'),
+        ),
+        migrations.AddField(
+            model_name='emailsortant',
+            name='session_appel',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='school.sessionappel'),
+        ),
+        migrations.AddField(
+            model_name='parent',
+            name='recap_quotidien',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AlterField(
+            model_name='emailsortant',
+            name='presence',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='emails', to='school.presence'),
+        ),
+        migrations.AlterField(
+            model_name='emailsortant',
+            name='type_email',
+            field=models.CharField(choices=[('PRESENCE', 'Confirmation de présence'), ('ABSENCE', 'Absence'), ('RETARD', 'Retard'), ('RECAP_SESSION', 'Récapitulatif de la séance'), ('RECAP_JOUR', 'Récapitulatif de la journée')], max_length=20),
+        ),
+        migrations.AddConstraint(
+            model_name='emailsortant',
+            constraint=models.UniqueConstraint(condition=models.Q(('statut', 'EN_ATTENTE'), ('type_email', 'RECAP_SESSION')), fields=('parent', 'session_appel'), name='emailsortant_recap_session_unique'),
+        ),
+        migrations.AddConstraint(
+            model_name='emailsortant',
+            constraint=models.UniqueConstraint(condition=models.Q(('statut', 'EN_ATTENTE'), ('type_email', 'RECAP_JOUR')), fields=('parent', 'date'), name='emailsortant_recap_jour_unique'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.11 on 2026-10-17 17:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('school', '0006_recap_emails'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(fields=['destinataire', 'lu', 'date_creation'], name='school_noti_destina_eaef43_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.11 on 2026-10-17 18:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('school', '0008_cache_table'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='emailsortant',
+            name='statut',
+            field=models.CharField(choices=[('EN_ATTENTE', 'En attente'), ('ENVOI', "En cours d'envoi"), ('ENVOYE', 'Envoyé'), ('ECHEC', 'Échec'), ('ANNULE', 'Annulé')], default='EN_ATTENTE', max_length=20),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 4.2.11 on 2026-10-17 19:05
+
+from django.db import migrations, models
+
+
+def supprimer_emails_presence(apps, schema_editor):
+    """Supprime les emails par présence encore en file (plus aucun code ne les produit)"""
+    EmailSortant = apps.get_model('school', 'EmailSortant')
+    EmailSortant.objects.filter(type_email__in=['PRESENCE', 'ABSENCE', 'RETARD']).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('school', '0009_emailsortant_envoi'),
+    ]
+
+    operations = [
+        migrations.RunPython(supprimer_emails_presence, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name='emailsortant',
+            name='presence',
+        ),
+        migrations.AlterField(
+            model_name='emailsortant',
+            name='type_email',
+            field=models.CharField(choices=[('RECAP_SESSION', 'Récapitulatif de la séance'), ('RECAP_JOUR', 'Récapitulatif de la journée')], max_length=20),
+        ),
+    ]
@@ -67,23 +67,21 @@ class Matiere(models.Model):
         return f"{self.nom} ({self.code})"
 
 class Eleve(models.Model):
+    def get_qr_payload(self):
+        """Contenu encodé dans le QR code de l'élève (signé, voir qrcodes)"""
+        from .qrcodes import sign_qr_payload
+        return sign_qr_payload(self.pk, self.classe_id)
+
     def get_qr_code_base64(self):
-        import qrcode
-        import base64
-        from io import BytesIO
-        qr = qrcode.QRCode(
-            version=1,
-            error_correction=qrcode.constants.ERROR_CORRECT_L,
-            box_size=10,
-            border=4,
-        )
-        qr.add_data(self.matricule)
-        qr.make(fit=True)
-        img = qr.make_image(fill_color="black", back_color="white")
-        buffered = BytesIO()
-        img.save(buffered, format="PNG")
-        img_str = base64.b64encode(buffered.getvalue()).decode()
-        return f"data:image/png;base64,{img_str}"
+        from .qrcodes import get_qr_base64
+        return get_qr_base64(self.get_qr_payload())
+
+    def get_qr_code_url(self):
+        """URL de l'image du QR code, mise en cache par le navigateur"""
+        from django.urls import reverse
+        from .qrcodes import get_qr_png
+        key, _ = get_qr_png(self.get_qr_payload())
+        return reverse('qr_code_image', args=[key])
     user = models.OneToOneField(User, on_delete=models.CASCADE)
     classe = models.ForeignKey('Classe', on_delete=models.CASCADE)
     matricule = models.CharField(max_length=30, unique=True, editable=False)  # 👈 non éditable
@@ -107,6 +105,18 @@ class Eleve(models.Model):
     def __str__(self):
         return f"{self.user.get_full_name()} - {self.matricule}"
 
+    @property
+    def photo_miniature(self):
+        """URL de la miniature de la photo de référence (listes, avatars)"""
+        from .photos import variant_url
+        return variant_url(self.photo_reference, 'thumb')
+
+    @property
+    def photo_visage(self):
+        """URL du visage recadré de la photo de référence (écrans de scan)"""
+        from .photos import variant_url
+        return variant_url(self.photo_reference, 'face')
+
 class Enseignant(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE)
     matieres = models.ManyToManyField(Matiere)
@@ -121,6 +131,8 @@ class Parent(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE)
     profession = models.CharField(max_length=100, blank=True)
     lieu_travail = models.CharField(max_length=200, blank=True)
+    # Un seul email récapitulatif par jour au lieu d'un email par séance
+    recap_quotidien = models.BooleanField(default=False)
 
     def __str__(self):
         return f"{self.user.get_full_name()} - Parent"
@@ -213,6 +225,10 @@ class Notification(models.Model):
     date_lecture = models.DateTimeField(null=True, blank=True)
     lien = models.CharField(max_length=200, blank=True)
     
+    class Meta:
+        # Notifications non lues d'un parent, les plus récentes d'abord
+        indexes = [models.Index(fields=['destinataire', 'lu', 'date_creation'])]
+    
     def __str__(self):
         return f"Notif {self.type_notification} - {self.date_creation.strftime('%d/%m/%Y %H:%M')}"
 
@@ -241,3 +257,68 @@ class HistoriquePresence(models.Model):
 
     def __str__(self):
         return f"{self.eleve.user.get_full_name()} - {self.cours.matiere.nom} - {self.date} - {self.get_statut_display()}"
+
+class EmpreinteFaciale(models.Model):
+    """Empreinte (embedding) précalculée d'une photo de référence d'un élève"""
+    eleve = models.ForeignKey(Eleve, on_delete=models.CASCADE, related_name='empreintes')
+    # Vide pour la photo principale (Eleve.photo_reference)
+    photo_reference = models.ForeignKey(PhotoReference, on_delete=models.CASCADE, null=True, blank=True)
+    source = models.CharField(max_length=255)  # nom du fichier ayant servi au calcul
+    modele = models.CharField(max_length=20)  # calculateur d'empreintes utilisé
+    vecteur = models.BinaryField()  # float32, norme L2 = 1
+    qualite = models.FloatField(default=1.0)  # qualité de la photo source (0-1)
+    date_calcul = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ['eleve', 'photo_reference', 'modele']
+
+    def __str__(self):
+        return f"Empreinte {self.modele} - {self.eleve} - {self.source}"
+
+class EmailSortant(models.Model):
+    """Email aux parents en attente d'envoi (file traitée par la commande dispatch_emails)"""
+    TYPE_CHOICES = [
+        ('RECAP_SESSION', 'Récapitulatif de la séance'),
+        ('RECAP_JOUR', 'Récapitulatif de la journée'),
+    ]
+    STATUT_CHOICES = [
+        ('EN_ATTENTE', 'En attente'),
+        # Réservé par un processus d'envoi (ou en attente d'une nouvelle tentative) :
+        # un récapitulatif ne reçoit plus de changements
+        ('ENVOI', 'En cours d\'envoi'),
+        ('ENVOYE', 'Envoyé'),
+        ('ECHEC', 'Échec'),
+        ('ANNULE', 'Annulé'),
+    ]
+
+    type_email = models.CharField(max_length=20, choices=TYPE_CHOICES)
+    # Récapitulatifs : un email par parent et par séance (RECAP_SESSION) ou par jour (RECAP_JOUR)
+    parent = models.ForeignKey(Parent, on_delete=models.CASCADE, null=True, blank=True)
+    session_appel = models.ForeignKey(SessionAppel, on_delete=models.CASCADE, null=True, blank=True)
+    date = models.DateField(null=True, blank=True)
+    statut = models.CharField(max_length=20, choices=STATUT_CHOICES, default='EN_ATTENTE')
+    destinataire = models.EmailField(blank=True)  # renseigné à l'envoi
+    tentatives = models.PositiveSmallIntegerField(default=0)
+    prochain_essai = models.DateTimeField(default=timezone.now)
+    derniere_erreur = models.TextField(blank=True)
+    date_creation = models.DateTimeField(auto_now_add=True)
+    date_envoi = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['statut', 'prochain_essai'])]
+        constraints = [
+            # Un seul récapitulatif en attente par parent et par séance / par jour
+            models.UniqueConstraint(
+                fields=['parent', 'session_appel'],
+                condition=models.Q(type_email='RECAP_SESSION', statut='EN_ATTENTE'),
+                name='emailsortant_recap_session_unique',
+            ),
+            models.UniqueConstraint(
+                fields=['parent', 'date'],
+                condition=models.Q(type_email='RECAP_JOUR', statut='EN_ATTENTE'),
+                name='emailsortant_recap_jour_unique',
+            ),
+        ]
+
+    def __str__(self):
+        return f"Email {self.type_email} - {self.get_statut_display()}"
@@ -0,0 +1,104 @@
+"""
+Notifications (tableau de bord) aux parents lors des changements de présence.
+
+Les notifications d'une requête ou d'une session sont collectées dans un
+``NotificationBatch`` puis écrites en une seule requête (``bulk_create``).
+Elles sont construites à partir de données déjà chargées (présence avec
+élève, parent et cours joints, ou entrée du roster) : aucune relation n'est
+chargée à la demande.
+"""
+from .models import Notification, Presence
+
+# Relations chargées avec une présence pour construire sa notification
+PRESENCE_RELATED = ('eleve__user', 'eleve__parent', 'session_appel__cours__matiere')
+
+PARENT_DASHBOARD = '/parent/dashboard'
+
+
+def presence_notification(statut, parent_user_id, eleve_nom, matiere, date):
+    """
+    Notification (non enregistrée) d'un changement de statut, adressée au parent
+
+    Returns:
+        Notification, ou None si le statut ne donne pas lieu à une notification
+        ou si l'élève n'a pas de parent
+    """
+    if not parent_user_id:
+        return None
+    if statut == 'PRESENT':
+        return Notification(
+            destinataire_id=parent_user_id,
+            type_notification='PRESENCE',
+            titre=f"Présence confirmée - {eleve_nom}",
+            message=f"Votre enfant {eleve_nom} a été marqué présent au cours de {matiere} le {date.strftime('%d/%m/%Y')}",
+            lien=PARENT_DASHBOARD,
+        )
+    if statut in ['ABSENT', 'RETARD']:
+        return Notification(
+            destinataire_id=parent_user_id,
+            type_notification='ABSENCE' if statut == 'ABSENT' else 'RETARD',
+            titre=f"{statut.title()} - {eleve_nom}",
+            message=f"Votre enfant {eleve_nom} est {statut.lower()} au cours de {matiere} le {date.strftime('%d/%m/%Y')}.",
+            lien=PARENT_DASHBOARD,
+        )
+    return None
+
+
+class NotificationBatch:
+    """
+    Notifications en attente d'écriture, enregistrées ensemble par ``flush()``
+    (ou à la sortie du bloc ``with``).
+    """
+
+    def __init__(self):
+        self.notifications = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.flush()
+
+    def add(self, notification):
+        if notification is not None:
+            self.notifications.append(notification)
+
+    def add_presence(self, presence, statuts=('PRESENT', 'ABSENT', 'RETARD')):
+        """
+        Notification du statut courant d'une présence
+
+        Args:
+            presence: Presence (relations PRESENCE_RELATED chargées)
+            statuts: statuts donnant lieu à une notification
+        """
+        if presence.statut not in statuts or not presence.eleve.parent:
+            return
+        cours = presence.session_appel.cours
+        self.add(presence_notification(
+            presence.statut, presence.eleve.parent.user_id, presence.eleve.user.get_full_name(),
+            cours.matiere.nom, cours.date,
+        ))
+
+    def add_roster_entry(self, roster, entry, statut):
+        """Notification d'un élève du roster d'une session (aucune requête)"""
+        self.add(presence_notification(statut, entry['parent_user_id'], entry['nom'], roster['matiere'], roster['date']))
+
+    def add_presences(self, presence_ids, statuts=('PRESENT', 'ABSENT', 'RETARD')):
+        """
+        Notifications de plusieurs présences, chargées en une requête
+
+        Args:
+            presence_ids: ids des présences (liste ou sous-requête)
+            statuts: statuts donnant lieu à une notification
+        """
+        presences = Presence.objects.select_related(*PRESENCE_RELATED).filter(pk__in=presence_ids)
+        for presence in presences:
+            self.add_presence(presence, statuts)
+
+    def flush(self):
+        """Enregistre les notifications en attente ; retourne leur nombre"""
+        notifications, self.notifications = self.notifications, []
+        if notifications:
+            Notification.objects.bulk_create(notifications)
+        return len(notifications)
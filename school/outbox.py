@@ -0,0 +1,269 @@
+"""
+File d'envoi des emails aux parents.
+
+Les vues n'envoient plus d'email : elles ajoutent ou complètent une ligne
+``EmailSortant`` et répondent immédiatement. La commande
+``dispatch_emails`` traite la file en arrière-plan : les emails sont
+construits par lots (une requête par type de récapitulatif du lot) et
+envoyés sur une seule connexion au serveur SMTP, avec un débit limité et de
+nouvelles tentatives espacées en cas d'échec.
+
+Les changements de statut d'une séance sont regroupés : un parent reçoit un
+seul récapitulatif par séance (tous ses enfants), envoyé à la fin de l'appel
+ou au plus tard ``DIGEST_DELAY`` secondes après le premier changement. Les
+parents ayant choisi le récapitulatif quotidien (``Parent.recap_quotidien``)
+reçoivent un seul email par jour, à ``DAILY_DIGEST_TIME``. Un récapitulatif
+réservé pour l'envoi quitte le statut EN_ATTENTE : un changement ultérieur
+ouvre un nouveau récapitulatif au lieu d'être perdu.
+
+Les paramètres par défaut peuvent être surchargés via le dictionnaire
+``EMAIL_OUTBOX`` de ``FaceTrack/settings.py``.
+"""
+import logging
+import time
+from datetime import datetime, time as dt_time, timedelta
+
+from django.conf import settings
+from django.core.mail import get_connection
+from django.db import connection as db_connection, transaction
+from django.utils import timezone
+
+from .email_service import ParentNotificationService
+from .models import EmailSortant
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    # Nombre maximum d'emails traités par lot
+    'BATCH_SIZE': 50,
+    # Nombre maximum d'emails envoyés par seconde (0 : pas de limite)
+    'RATE_LIMIT': 5,
+    # Nombre de tentatives avant abandon d'un email
+    'MAX_ATTEMPTS': 5,
+    # Délai (s) avant la deuxième tentative, doublé à chaque échec
+    'RETRY_DELAY': 60,
+    # Délai (s) maximum entre deux tentatives
+    'RETRY_MAX_DELAY': 3600,
+    # Durée (s) pendant laquelle un lot réservé n'est pas repris par un
+    # autre processus d'envoi
+    'LEASE': 300,
+    # Délai (s) maximum entre le premier changement de statut d'une séance et
+    # l'envoi du récapitulatif aux parents (envoyé plus tôt si l'appel se termine)
+    'DIGEST_DELAY': 600,
+    # Heure d'envoi du récapitulatif quotidien (HH:MM, heure locale)
+    'DAILY_DIGEST_TIME': '18:00',
+}
+
+def get_setting(name):
+    """Retourne un paramètre de la file d'envoi en tenant compte des surcharges"""
+    overrides = getattr(settings, 'EMAIL_OUTBOX', {})
+    return overrides.get(name, DEFAULTS[name])
+
+
+def daily_digest_time(date):
+    """Date d'envoi du récapitulatif quotidien d'une journée"""
+    heure, minute = map(int, get_setting('DAILY_DIGEST_TIME').split(':'))
+    return timezone.make_aware(datetime.combine(date, dt_time(heure, minute)))
+
+
+def enqueue_parent_digest(parent_id, session_id, recap_quotidien=False):
+    """
+    Signale un changement de statut d'un enfant d'un parent pendant une séance.
+
+    Le changement rejoint le récapitulatif en attente du parent pour la séance
+    (ou pour la journée) s'il existe : plusieurs changements successifs ne
+    donnent lieu qu'à un seul email, construit à l'envoi avec les statuts à
+    jour.
+
+    Args:
+        parent_id: id du Parent (None : rien à envoyer)
+        session_id: id de la SessionAppel
+        recap_quotidien: le parent a choisi le récapitulatif quotidien
+
+    Returns:
+        EmailSortant en attente, ou None si l'élève n'a pas de parent
+    """
+    if parent_id is None:
+        return None
+    now = timezone.now()
+    if recap_quotidien:
+        today = timezone.localdate()
+        email, _ = EmailSortant.objects.get_or_create(
+            type_email='RECAP_JOUR', parent_id=parent_id, date=today, statut='EN_ATTENTE',
+            defaults={'prochain_essai': max(daily_digest_time(today), now + timedelta(seconds=get_setting('DIGEST_DELAY')))},
+        )
+    else:
+        email, _ = EmailSortant.objects.get_or_create(
+            type_email='RECAP_SESSION', parent_id=parent_id, session_appel_id=session_id, statut='EN_ATTENTE',
+            defaults={'prochain_essai': now + timedelta(seconds=get_setting('DIGEST_DELAY'))},
+        )
+    return email
+
+
+def flush_session_digests(session_id):
+    """Avance l'envoi des récapitulatifs en attente d'une séance terminée"""
+    return EmailSortant.objects.filter(
+        type_email='RECAP_SESSION', session_appel_id=session_id, statut='EN_ATTENTE',
+        prochain_essai__gt=timezone.now(),
+    ).update(prochain_essai=timezone.now())
+
+
+def prefetch_recaps(emails):
+    """Charge les présences des récapitulatifs d'un lot (une requête par type de récapitulatif)"""
+    sessions = ParentNotificationService.recap_presences_by_session(
+        (email.parent_id, email.session_appel_id) for email in emails if email.type_email == 'RECAP_SESSION'
+    )
+    jours = ParentNotificationService.recap_presences_by_day(
+        (email.parent_id, email.date) for email in emails if email.type_email == 'RECAP_JOUR'
+    )
+    for email in emails:
+        if email.type_email == 'RECAP_SESSION':
+            email.presences_recap = sessions[(email.parent_id, email.session_appel_id)]
+        elif email.type_email == 'RECAP_JOUR':
+            email.presences_recap = jours[(email.parent_id, email.date)]
+
+
+def build_message(email):
+    """Email à envoyer pour une ligne de la file (None : plus rien à envoyer)"""
+    presences = getattr(email, 'presences_recap', None)
+    if email.type_email == 'RECAP_SESSION':
+        return ParentNotificationService.build_recap_session_email(email.parent, email.session_appel_id, presences)
+    return ParentNotificationService.build_recap_jour_email(email.parent, email.date, presences)
+
+
+def retry_delay(tentatives):
+    """Délai avant la prochaine tentative après ``tentatives`` échecs"""
+    delay = get_setting('RETRY_DELAY') * 2 ** (tentatives - 1)
+    return timedelta(seconds=min(delay, get_setting('RETRY_MAX_DELAY')))
+
+
+def claim_rows(rows, lease_until):
+    """
+    Réserve des emails lus dans la file (compare-and-set).
+
+    Une ligne n'est réservée que si son statut et son ``prochain_essai`` sont
+    encore ceux qui ont été lus : si plusieurs processus d'envoi lisent les
+    mêmes lignes, chacune n'est réservée que par l'un d'eux.
+
+    Args:
+        rows: triplets (id, statut, prochain_essai) lus dans la file
+        lease_until: fin de la réservation
+
+    Returns:
+        ids des emails réservés par cet appel
+    """
+    return [
+        pk for pk, statut, prochain_essai in rows
+        if EmailSortant.objects.filter(pk=pk, statut=statut, prochain_essai=prochain_essai).update(
+            statut='ENVOI', prochain_essai=lease_until,
+        )
+    ]
+
+
+def claim_batch(batch_size=None):
+    """
+    Réserve un lot d'emails à envoyer.
+
+    Les emails réservés passent au statut ENVOI et ne sont plus proposés aux
+    autres processus d'envoi pendant ``LEASE`` secondes (le temps de les
+    envoyer) ; s'ils ne sont pas traités (processus arrêté), ils sont repris
+    après ce délai. Les emails à réessayer restent au statut ENVOI jusqu'à
+    leur prochaine tentative.
+
+    Returns:
+        liste d'EmailSortant, parents joints
+    """
+    batch_size = batch_size or get_setting('BATCH_SIZE')
+    now = timezone.now()
+    with transaction.atomic():
+        emails = EmailSortant.objects.filter(
+            statut__in=['EN_ATTENTE', 'ENVOI'], prochain_essai__lte=now,
+        ).order_by('prochain_essai')
+        if db_connection.features.has_select_for_update_skip_locked:
+            emails = emails.select_for_update(skip_locked=True)
+        rows = list(emails.values_list('id', 'statut', 'prochain_essai')[:batch_size])
+        ids = claim_rows(rows, now + timedelta(seconds=get_setting('LEASE')))
+    if not ids:
+        return []
+    return list(EmailSortant.objects.select_related('parent__user').filter(pk__in=ids).order_by('date_creation'))
+
+
+def _mark_failed(email, error):
+    email.tentatives += 1
+    email.derniere_erreur = error
+    if email.tentatives >= get_setting('MAX_ATTEMPTS'):
+        email.statut = 'ECHEC'
+        logger.error(f"Abandon de l'email {email.id} après {email.tentatives} tentatives: {error}")
+    else:
+        email.prochain_essai = timezone.now() + retry_delay(email.tentatives)
+        logger.warning(f"Échec de l'envoi de l'email {email.id} (tentative {email.tentatives}): {error}")
+
+
+def dispatch_batch(batch_size=None, connection=None, sleep=time.sleep):
+    """
+    Envoie un lot d'emails de la file sur une seule connexion.
+
+    Args:
+        batch_size: nombre maximum d'emails du lot (défaut : BATCH_SIZE)
+        connection: connexion au backend email (défaut : get_connection())
+        sleep: fonction d'attente utilisée pour limiter le débit
+
+    Returns:
+        nombre d'emails traités (envoyés, annulés ou en échec)
+    """
+    emails = claim_batch(batch_size)
+    if not emails:
+        return 0
+    prefetch_recaps(emails)
+
+    connection = connection or get_connection()
+    rate_limit = get_setting('RATE_LIMIT')
+    interval = 1 / rate_limit if rate_limit else 0
+    last_send = None
+    opened = False
+    try:
+        for email in emails:
+            try:
+                message = build_message(email)
+            except Exception as e:
+                _mark_failed(email, f"Construction: {e}")
+                continue
+            if message is None:
+                email.statut = 'ANNULE'
+                continue
+            email.destinataire = message.to[0]
+
+            if last_send is not None and interval:
+                wait = interval - (time.monotonic() - last_send)
+                if wait > 0:
+                    sleep(wait)
+            try:
+                if not opened:
+                    connection.open()
+                    opened = True
+                last_send = time.monotonic()
+                sent = connection.send_messages([message])
+            except Exception as e:
+                _mark_failed(email, str(e))
+                # La connexion peut être dans un état incertain : la rouvrir
+                connection.close()
+                opened = False
+                continue
+
+            if sent:
+                email.statut = 'ENVOYE'
+                email.date_envoi = timezone.now()
+                email.tentatives += 1
+                email.derniere_erreur = ''
+            else:
+                _mark_failed(email, "Email refusé par le serveur")
+    finally:
+        if opened:
+            connection.close()
+        EmailSortant.objects.bulk_update(
+            emails,
+            ['statut', 'destinataire', 'tentatives', 'prochain_essai', 'derniere_erreur', 'date_envoi'],
+        )
+
+    logger.info(f"{len(emails)} email(s) traité(s)")
+    return len(emails)
@@ -0,0 +1,114 @@
+"""
+Variantes réduites des photos de référence des élèves.
+
+Pour chaque photo sont générées, à côté de l'original :
+- ``thumb`` : miniature carrée (listes, avatars)
+- ``face`` : visage recadré (écrans de scan)
+
+en WebP si Pillow le prend en charge, sinon en JPEG. Le nom d'une variante
+est dérivé du nom de l'original : une nouvelle photo (nouveau nom de
+fichier) a donc de nouvelles variantes, et une variante déjà générée n'est
+jamais recalculée.
+"""
+import io
+import logging
+import posixpath
+
+import cv2
+import numpy as np
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps, features
+
+logger = logging.getLogger(__name__)
+
+# Côté (px) de chaque variante
+VARIANTS = {
+    'thumb': 128,
+    'face': 192,
+}
+
+if features.check('webp'):
+    FORMAT, EXTENSION = 'WEBP', 'webp'
+else:
+    FORMAT, EXTENSION = 'JPEG', 'jpg'
+
+
+def variant_name(name, variant):
+    """Nom de fichier d'une variante (``photos_eleves/variantes/<nom>_<variante>.webp``)"""
+    directory, filename = posixpath.split(name)
+    stem = posixpath.splitext(filename)[0]
+    return posixpath.join(directory, 'variantes', f'{stem}_{variant}.{EXTENSION}')
+
+
+def _face_box(image):
+    """Plus grand visage (top, right, bottom, left) d'une image PIL RGB, ou None"""
+    from .recognition import get_engine
+
+    frame = cv2.cvtColor(np.asarray(image), cv2.COLOR_RGB2BGR)
+    boxes = get_engine().detector.detect(frame, max_faces=1)
+    return boxes[0] if boxes else None
+
+
+def _face_crop(image, box):
+    from .recognition.ingest import crop_square
+
+    size = VARIANTS['face']
+    if box is None:
+        return ImageOps.fit(image, (size, size), Image.LANCZOS)
+    return Image.fromarray(crop_square(np.asarray(image), box, size))
+
+
+def _encode(image):
+    buffer = io.BytesIO()
+    image.save(buffer, format=FORMAT, quality=80)
+    return ContentFile(buffer.getvalue())
+
+
+def generate_variants(name, image=None, face_box=None, storage=None):
+    """
+    Génère les variantes manquantes d'une photo.
+
+    Args:
+        name: nom de la photo d'origine dans le stockage
+        image: photo déjà décodée (PIL), sinon lue depuis le stockage
+        face_box: visage (top, right, bottom, left) dans ``image`` s'il est
+            connu, sinon détecté
+
+    Returns:
+        noms des variantes créées
+    """
+    storage = storage or default_storage
+    missing = [variant for variant in VARIANTS if not storage.exists(variant_name(name, variant))]
+    if not missing:
+        return []
+
+    if image is None:
+        with storage.open(name) as f:
+            image = Image.open(f)
+            # Décodage JPEG directement à taille réduite
+            image.draft('RGB', (4 * VARIANTS['face'], 4 * VARIANTS['face']))
+            image = ImageOps.exif_transpose(image).convert('RGB')
+            face_box = None
+    else:
+        image = image.convert('RGB')
+
+    created = []
+    for variant in missing:
+        if variant == 'face':
+            variant_image = _face_crop(image, face_box if face_box is not None else _face_box(image))
+        else:
+            size = VARIANTS[variant]
+            variant_image = ImageOps.fit(image, (size, size), Image.LANCZOS)
+        created.append(storage.save(variant_name(name, variant), _encode(variant_image)))
+    return created
+
+
+def variant_url(field_file, variant):
+    """URL d'une variante d'une photo, ou de l'original si elle n'existe pas encore"""
+    if not field_file:
+        return None
+    name = variant_name(field_file.name, variant)
+    if field_file.storage.exists(name):
+        return field_file.storage.url(name)
+    return field_file.url
@@ -0,0 +1,140 @@
+"""
+Cartes QR imprimables des élèves.
+
+Une carte (500 x 600 px) contient le QR code de l'élève, son nom, son
+matricule et sa classe. Son identité (``card_key``) dépend uniquement de
+son contenu et de la version du gabarit : une carte déjà générée avec la
+même clé n'est jamais refaite. Ce module ne dépend pas de Django et peut
+s'exécuter dans les processus d'un pool ; les polices sont chargées une
+seule fois par processus.
+"""
+import functools
+import hashlib
+import io
+import json
+import os
+import tempfile
+import zipfile
+
+import qrcode
+from PIL import Image, ImageDraw, ImageFont
+
+# À incrémenter à chaque modification du gabarit des cartes
+CARD_TEMPLATE_VERSION = 1
+
+CARD_SIZE = (500, 600)
+QR_SIZE = 400
+
+# Page A4 à 150 dpi, 2 x 2 cartes par page
+PAGE_SIZE = (1240, 1754)
+PAGE_DPI = 150
+PAGE_GRID = (2, 2)
+
+FONT_CANDIDATES = ('arial.ttf', 'DejaVuSans.ttf', 'LiberationSans-Regular.ttf')
+
+
+@functools.lru_cache(maxsize=None)
+def load_font(size):
+    """Police TrueType du système (chargée une fois par processus et par taille)"""
+    for name in FONT_CANDIDATES:
+        try:
+            return ImageFont.truetype(name, size)
+        except OSError:
+            continue
+    try:
+        return ImageFont.load_default(size=size)
+    except TypeError:  # Pillow < 10.1
+        return ImageFont.load_default()
+
+
+def card_key(payload, nom, matricule, classe):
+    """Clé d'une carte : contenu affiché et version du gabarit"""
+    message = json.dumps([CARD_TEMPLATE_VERSION, payload, nom, matricule, classe])
+    return hashlib.sha256(message.encode()).hexdigest()[:16]
+
+
+def render_card(payload, nom, matricule, classe):
+    """Rendu d'une carte (image PIL RGB)"""
+    qr = qrcode.QRCode(
+        version=1,
+        error_correction=qrcode.constants.ERROR_CORRECT_L,
+        box_size=10,
+        border=4,
+    )
+    qr.add_data(payload)
+    qr.make(fit=True)
+    img = qr.make_image(fill_color="black", back_color="white").get_image()
+    img = img.convert('RGB').resize((QR_SIZE, QR_SIZE), Image.Resampling.NEAREST)
+
+    card = Image.new('RGB', CARD_SIZE, 'white')
+    draw = ImageDraw.Draw(card)
+    card.paste(img, (50, 50))
+
+    font_large, font_small = load_font(24), load_font(16)
+    draw.text((250, 20), "FaceTrack - QR Code Élève", fill='#007bff', anchor='mm', font=font_large)
+    draw.text((250, 470), nom, fill='black', anchor='mm', font=font_large)
+    draw.text((250, 500), f"Matricule: {matricule}", fill='black', anchor='mm', font=font_small)
+    draw.text((250, 525), f"Classe: {classe}", fill='black', anchor='mm', font=font_small)
+    return card
+
+
+def _write_atomic(path, data):
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+    with os.fdopen(fd, 'wb') as f:
+        f.write(data)
+    os.chmod(tmp, 0o644)  # fichiers servis en tant que médias
+    os.replace(tmp, path)
+
+
+def render_card_file(job):
+    """
+    Rend et enregistre une carte (exécuté dans un processus de travail).
+
+    Args:
+        job: (chemin du PNG, payload, nom, matricule, classe)
+
+    Returns:
+        chemin du PNG écrit
+    """
+    path, payload, nom, matricule, classe = job
+    buffer = io.BytesIO()
+    render_card(payload, nom, matricule, classe).save(buffer, format='PNG', optimize=True)
+    _write_atomic(path, buffer.getvalue())
+    return path
+
+
+def build_pdf(card_paths, path):
+    """PDF imprimable : cartes disposées en grille sur des pages A4"""
+    columns, rows = PAGE_GRID
+    per_page = columns * rows
+    margin_x = (PAGE_SIZE[0] - columns * CARD_SIZE[0]) // (columns + 1)
+    margin_y = (PAGE_SIZE[1] - rows * CARD_SIZE[1]) // (rows + 1)
+
+    pages = []
+    for start in range(0, len(card_paths), per_page):
+        page = Image.new('RGB', PAGE_SIZE, 'white')
+        for i, card_path in enumerate(card_paths[start:start + per_page]):
+            row, column = divmod(i, columns)
+            with Image.open(card_path) as card:
+                page.paste(card, (
+                    margin_x + column * (CARD_SIZE[0] + margin_x),
+                    margin_y + row * (CARD_SIZE[1] + margin_y),
+                ))
+        pages.append(page)
+    if not pages:
+        return None
+
+    buffer = io.BytesIO()
+    pages[0].save(buffer, format='PDF', save_all=True, append_images=pages[1:], resolution=PAGE_DPI)
+    _write_atomic(path, buffer.getvalue())
+    return path
+
+
+def build_zip(card_paths, path):
+    """Archive zip des cartes PNG (déjà compressées : stockées telles quelles)"""
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w', compression=zipfile.ZIP_STORED) as archive:
+        for card_path in card_paths:
+            archive.write(card_path, os.path.basename(card_path))
+    _write_atomic(path, buffer.getvalue())
+    return path
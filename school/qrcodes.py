@@ -0,0 +1,190 @@
+"""
+Rendu et cache des QR codes des élèves.
+
+Une image est identifiée par une clé dérivée (HMAC de SECRET_KEY) de son
+contenu et de ses paramètres de rendu : la même clé désigne toujours la
+même image. Les PNG rendus sont gardés en mémoire (LRU par processus) et
+sur disque (``QR_CODE_CACHE_DIR``), si bien qu'une page listant toute une
+classe ne refait aucun rendu PIL après le premier affichage.
+
+Le contenu d'un QR code d'élève est signé (``sign_qr_payload``) : il porte
+l'id de l'élève et celui de sa classe, vérifiables au scan sans requête.
+"""
+import base64
+import hashlib
+import hmac
+import io
+import json
+import os
+import re
+import tempfile
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+from django.utils.crypto import constant_time_compare, salted_hmac
+
+# À incrémenter si le rendu change (nouvelles images pour les mêmes paramètres)
+RENDER_VERSION = 1
+
+DEFAULT_PARAMS = {
+    'box_size': 10,
+    'border': 4,
+    'error_correction': 'L',
+    'fill_color': 'black',
+    'back_color': 'white',
+}
+
+# Contenu signé : FT1.<id élève>.<id classe>.<signature>, ids en base 36.
+# Uniquement des caractères du mode alphanumérique QR (QR codes plus petits).
+PAYLOAD_PREFIX = 'FT1'
+PAYLOAD_SALT = 'school.qrcodes.payload'
+SIGNATURE_BYTES = 10
+
+MEMORY_CACHE_SIZE = 1024
+KEY_PATTERN = re.compile(r'^[0-9a-f]{32}$')
+
+_memory = OrderedDict()
+_lock = threading.Lock()
+
+
+class InvalidQRCode(ValueError):
+    """QR code au format signé dont la signature est invalide"""
+
+
+def _base36(value):
+    digits = '0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ'
+    encoded = ''
+    while True:
+        value, remainder = divmod(value, 36)
+        encoded = digits[remainder] + encoded
+        if not value:
+            return encoded
+
+
+def _signature(message):
+    digest = salted_hmac(PAYLOAD_SALT, message, algorithm='sha256').digest()[:SIGNATURE_BYTES]
+    return base64.b32encode(digest).decode().rstrip('=')
+
+
+def sign_qr_payload(eleve_id, classe_id):
+    """Contenu signé du QR code d'un élève"""
+    message = f'{PAYLOAD_PREFIX}.{_base36(eleve_id)}.{_base36(classe_id)}'
+    return f'{message}.{_signature(message)}'
+
+
+def parse_qr_payload(data):
+    """
+    Vérifie le contenu d'un QR code scanné (sans accès à la base).
+
+    Returns:
+        (id élève, id classe), ou None si ce n'est pas un contenu signé
+        (ancienne carte portant seulement le matricule)
+
+    Raises:
+        InvalidQRCode: contenu au format signé mais falsifié ou illisible
+    """
+    data = (data or '').strip()
+    if not data.upper().startswith(f'{PAYLOAD_PREFIX}.'):
+        return None
+    parts = data.upper().split('.')
+    if len(parts) != 4:
+        raise InvalidQRCode('QR code invalide')
+    message = '.'.join(parts[:3])
+    if not constant_time_compare(parts[3], _signature(message)):
+        raise InvalidQRCode('QR code invalide')
+    try:
+        return int(parts[1], 36), int(parts[2], 36)
+    except ValueError:
+        raise InvalidQRCode('QR code invalide')
+
+
+def cache_dir():
+    return getattr(settings, 'QR_CODE_CACHE_DIR', os.path.join(settings.BASE_DIR, 'cache', 'qr_codes'))
+
+
+def qr_key(data, **params):
+    """Clé de l'image d'un contenu rendu avec les paramètres donnés"""
+    params = dict(DEFAULT_PARAMS, **params)
+    message = json.dumps([RENDER_VERSION, data, params], sort_keys=True).encode()
+    return hmac.new(settings.SECRET_KEY.encode(), message, hashlib.sha256).hexdigest()[:32]
+
+
+def _path(key):
+    return os.path.join(cache_dir(), key[:2], f'{key}.png')
+
+
+def render_qr_png(data, **params):
+    """Rendu PNG d'un QR code (sans cache)"""
+    import qrcode
+
+    params = dict(DEFAULT_PARAMS, **params)
+    qr = qrcode.QRCode(
+        version=1,
+        error_correction=getattr(qrcode.constants, f"ERROR_CORRECT_{params['error_correction']}"),
+        box_size=params['box_size'],
+        border=params['border'],
+    )
+    qr.add_data(data)
+    qr.make(fit=True)
+    img = qr.make_image(fill_color=params['fill_color'], back_color=params['back_color'])
+    buffered = io.BytesIO()
+    img.save(buffered, format="PNG")
+    return buffered.getvalue()
+
+
+def _remember(key, png):
+    with _lock:
+        _memory[key] = png
+        _memory.move_to_end(key)
+        while len(_memory) > MEMORY_CACHE_SIZE:
+            _memory.popitem(last=False)
+
+
+def cached_png(key):
+    """PNG d'une clé depuis la mémoire ou le disque, None s'il n'a jamais été rendu"""
+    with _lock:
+        png = _memory.get(key)
+        if png is not None:
+            _memory.move_to_end(key)
+            return png
+    try:
+        with open(_path(key), 'rb') as f:
+            png = f.read()
+    except OSError:
+        return None
+    _remember(key, png)
+    return png
+
+
+def get_qr_png(data, **params):
+    """
+    PNG d'un QR code, rendu seulement s'il n'est ni en mémoire ni sur disque.
+
+    Returns:
+        (clé, octets PNG)
+    """
+    key = qr_key(data, **params)
+    png = cached_png(key)
+    if png is not None:
+        return key, png
+
+    png = render_qr_png(data, **params)
+    path = _path(key)
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Écriture atomique : un lecteur concurrent ne voit jamais un fichier partiel
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+        with os.fdopen(fd, 'wb') as f:
+            f.write(png)
+        os.replace(tmp, path)
+    except OSError:
+        pass
+    _remember(key, png)
+    return key, png
+
+
+def get_qr_base64(data, **params):
+    """QR code en data URL PNG"""
+    _, png = get_qr_png(data, **params)
+    return f"data:image/png;base64,{base64.b64encode(png).decode()}"
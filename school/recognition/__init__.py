@@ -0,0 +1,8 @@
+from .embeddings import RecognitionUnavailable
+from .engine import RecognitionEngine, get_engine
+from .frames import FrameDecodeError, decode_frame
+from .pipeline import FrameDropped
+
+__all__ = [
+    'RecognitionEngine', 'get_engine', 'FrameDecodeError', 'FrameDropped', 'RecognitionUnavailable', 'decode_frame',
+]
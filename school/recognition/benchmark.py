@@ -0,0 +1,301 @@
+"""
+Banc d'essai de la reconnaissance sur des classes synthétiques.
+
+Chaque élève synthétique a des traits fixes (teint, cheveux, écart des
+yeux, bouche, texture de peau) tirés d'un générateur pseudo-aléatoire
+initialisé par une graine : les mesures sont reproductibles d'une machine
+à l'autre. Les images de classe contiennent K visages d'élèves connus,
+avec variations d'échelle, de luminosité et de bruit, et sont encodées en
+JPEG comme celles envoyées par le navigateur.
+
+Les mesures portent sur la chaîne réellement utilisée en production
+(``analyse_frame`` puis ``match_faces``), sans base de données.
+"""
+import math
+import platform
+import sys
+import time
+import tracemalloc
+
+import cv2
+import numpy as np
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+from .detector import FaceDetector
+from .engine import RecognitionEngine
+from .matching import match_faces
+from .pipeline import analyse_frame
+from .store import ReferenceSet
+
+# Taille de rendu canonique d'un visage (pixels)
+FACE_SIZE = 160
+# Recouvrement minimal entre une boîte détectée et la position réelle d'un visage
+MIN_IOU = 0.4
+# Images analysées sous ``tracemalloc`` pour la mesure de mémoire
+MEMORY_FRAMES = 5
+
+
+def student_traits(rng):
+    """Traits tirés au hasard d'un élève synthétique"""
+    return {
+        'skin': int(rng.integers(120, 210)),
+        'hair': int(rng.integers(10, 70)),
+        'tint': rng.uniform(0.85, 1.0, 3),
+        'eye_gap': float(rng.uniform(0.13, 0.17)),
+        'mouth': float(rng.uniform(0.08, 0.12)),
+        'texture': rng.normal(0, 18, (5, 5)).astype(np.float32),
+    }
+
+
+def render_face(traits, size, background=128):
+    """Dessine le visage d'un élève, carré de ``size`` pixels (BGR)"""
+    s = FACE_SIZE
+    c = s // 2
+    skin, hair = traits['skin'], traits['hair']
+    img = np.full((s, s), background, np.float32)
+
+    cv2.ellipse(img, (c, int(s * 0.45)), (int(s * 0.40), int(s * 0.45)), 0, 180, 360, hair, -1)
+    mask = np.zeros((s, s), np.uint8)
+    cv2.ellipse(mask, (c, int(s * 0.52)), (int(s * 0.34), int(s * 0.44)), 0, 0, 360, 1, -1)
+    texture = cv2.resize(traits['texture'], (s, s), interpolation=cv2.INTER_CUBIC)
+    img[mask == 1] = skin + texture[mask == 1]
+
+    ex, ey = int(s * traits['eye_gap']), int(s * 0.45)
+    for side in (-1, 1):
+        cv2.ellipse(img, (c + side * ex, ey - int(s * 0.08)), (int(s * 0.08), int(s * 0.018)), 0, 0, 360, hair, -1)
+        cv2.ellipse(img, (c + side * ex, ey), (int(s * 0.06), int(s * 0.03)), 0, 0, 360, skin // 3, -1)
+    cv2.line(img, (c, ey + 5), (c, int(s * 0.6)), skin * 0.8, 3)
+    cv2.ellipse(img, (c, int(s * 0.70)), (int(s * traits['mouth']), int(s * 0.025)), 0, 0, 360, skin // 2, -1)
+
+    img = cv2.GaussianBlur(img, (7, 7), 0)
+    color = np.clip(img[..., None] * traits['tint'], 0, 255).astype(np.uint8)
+    return cv2.resize(color, (size, size), interpolation=cv2.INTER_AREA)
+
+
+def iou(a, b):
+    """Recouvrement de deux boîtes (top, right, bottom, left)"""
+    top, bottom = max(a[0], b[0]), min(a[2], b[2])
+    left, right = max(a[3], b[3]), min(a[1], b[1])
+    inter = max(0, bottom - top) * max(0, right - left)
+    area_a = (a[2] - a[0]) * (a[1] - a[3])
+    area_b = (b[2] - b[0]) * (b[1] - b[3])
+    return inter / float(area_a + area_b - inter) if inter else 0.0
+
+
+class SyntheticClassroom:
+    """Classe synthétique de ``students`` élèves (identifiants 1..N)"""
+
+    def __init__(self, students, seed=0):
+        rng = np.random.default_rng(seed)
+        self.seed = seed
+        self.traits = {eleve_id: student_traits(rng) for eleve_id in range(1, students + 1)}
+
+    def reference_photo(self, eleve_id, size=240):
+        """Photo de référence : visage centré sur fond uni"""
+        photo = np.full((size + 80, size + 80, 3), 128, np.uint8)
+        photo[40:40 + size, 40:40 + size] = render_face(self.traits[eleve_id], size)
+        return photo
+
+    def frames(self, count, faces, width=1280, height=720):
+        """
+        Génère ``count`` images JPEG de ``faces`` élèves chacune.
+
+        Returns:
+            liste de (octets JPEG, [(eleve_id, boîte)])
+        """
+        rng = np.random.default_rng(self.seed + 1)
+        cols = math.ceil(math.sqrt(faces * width / height))
+        rows = math.ceil(faces / cols)
+        cell = min(width // cols, height // rows)
+        eleve_ids = list(self.traits)
+
+        frames = []
+        for _ in range(count):
+            frame = np.full((height, width, 3), int(rng.integers(90, 170)), np.uint8)
+            truth = []
+            for slot, eleve_id in enumerate(rng.choice(eleve_ids, size=faces, replace=False)):
+                size = int(cell * rng.uniform(0.65, 0.85))
+                row, col = divmod(slot, cols)
+                top = row * cell + int(rng.integers(0, cell - size + 1))
+                left = col * cell + int(rng.integers(0, cell - size + 1))
+                face = render_face(self.traits[int(eleve_id)], size, background=frame[0, 0, 0])
+                face = face.astype(np.float32) * rng.uniform(0.85, 1.15) + rng.normal(0, 4, face.shape)
+                frame[top:top + size, left:left + size] = np.clip(face, 0, 255).astype(np.uint8)
+                truth.append((int(eleve_id), (top, left + size, top + size, left)))
+            frames.append((cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, 85])[1].tobytes(), truth))
+        return frames
+
+
+def build_references(classroom, engine, photos=1):
+    """Empreintes de référence de la classe, calculées comme en production"""
+    eleve_ids, vectors = [], []
+    for eleve_id in classroom.traits:
+        for size in np.linspace(240, 180, photos).astype(int):
+            eleve_ids.append(eleve_id)
+            vectors.append(engine.embed_reference(classroom.reference_photo(eleve_id, int(size))))
+    names = {eleve_id: f'Élève {eleve_id}' for eleve_id in classroom.traits}
+    return ReferenceSet(np.array(eleve_ids), np.vstack(vectors).astype(np.float32), names)
+
+
+def score_frame(truth, boxes, matches):
+    """
+    Compare le résultat d'une image à la vérité terrain.
+
+    Returns:
+        (visages détectés, élèves correctement identifiés, élèves confondus,
+        fausses détections)
+    """
+    assigned = {face_index: eleve_id for face_index, eleve_id, _ in matches}
+    used = set()
+    detected = correct = wrong = 0
+    for eleve_id, true_box in truth:
+        candidates = [(iou(true_box, box), i) for i, box in enumerate(boxes) if i not in used]
+        overlap, index = max(candidates, default=(0.0, None))
+        if overlap < MIN_IOU:
+            continue
+        used.add(index)
+        detected += 1
+        if assigned.get(index) == eleve_id:
+            correct += 1
+        elif assigned.get(index) is not None:
+            wrong += 1
+    return detected, correct, wrong, len(boxes) - len(used)
+
+
+def _max_rss_mb():
+    if resource is None:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Octets sous macOS, kilo-octets sous Linux
+    return round(rss / (1024 * 1024) if sys.platform == 'darwin' else rss / 1024, 1)
+
+
+def run_benchmark(classroom, frames, embedder, thresholds, detection_width,
+                  scale_factor, min_neighbors, max_faces=40, photos=1):
+    """
+    Mesure une configuration du détecteur sur des images pré-générées.
+
+    Chaque image est analysée une fois ; la correspondance est ensuite
+    mesurée pour chaque seuil, la latence d'une configuration étant la
+    somme des deux. La mémoire (pic des allocations Python/NumPy, RSS
+    maximal du processus) est mesurée sur quelques images séparément.
+
+    Returns:
+        liste de résultats (un par seuil)
+    """
+    detector = FaceDetector(scale_factor=scale_factor, min_neighbors=min_neighbors)
+    engine = RecognitionEngine(detector=detector, embedder=embedder)
+    engine.detection_width = detection_width
+    references = build_references(classroom, engine, photos)
+
+    # Préchauffage (chargement de la cascade, allocations)
+    analyse_frame(detector, embedder, frames[0][0], None, 0.0, detection_width, max_faces)
+
+    analysis_times = []
+    match_times = {threshold: [] for threshold in thresholds}
+    totals = {threshold: np.zeros(4, dtype=np.int64) for threshold in thresholds}
+    for data, truth in frames:
+        start = time.perf_counter()
+        analysis = analyse_frame(detector, embedder, data, None, 0.0, detection_width, max_faces)
+        analysis_times.append(time.perf_counter() - start)
+
+        for threshold in thresholds:
+            start = time.perf_counter()
+            matches = match_faces(analysis.embeddings, references, threshold) if analysis.boxes else []
+            match_times[threshold].append(time.perf_counter() - start)
+            totals[threshold] += score_frame(truth, analysis.boxes, matches)
+
+    # Mémoire mesurée à part : le suivi des allocations fausserait les temps
+    tracemalloc.start()
+    for data, _ in frames[:MEMORY_FRAMES]:
+        analysis = analyse_frame(detector, embedder, data, None, 0.0, detection_width, max_faces)
+        if analysis.boxes:
+            match_faces(analysis.embeddings, references, thresholds[0])
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    faces_total = sum(len(truth) for _, truth in frames)
+    results = []
+    for threshold in thresholds:
+        latencies = (np.array(analysis_times) + np.array(match_times[threshold])) * 1000
+        detected, correct, wrong, false_boxes = (int(v) for v in totals[threshold])
+        results.append({
+            'students': len(classroom.traits),
+            'faces': len(frames[0][1]),
+            'embedder': embedder.name,
+            'detection_width': detection_width,
+            'scale_factor': scale_factor,
+            'min_neighbors': min_neighbors,
+            'threshold': threshold,
+            'frames': len(frames),
+            'fps': round(len(frames) / (latencies.sum() / 1000), 2),
+            'latency_ms': {
+                'p50': round(float(np.percentile(latencies, 50)), 2),
+                'p99': round(float(np.percentile(latencies, 99)), 2),
+                'mean': round(float(latencies.mean()), 2),
+            },
+            'memory_mb': {
+                'peak_traced': round(peak / (1024 * 1024), 2),
+                'max_rss': _max_rss_mb(),
+            },
+            'accuracy': {
+                'detection_recall': round(detected / faces_total, 4),
+                'identification_rate': round(correct / faces_total, 4),
+                'false_match_rate': round(wrong / max(correct + wrong, 1), 4),
+                'false_detections': false_boxes,
+            },
+        })
+    return results
+
+
+def result_key(result):
+    """Identifie une configuration pour la comparaison avec une référence"""
+    return tuple(result[name] for name in (
+        'students', 'faces', 'embedder', 'detection_width', 'scale_factor', 'min_neighbors', 'threshold'
+    ))
+
+
+def find_regressions(results, baseline, tolerance, accuracy_tolerance):
+    """
+    Compare des résultats à un fichier de référence.
+
+    Args:
+        tolerance: baisse relative de fps (et hausse de latence p99) tolérée
+        accuracy_tolerance: baisse absolue du taux d'identification tolérée
+
+    Returns:
+        liste de messages décrivant les régressions
+    """
+    previous = {result_key(result): result for result in baseline.get('results', [])}
+    regressions = []
+    for result in results:
+        before = previous.get(result_key(result))
+        if before is None:
+            continue
+        label = ', '.join(f'{k}={v}' for k, v in zip(
+            ('students', 'faces', 'embedder', 'width', 'scale', 'neighbors', 'threshold'), result_key(result)
+        ))
+        if result['fps'] < before['fps'] * (1 - tolerance):
+            regressions.append(f"{label}: fps {before['fps']} -> {result['fps']}")
+        if result['latency_ms']['p99'] > before['latency_ms']['p99'] * (1 + tolerance):
+            regressions.append(f"{label}: p99 {before['latency_ms']['p99']} ms -> {result['latency_ms']['p99']} ms")
+        rate, before_rate = result['accuracy']['identification_rate'], before['accuracy']['identification_rate']
+        if rate < before_rate - accuracy_tolerance:
+            regressions.append(f"{label}: identification {before_rate} -> {rate}")
+    return regressions
+
+
+def environment():
+    """Description de la machine et des bibliothèques, jointe aux résultats"""
+    return {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'processor': platform.processor() or platform.machine(),
+        'numpy': np.__version__,
+        'opencv': cv2.__version__,
+        'opencv_threads': cv2.getNumThreads(),
+    }
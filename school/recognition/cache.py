@@ -0,0 +1,102 @@
+"""
+Cache mémoire des empreintes de référence par classe.
+
+Chaque processus garde les matrices des classes récemment utilisées
+(politique LRU, taille bornée). Une entrée est identifiée par
+``(classe_id, version)`` : la version d'une classe est un compteur stocké
+dans le cache Django, incrémenté dès qu'un élève change de classe ou de
+photo. Avec un cache partagé (Redis, Memcached...), tous les workers voient
+donc l'invalidation ; avec le cache local par défaut, seul le processus
+courant la voit.
+
+La version d'une classe n'est relue dans le cache Django qu'au plus une
+fois par ``VERSION_CHECK_INTERVAL`` secondes et par processus (avec le
+cache en base de données, chaque lecture est une requête SQL) : une
+modification faite par un autre processus est vue au bout de ce délai au
+plus, et aussitôt dans le processus qui l'a faite.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from django.core.cache import cache
+
+from .config import get_setting
+
+VERSION_KEY = 'facial:embeddings_version:{classe_id}'
+
+# Versions lues par ce processus, avec la date de leur prochaine lecture :
+# {classe_id: (version, échéance)}
+_versions = {}
+
+
+def embeddings_version(classe_id):
+    """Version courante des empreintes d'une classe"""
+    return cache.get(VERSION_KEY.format(classe_id=classe_id), 0)
+
+
+def recent_embeddings_version(classe_id):
+    """Version des empreintes d'une classe, relue au plus une fois par ``VERSION_CHECK_INTERVAL``"""
+    now = time.monotonic()
+    known = _versions.get(classe_id)
+    if known is not None and known[1] > now:
+        return known[0]
+    version = embeddings_version(classe_id)
+    _versions[classe_id] = (version, now + get_setting('VERSION_CHECK_INTERVAL'))
+    return version
+
+
+def bump_embeddings_version(classe_id):
+    """Invalide les empreintes en cache d'une classe"""
+    if classe_id is None:
+        return
+    key = VERSION_KEY.format(classe_id=classe_id)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, 1, None)
+    _versions.pop(classe_id, None)
+
+
+class ReferenceCache:
+    """
+    Cache LRU des ReferenceSet par ``(classe_id, version)``.
+    """
+
+    def __init__(self, max_classes=None):
+        self.max_classes = max_classes or get_setting('REFERENCE_CACHE_SIZE')
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, classe_id, loader):
+        """
+        Retourne les références d'une classe, en appelant ``loader(classe_id)``
+        seulement si la version en cache est absente ou périmée.
+        """
+        key = (classe_id, recent_embeddings_version(classe_id))
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry
+
+        entry = loader(classe_id)
+
+        with self._lock:
+            self.misses += 1
+            for stale in [k for k in self._entries if k[0] == classe_id]:
+                del self._entries[stale]
+            self._entries[key] = entry
+            while len(self._entries) > self.max_classes:
+                self._entries.popitem(last=False)
+        return entry
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
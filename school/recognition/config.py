@@ -0,0 +1,61 @@
+"""
+Paramètres du moteur de reconnaissance faciale.
+
+Les valeurs par défaut peuvent être surchargées via le dictionnaire
+``FACIAL_RECOGNITION`` de ``FaceTrack/settings.py``.
+"""
+from django.conf import settings
+
+DEFAULTS = {
+    # Largeur maximale (px) de l'image passée au détecteur
+    'DETECTION_WIDTH': 640,
+    # Paramètres du détecteur Haar (OpenCV)
+    'SCALE_FACTOR': 1.1,
+    'MIN_NEIGHBORS': 5,
+    'MIN_FACE_SIZE': 40,
+    # Nombre maximum de visages traités par image
+    'MAX_FACES': 40,
+    # Similarité cosinus minimale pour accepter une correspondance (None :
+    # seuil calibré du calculateur d'empreintes, voir embeddings.py)
+    'MATCH_THRESHOLD': None,
+    # 'auto' (face_recognition si disponible), 'dlib' ou 'pixels'
+    'EMBEDDING_BACKEND': 'auto',
+    # Score de qualité minimum (0-1) d'une photo de référence utilisable
+    'QUALITY_MIN': 0.35,
+    # Facteur appliqué à la similarité d'une photo de qualité nulle
+    # (1 pour ignorer la qualité lors de la correspondance)
+    'QUALITY_WEIGHT_FLOOR': 0.8,
+    # Côté (px) des photos de référence normalisées à l'import
+    'PHOTO_SIZE': 400,
+    # Nombre de classes gardées en mémoire par processus
+    'REFERENCE_CACHE_SIZE': 64,
+    # Délai (s) entre deux lectures de la version des empreintes d'une classe
+    'VERSION_CHECK_INTERVAL': 1.0,
+    # Nombre d'images de la fenêtre glissante de votes
+    'VOTE_WINDOW': 10,
+    # Score cumulé sur la fenêtre nécessaire pour valider une présence
+    'VOTE_COMMIT_SCORE': 2.0,
+    # Nombre de sessions d'appel suivies simultanément par processus
+    'VOTE_MAX_SESSIONS': 256,
+    # Différence moyenne (0-1) en dessous de laquelle une image est jugée
+    # identique à la précédente (0 pour désactiver le filtre)
+    'MOTION_THRESHOLD': 0.02,
+    # Nombre maximum d'images consécutives sautées avant une analyse complète
+    'MOTION_MAX_SKIPS': 5,
+    # Processus d'analyse (0 : analyse dans le processus du serveur)
+    'WORKERS': 0,
+    # Taille (octets) des segments de mémoire partagée transportant les images
+    'FRAME_SLOT_SIZE': 2621440,
+    # Taille maximale (octets) d'une requête d'image reçue par l'API
+    'MAX_FRAME_SIZE': 2621440,
+    # Âge maximum (s) d'une image en attente avant abandon
+    'MAX_FRAME_AGE': 2.0,
+    # Attente maximum (s) du résultat d'une analyse
+    'FRAME_TIMEOUT': 5.0,
+}
+
+
+def get_setting(name):
+    """Retourne un paramètre de reconnaissance en tenant compte des surcharges"""
+    overrides = getattr(settings, 'FACIAL_RECOGNITION', {})
+    return overrides.get(name, DEFAULTS[name])
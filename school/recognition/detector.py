@@ -0,0 +1,56 @@
+"""
+Détection de visages (cascade de Haar OpenCV).
+"""
+import threading
+
+import cv2
+
+from .config import get_setting
+
+CASCADE_FILE = 'haarcascade_frontalface_default.xml'
+
+
+class FaceDetector:
+    """
+    Détecteur de visages basé sur la cascade frontale d'OpenCV.
+
+    ``CascadeClassifier`` n'étant pas sûr entre threads, chaque thread
+    du serveur possède sa propre instance.
+    """
+
+    def __init__(self, scale_factor=None, min_neighbors=None, min_size=None):
+        self.scale_factor = scale_factor or get_setting('SCALE_FACTOR')
+        self.min_neighbors = min_neighbors or get_setting('MIN_NEIGHBORS')
+        self.min_size = min_size or get_setting('MIN_FACE_SIZE')
+        self._local = threading.local()
+
+    @property
+    def cascade(self):
+        cascade = getattr(self._local, 'cascade', None)
+        if cascade is None:
+            cascade = cv2.CascadeClassifier(cv2.data.haarcascades + CASCADE_FILE)
+            if cascade.empty():
+                raise RuntimeError(f'Impossible de charger la cascade {CASCADE_FILE}')
+            self._local.cascade = cascade
+        return cascade
+
+    def detect(self, frame, max_faces=None):
+        """
+        Détecte les visages d'une image BGR.
+
+        Returns:
+            liste de boîtes (top, right, bottom, left), les plus grandes d'abord
+        """
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY) if frame.ndim == 3 else frame
+        gray = cv2.equalizeHist(gray)
+        rects = self.cascade.detectMultiScale(
+            gray,
+            scaleFactor=self.scale_factor,
+            minNeighbors=self.min_neighbors,
+            minSize=(self.min_size, self.min_size),
+        )
+        boxes = [(int(y), int(x + w), int(y + h), int(x)) for (x, y, w, h) in rects]
+        boxes.sort(key=lambda b: (b[2] - b[0]) * (b[1] - b[3]), reverse=True)
+        if max_faces:
+            boxes = boxes[:max_faces]
+        return boxes
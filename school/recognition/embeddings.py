@@ -0,0 +1,122 @@
+"""
+Calcul des empreintes (embeddings) de visages.
+
+Deux implémentations sont disponibles :
+- ``DlibEmbedder`` : modèle ResNet de ``face_recognition`` (128 dimensions)
+- ``PixelEmbedder`` : vecteur de pixels normalisés, sans dépendance lourde,
+  réservé au développement (``EMBEDDING_BACKEND = 'pixels'``)
+
+Toutes les empreintes sont des vecteurs float32 de norme 1, ce qui permet
+de comparer par simple produit scalaire (similarité cosinus). Chaque
+calculateur a son propre seuil de correspondance (``match_threshold``).
+
+En mode 'auto' sans ``face_recognition``, les empreintes pixels restent
+calculées (miniatures, index des références) mais le calculateur est marqué
+``fallback`` : le moteur refuse alors d'enregistrer des présences.
+"""
+import logging
+
+import cv2
+import numpy as np
+
+from .config import get_setting
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_rows(matrix):
+    """Normalise chaque ligne d'une matrice à une norme L2 de 1"""
+    matrix = np.asarray(matrix, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+class PixelEmbedder:
+    """
+    Empreinte de secours : visage recadré, en niveaux de gris, égalisé et
+    réduit à ``size`` x ``size`` pixels.
+
+    Peu discriminante (voir ``benchmark_recognition --embedder pixels``) :
+    seuil élevé, pour le développement uniquement.
+    """
+    name = 'pixels'
+    # benchmark_recognition (30 élèves, 1 et 10 visages) : confusions de 30 %
+    # et 18 % à 0.6, de 0 % et 7 % à 0.9
+    match_threshold = 0.9
+
+    def __init__(self, size=32, fallback=False):
+        self.size = size
+        self.dimension = size * size
+        # Choisi faute de face_recognition et non explicitement configuré
+        self.fallback = fallback
+
+    def embed(self, frame, boxes):
+        """
+        Calcule les empreintes de tous les visages d'une image en un lot.
+
+        Returns:
+            matrice float32 (len(boxes), dimension)
+        """
+        if not boxes:
+            return np.empty((0, self.dimension), dtype=np.float32)
+
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY) if frame.ndim == 3 else frame
+        batch = np.empty((len(boxes), self.size, self.size), dtype=np.uint8)
+        for i, (top, right, bottom, left) in enumerate(boxes):
+            crop = gray[max(top, 0):bottom, max(left, 0):right]
+            crop = cv2.resize(crop, (self.size, self.size), interpolation=cv2.INTER_AREA)
+            batch[i] = cv2.equalizeHist(crop)
+
+        vectors = batch.reshape(len(boxes), -1).astype(np.float32)
+        vectors -= vectors.mean(axis=1, keepdims=True)
+        return normalize_rows(vectors)
+
+
+class DlibEmbedder:
+    """Empreinte 128-d calculée par ``face_recognition`` (dlib)"""
+    name = 'dlib'
+    dimension = 128
+    # Tolérance standard de dlib (distance euclidienne 0.6), soit une
+    # similarité cosinus d'environ 0.82 entre empreintes normalisées
+    match_threshold = 0.82
+    fallback = False
+
+    def __init__(self):
+        import face_recognition
+        self._face_recognition = face_recognition
+
+    def embed(self, frame, boxes):
+        if not boxes:
+            return np.empty((0, self.dimension), dtype=np.float32)
+        rgb = np.ascontiguousarray(frame[:, :, ::-1])
+        encodings = self._face_recognition.face_encodings(rgb, known_face_locations=boxes, model='small')
+        return normalize_rows(np.stack(encodings))
+
+
+class RecognitionUnavailable(Exception):
+    """Reconnaissance impossible : modèle d'empreintes fiable indisponible"""
+
+
+def create_embedder(backend=None):
+    """Instancie le calculateur d'empreintes configuré"""
+    backend = backend or get_setting('EMBEDDING_BACKEND')
+    if backend in ('auto', 'dlib'):
+        try:
+            return DlibEmbedder()
+        except ImportError:
+            if backend == 'dlib':
+                raise
+            logger.error(
+                "face_recognition indisponible : empreintes pixels sans enregistrement des présences "
+                "(installer face_recognition, ou EMBEDDING_BACKEND = 'pixels' en développement)"
+            )
+            return PixelEmbedder(fallback=True)
+    logger.warning("Empreintes pixels : reconnaissance peu fiable, réservée au développement")
+    return PixelEmbedder()
+
+
+def match_threshold(embedder):
+    """Seuil de correspondance : MATCH_THRESHOLD s'il est défini, sinon celui du calculateur"""
+    threshold = get_setting('MATCH_THRESHOLD')
+    return embedder.match_threshold if threshold is None else threshold
@@ -0,0 +1,240 @@
+"""
+Moteur de reconnaissance faciale utilisé par l'appel en classe.
+
+Une seule instance est créée par processus (voir ``get_engine``) afin de
+ne charger le détecteur et le modèle d'empreintes qu'une fois.
+"""
+import logging
+import threading
+
+from django.utils import timezone
+
+from ..live import notify_presence_change
+from ..models import Presence
+from ..notifications import NotificationBatch
+from .cache import ReferenceCache
+from .config import get_setting
+from .detector import FaceDetector
+from .embeddings import RecognitionUnavailable, create_embedder, match_threshold
+from .matching import match_faces
+from .motion import MotionGate, PipelineStats
+from .pipeline import FrameAnalysis, FrameDropped, analyse_frame, analyse_reference
+from .store import load_class_references
+from .votes import SessionVotes
+from .workers import create_pool
+
+logger = logging.getLogger(__name__)
+
+
+class RecognitionEngine:
+    """
+    Chaîne complète : décodage -> détection -> empreintes -> correspondance
+    -> enregistrement des présences.
+    """
+
+    def __init__(self, detector=None, embedder=None):
+        self.detector = detector or FaceDetector()
+        self.embedder = embedder or create_embedder()
+        self.threshold = match_threshold(self.embedder)
+        self.detection_width = get_setting('DETECTION_WIDTH')
+        self.max_faces = get_setting('MAX_FACES')
+        self.references = ReferenceCache()
+        self.votes = SessionVotes()
+        self.motion = MotionGate()
+        self.stats = PipelineStats()
+        self._pool = None
+        self._pool_ready = False
+        self._pool_lock = threading.Lock()
+
+    @property
+    def pool(self):
+        """Pool de processus d'analyse, créé à la première image (None si désactivé)"""
+        if not self._pool_ready:
+            with self._pool_lock:
+                if not self._pool_ready:
+                    self._pool = create_pool(self.detector, self.embedder, {
+                        'motion_threshold': self.motion.threshold,
+                        'detection_width': self.detection_width,
+                        'max_faces': self.max_faces,
+                    })
+                    self._pool_ready = True
+        return self._pool
+
+    # ------------------------------------------------------------------
+    # Références
+    # ------------------------------------------------------------------
+    def embed_reference(self, image):
+        """Empreinte d'une photo de référence (plus grand visage, sinon image entière)"""
+        return self.analyse_reference(image)[0]
+
+    def analyse_reference(self, image):
+        """
+        Empreinte et qualité d'une photo de référence.
+
+        Returns:
+            (empreinte, PhotoQuality)
+        """
+        return analyse_reference(self.detector, self.embedder, image, self.detection_width)
+
+    def load_references(self, classe_id):
+        """Empreintes de référence d'une classe, lues depuis l'index persistant"""
+        return load_class_references(classe_id, self.embedder.name, self.embedder.dimension)
+
+    def get_references(self, classe_id):
+        """Empreintes de référence d'une classe, servies depuis le cache mémoire"""
+        return self.references.get(classe_id, self.load_references)
+
+    # ------------------------------------------------------------------
+    # Reconnaissance
+    # ------------------------------------------------------------------
+    def analyse(self, session_id, image_data):
+        """
+        Partie coûteuse de la reconnaissance (décodage, filtre de mouvement,
+        détection, empreintes), dans le pool de processus s'il est configuré.
+        """
+        reference_thumbnail = self.motion.reference(session_id)
+        if self.pool is not None:
+            return self.pool.analyse(session_id, image_data, reference_thumbnail)
+        return analyse_frame(
+            self.detector, self.embedder, image_data, reference_thumbnail,
+            self.motion.threshold, self.detection_width, self.max_faces,
+        )
+
+    def match(self, analysis, classe_id):
+        """
+        Correspondance des empreintes d'une image avec la classe.
+
+        Returns:
+            (boîtes, correspondances, noms des élèves)
+        """
+        if not analysis.boxes:
+            self.stats.increment('no_face_skipped')
+            return [], [], {}
+
+        self.stats.increment('embedded')
+        self.stats.increment('faces_embedded', len(analysis.boxes))
+        references = self.get_references(classe_id)
+        matches = match_faces(analysis.embeddings, references, self.threshold)
+        return analysis.boxes, matches, references.names
+
+    def recognize(self, session_appel, image_data):
+        """
+        Reconnaît les élèves présents sur une image et met à jour l'appel.
+
+        Args:
+            session_appel: SessionAppel en cours
+            image_data: image encodée (octets, base64 ou data URL)
+
+        Returns:
+            liste de dictionnaires décrivant chaque visage détecté
+
+        Raises:
+            FrameDropped: image abandonnée par le pool (contre-pression)
+            RecognitionUnavailable: empreintes pixels de secours (face_recognition
+                non installé), inutilisables pour l'appel
+        """
+        if self.embedder.fallback:
+            raise RecognitionUnavailable(
+                "Reconnaissance faciale indisponible : face_recognition n'est pas installé sur le serveur"
+            )
+        self.stats.increment('frames')
+        analysis = self.analyse(session_appel.id, image_data)
+
+        if analysis.status == FrameAnalysis.STALE:
+            self.stats.increment('dropped')
+            raise FrameDropped('Image abandonnée, une analyse est déjà en cours')
+
+        votes = self.votes.get(session_appel.id)
+        if analysis.status == FrameAnalysis.STATIC:
+            # Image quasi identique à la précédente : même résultat affiché, sans
+            # détection. Il ne compte pas comme un nouveau vote : une image fixe
+            # répétée ne doit pas suffire à valider une présence.
+            self.stats.increment('motion_skipped')
+            boxes, matches, names = self.motion.reuse(session_appel.id)
+        else:
+            result = self.match(analysis, session_appel.cours.classe_id)
+            self.motion.remember(session_appel.id, analysis.thumbnail, result)
+            boxes, matches, names = result
+
+            committed = dict(votes.add_frame({
+                eleve_id: score for _, eleve_id, score in matches if eleve_id is not None
+            }))
+            if committed:
+                self.record_presences(session_appel, committed)
+
+        detected_faces = []
+        for face_index, eleve_id, score in matches:
+            top, right, bottom, left = boxes[face_index]
+            confidence = round(min(max(score, 0.0), 1.0), 3)
+            detected_faces.append({
+                'eleve_id': eleve_id,
+                'name': names.get(eleve_id) if eleve_id else None,
+                'confidence': confidence,
+                'confirmed': eleve_id is not None and votes.is_committed(eleve_id),
+                'box': {'top': top, 'right': right, 'bottom': bottom, 'left': left},
+            })
+        return detected_faces
+
+    def record_presences(self, session_appel, committed):
+        """
+        Marque présents les élèves validés par le vote (méthode FACIAL).
+
+        Seules les présences encore ABSENT sont modifiées : un élève déjà
+        pointé (QR code, manuel) garde son statut. Les parents des élèves
+        marqués présents sont notifiés ensemble.
+
+        Args:
+            committed: dictionnaire {eleve_id: niveau de confiance}
+        """
+        now = timezone.now()
+        notified = []
+        for eleve_id, confidence in committed.items():
+            updated = Presence.objects.filter(
+                session_appel=session_appel,
+                eleve_id=eleve_id,
+                statut='ABSENT',
+            ).update(
+                statut='PRESENT',
+                methode_detection='FACIAL',
+                heure_arrivee=now.time(),
+                niveau_confiance=confidence,
+                date_modification=now,
+            )
+            if updated:
+                notified.append(eleve_id)
+            else:
+                _, created = Presence.objects.get_or_create(
+                    session_appel=session_appel,
+                    eleve_id=eleve_id,
+                    defaults={
+                        'statut': 'PRESENT',
+                        'methode_detection': 'FACIAL',
+                        'heure_arrivee': now.time(),
+                        'niveau_confiance': confidence,
+                    }
+                )
+                if created:
+                    notified.append(eleve_id)
+
+        if notified:
+            # Présences modifiées ou créées : écran d'appel en direct et parents
+            notify_presence_change(session_appel.pk)
+            with NotificationBatch() as notifications:
+                notifications.add_presences(
+                    Presence.objects.filter(session_appel=session_appel, eleve_id__in=notified).values('pk'),
+                    statuts=['PRESENT'],
+                )
+
+
+_engine = None
+_engine_lock = threading.Lock()
+
+
+def get_engine():
+    """Retourne le moteur partagé du processus (créé au premier appel)"""
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                _engine = RecognitionEngine()
+    return _engine
@@ -0,0 +1,72 @@
+"""
+Décodage des images envoyées par le navigateur.
+"""
+import base64
+import binascii
+
+import cv2
+import numpy as np
+
+
+class FrameDecodeError(ValueError):
+    """Image reçue illisible ou vide"""
+
+
+def frame_bytes(data):
+    """
+    Octets de l'image encodée.
+
+    Args:
+        data: octets bruts, chaîne base64 ou data URL ("data:image/jpeg;base64,...")
+    """
+    if isinstance(data, str):
+        if data.startswith('data:'):
+            data = data.split(',', 1)[-1]
+        try:
+            data = base64.b64decode(data, validate=False)
+        except (binascii.Error, ValueError) as e:
+            raise FrameDecodeError(f'Image base64 invalide: {e}')
+    return data
+
+
+def decode_frame(data):
+    """
+    Décode une image JPEG/PNG en tableau NumPy BGR, sans copie intermédiaire
+    des octets reçus.
+
+    Args:
+        data: octets bruts (bytes, memoryview), chaîne base64 ou data URL
+    """
+    data = frame_bytes(data)
+    if not data:
+        raise FrameDecodeError('Image vide')
+
+    buffer = np.frombuffer(data, dtype=np.uint8)
+    frame = cv2.imdecode(buffer, cv2.IMREAD_COLOR)
+    if frame is None:
+        raise FrameDecodeError('Format d\'image non reconnu')
+    return frame
+
+
+def load_image(path):
+    """Charge une image depuis le disque en BGR (None si illisible)"""
+    try:
+        with open(path, 'rb') as f:
+            return decode_frame(f.read())
+    except (OSError, FrameDecodeError):
+        return None
+
+
+def resize_to_width(frame, max_width):
+    """
+    Réduit l'image à ``max_width`` pixels de large en conservant le ratio.
+
+    Returns:
+        (image redimensionnée, facteur d'échelle appliqué)
+    """
+    height, width = frame.shape[:2]
+    if not max_width or width <= max_width:
+        return frame, 1.0
+    scale = max_width / float(width)
+    resized = cv2.resize(frame, (max_width, int(round(height * scale))), interpolation=cv2.INTER_AREA)
+    return resized, scale
@@ -0,0 +1,153 @@
+"""
+Préparation en masse des photos de référence (import de rentrée).
+
+Les fonctions de ce module n'accèdent pas à la base de données : elles
+s'exécutent dans les processus d'un pool. Chaque photo est décodée à
+résolution réduite, redressée selon son orientation EXIF, recadrée en
+carré autour du plus grand visage (format 4x4 des photos d'identité),
+redimensionnée à ``PHOTO_SIZE`` puis encodée en JPEG avec son empreinte
+et sa qualité. Seule l'écriture (fichiers et lignes) reste au processus
+appelant.
+"""
+import io
+import os
+import zipfile
+
+import cv2
+import numpy as np
+from PIL import Image, ImageOps
+
+from .config import get_setting
+from .detector import FaceDetector
+from .embeddings import create_embedder
+from .pipeline import analyse_reference
+from .store import vector_to_bytes
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp', '.webp')
+# Marge autour du visage, en proportion de sa taille, dans le carré recadré
+FACE_MARGIN = 0.6
+
+# Modèles et archives ouvertes du processus de travail
+_models = None
+_archives = {}
+
+
+def list_photos(source):
+    """
+    Photos d'un dossier (récursif) ou d'une archive zip.
+
+    Returns:
+        liste de (chemin dans la source, matricule déduit du nom de fichier)
+    """
+    if zipfile.is_zipfile(source):
+        with zipfile.ZipFile(source) as archive:
+            names = [info.filename for info in archive.infolist() if not info.is_dir()]
+    else:
+        names = [
+            os.path.relpath(os.path.join(root, filename), source)
+            for root, _, filenames in os.walk(source)
+            for filename in filenames
+        ]
+
+    photos = []
+    for name in sorted(names):
+        stem, extension = os.path.splitext(os.path.basename(name))
+        if extension.lower() in IMAGE_EXTENSIONS and not stem.startswith('.'):
+            photos.append((name, stem.strip().upper()))
+    return photos
+
+
+def load_models(backend):
+    """Charge le détecteur et le modèle d'empreintes du processus courant"""
+    global _models
+    _models = (FaceDetector(), create_embedder(backend))
+
+
+def init_worker(backend):
+    """Initialisation d'un processus de travail (pool créé par fork)"""
+    from .workers import _init_worker
+    _init_worker()
+    load_models(backend)
+
+
+def _read(source, name):
+    if source not in _archives and zipfile.is_zipfile(source):
+        _archives[source] = zipfile.ZipFile(source)
+    if source in _archives:
+        return _archives[source].read(name)
+    with open(os.path.join(source, name), 'rb') as f:
+        return f.read()
+
+
+def decode_photo(data, min_side):
+    """
+    Décode une photo en BGR, redressée selon l'EXIF.
+
+    Les JPEG sont décodés directement à une résolution réduite (au moins
+    ``min_side`` pixels de côté), ce qui évite de décompresser des photos
+    d'appareil de 12 mégapixels en entier.
+    """
+    with Image.open(io.BytesIO(data)) as image:
+        image.draft('RGB', (min_side, min_side))
+        image = ImageOps.exif_transpose(image).convert('RGB')
+        return cv2.cvtColor(np.asarray(image), cv2.COLOR_RGB2BGR)
+
+
+def crop_square(image, box, size):
+    """Carré centré sur le visage, complété par duplication des bords si besoin"""
+    top, right, bottom, left = box
+    side = int(max(bottom - top, right - left) * (1 + 2 * FACE_MARGIN))
+    center_x, center_y = (left + right) // 2, (top + bottom) // 2
+    x0, y0 = center_x - side // 2, center_y - side // 2
+
+    height, width = image.shape[:2]
+    pad = max(0, -x0, -y0, x0 + side - width, y0 + side - height)
+    if pad:
+        image = cv2.copyMakeBorder(image, pad, pad, pad, pad, cv2.BORDER_REPLICATE)
+        x0, y0 = x0 + pad, y0 + pad
+    crop = image[y0:y0 + side, x0:x0 + side]
+    interpolation = cv2.INTER_AREA if side > size else cv2.INTER_CUBIC
+    return cv2.resize(crop, (size, size), interpolation=interpolation)
+
+
+def prepare_photo(source, name, matricule):
+    """
+    Prépare une photo (exécuté dans un processus de travail).
+
+    Returns:
+        dictionnaire : matricule, name, et soit ``error``, soit ``jpeg``,
+        ``vecteur`` (octets float32), ``qualite`` et ``reason``
+    """
+    detector, embedder = _models
+    size = get_setting('PHOTO_SIZE')
+    detection_width = get_setting('DETECTION_WIDTH')
+    result = {'matricule': matricule, 'name': name}
+
+    try:
+        image = decode_photo(_read(source, name), 3 * size)
+    except Exception as e:
+        result['error'] = f'illisible ({e})'
+        return result
+
+    # Visage cherché sur l'image réduite, recadrage sur l'image d'origine
+    small_scale = min(1.0, detection_width / float(image.shape[1]))
+    small = cv2.resize(image, None, fx=small_scale, fy=small_scale, interpolation=cv2.INTER_AREA)
+    boxes = detector.detect(small, max_faces=1)
+    if not boxes:
+        result['error'] = 'aucun visage détecté'
+        return result
+
+    box = tuple(int(round(v / small_scale)) for v in boxes[0])
+    photo = crop_square(image, box, size)
+    vector, quality = analyse_reference(detector, embedder, photo, detection_width)
+    scale = min(1.0, detection_width / float(size))
+
+    result.update({
+        'jpeg': cv2.imencode('.jpg', photo, [cv2.IMWRITE_JPEG_QUALITY, 90])[1].tobytes(),
+        # Visage dans la photo normalisée, pour le recadrage des miniatures
+        'face_box': tuple(int(round(v / scale)) for v in quality.box) if quality.box else None,
+        'vecteur': vector_to_bytes(vector),
+        'qualite': quality.score,
+        'reason': quality.reason if not quality.usable else '',
+    })
+    return result
@@ -0,0 +1,140 @@
+"""
+Comparaison des visages détectés avec les photos de référence d'une classe.
+
+Tous les visages d'une image sont comparés à tous les élèves en une seule
+opération matricielle, puis une affectation un-à-un (algorithme hongrois)
+garantit qu'un élève n'est attribué qu'à un seul visage.
+"""
+import numpy as np
+
+try:
+    from scipy.optimize import linear_sum_assignment as _scipy_linear_sum_assignment
+except ImportError:
+    _scipy_linear_sum_assignment = None
+
+
+def similarity_matrix(faces, references):
+    """
+    Similarité cosinus entre chaque visage et chaque référence.
+
+    Args:
+        faces: matrice (n_visages, d) normalisée
+        references: matrice (n_references, d) normalisée
+
+    Returns:
+        matrice (n_visages, n_references)
+    """
+    if len(faces) == 0 or len(references) == 0:
+        return np.zeros((len(faces), len(references)), dtype=np.float32)
+    return faces @ references.T
+
+
+def student_scores(scores, group_starts):
+    """
+    Réduit une matrice visages x photos en visages x élèves (meilleure photo
+    de chaque élève). Les photos d'un même élève doivent être contiguës.
+    """
+    if scores.shape[1] == 0:
+        return scores
+    return np.maximum.reduceat(scores, group_starts, axis=1)
+
+
+def _hungarian(cost):
+    """
+    Affectation de coût minimal pour une matrice (n, m) avec n <= m.
+
+    Returns:
+        pour chaque ligne, l'indice de la colonne affectée
+    """
+    n, m = cost.shape
+    u = np.zeros(n + 1)
+    v = np.zeros(m + 1)
+    p = np.zeros(m + 1, dtype=np.int64)  # p[j] : ligne (1-indexée) affectée à la colonne j
+    way = np.zeros(m + 1, dtype=np.int64)
+
+    for i in range(1, n + 1):
+        p[0] = i
+        j0 = 0
+        minv = np.full(m + 1, np.inf)
+        used = np.zeros(m + 1, dtype=bool)
+        while True:
+            used[j0] = True
+            i0 = p[j0]
+            free = ~used[1:]
+            reduced = cost[i0 - 1] - u[i0] - v[1:]
+            better = free & (reduced < minv[1:])
+            minv[1:][better] = reduced[better]
+            way[1:][better] = j0
+
+            candidates = np.where(free, minv[1:], np.inf)
+            j1 = int(np.argmin(candidates)) + 1
+            delta = candidates[j1 - 1]
+
+            u[p[used]] += delta
+            v[used] -= delta
+            minv[1:][free] -= delta
+
+            j0 = j1
+            if p[j0] == 0:
+                break
+
+        while j0:
+            j1 = way[j0]
+            p[j0] = p[j1]
+            j0 = j1
+
+    assignment = np.full(n, -1, dtype=np.int64)
+    for j in range(1, m + 1):
+        if p[j]:
+            assignment[p[j] - 1] = j - 1
+    return assignment
+
+
+def linear_sum_assignment(cost):
+    """
+    Affectation un-à-un de coût total minimal (même interface que SciPy).
+
+    Returns:
+        (indices de lignes, indices de colonnes)
+    """
+    cost = np.asarray(cost, dtype=np.float64)
+    if cost.size == 0:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+    if _scipy_linear_sum_assignment is not None:
+        return _scipy_linear_sum_assignment(cost)
+
+    if cost.shape[0] <= cost.shape[1]:
+        cols = _hungarian(cost)
+        return np.arange(cost.shape[0]), cols
+
+    rows = _hungarian(cost.T)
+    order = np.argsort(rows)
+    return rows[order], np.arange(cost.shape[1])[order]
+
+
+def match_faces(faces, references, threshold):
+    """
+    Associe les visages aux élèves, chaque élève au plus une fois.
+
+    Args:
+        faces: matrice (n_visages, d) normalisée
+        references: ReferenceSet de la classe
+        threshold: similarité minimale pour accepter une correspondance
+
+    Returns:
+        liste de (indice_visage, eleve_id ou None, score), une entrée par visage
+    """
+    matches = [(face_index, None, 0.0) for face_index in range(len(faces))]
+    if len(faces) == 0 or len(references) == 0:
+        return matches
+
+    similarities = similarity_matrix(faces, references.matrix)
+    if references.weights is not None:
+        similarities = similarities * references.weights
+    scores = student_scores(similarities, references.group_starts)
+    rows, cols = linear_sum_assignment(-scores)
+    for face_index, student_index in zip(rows, cols):
+        score = float(scores[face_index, student_index])
+        eleve_id = int(references.student_ids[student_index]) if score >= threshold else None
+        matches[face_index] = (int(face_index), eleve_id, score)
+    return matches
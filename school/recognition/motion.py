@@ -0,0 +1,113 @@
+"""
+Filtrage des images sans mouvement.
+
+Pour chaque session, une miniature en niveaux de gris de la dernière image
+analysée est conservée. Si la nouvelle image en diffère trop peu, la
+détection est sautée et le résultat précédent est réutilisé.
+"""
+import threading
+from collections import OrderedDict
+
+import cv2
+import numpy as np
+
+from .config import get_setting
+
+THUMBNAIL_SIZE = (64, 48)
+
+
+def thumbnail(frame):
+    """Miniature floutée en niveaux de gris utilisée pour comparer deux images"""
+    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY) if frame.ndim == 3 else frame
+    small = cv2.resize(gray, THUMBNAIL_SIZE, interpolation=cv2.INTER_AREA)
+    return cv2.GaussianBlur(small, (5, 5), 0)
+
+
+def motion_difference(previous, current):
+    """Différence moyenne (0-1) entre deux miniatures"""
+    return float(np.mean(cv2.absdiff(current, previous))) / 255.0
+
+
+class _SessionMotion:
+    def __init__(self):
+        self.thumbnail = None
+        self.result = None
+        self.skipped = 0
+
+
+class MotionGate:
+    """
+    Mémorise, par session, la miniature de la dernière image analysée et
+    son résultat.
+
+    La comparaison des images elle-même est faite par ``analyse_frame``
+    (éventuellement dans un processus de travail) à partir de ``reference()``.
+    """
+
+    def __init__(self, threshold=None, max_skips=None, max_sessions=None):
+        self.threshold = threshold if threshold is not None else get_setting('MOTION_THRESHOLD')
+        self.max_skips = max_skips if max_skips is not None else get_setting('MOTION_MAX_SKIPS')
+        self.max_sessions = max_sessions or get_setting('VOTE_MAX_SESSIONS')
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _state(self, session_id):
+        key = str(session_id)
+        state = self._sessions.get(key)
+        if state is None:
+            state = _SessionMotion()
+            self._sessions[key] = state
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+        else:
+            self._sessions.move_to_end(key)
+        return state
+
+    def reference(self, session_id):
+        """
+        Miniature à laquelle comparer la prochaine image de la session, ou None
+        si une analyse complète est nécessaire (première image, filtre
+        désactivé, ou ``max_skips`` images déjà sautées).
+        """
+        if not self.threshold:
+            return None
+        with self._lock:
+            state = self._state(session_id)
+            if state.result is None or state.skipped >= self.max_skips:
+                return None
+            return state.thumbnail
+
+    def reuse(self, session_id):
+        """Résultat de la dernière analyse, pour une image jugée identique"""
+        with self._lock:
+            state = self._state(session_id)
+            state.skipped += 1
+            return state.result
+
+    def remember(self, session_id, current_thumbnail, result):
+        """Enregistre la miniature de l'image analysée et son résultat"""
+        with self._lock:
+            state = self._state(session_id)
+            state.thumbnail = current_thumbnail
+            state.result = result
+            state.skipped = 0
+
+    def discard(self, session_id):
+        with self._lock:
+            self._sessions.pop(str(session_id), None)
+
+
+class PipelineStats:
+    """Compteurs par étape de la chaîne de reconnaissance (par processus)"""
+
+    def __init__(self):
+        self._counters = {}
+        self._lock = threading.Lock()
+
+    def increment(self, name, value=1):
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self._counters)
@@ -0,0 +1,70 @@
+"""
+Analyse d'une image : la partie coûteuse en CPU de la reconnaissance.
+
+``analyse_frame`` ne dépend ni de la base de données ni de l'état des
+sessions ; elle s'exécute indifféremment dans le processus du serveur ou
+dans un processus de travail (voir ``workers.py``).
+"""
+from .frames import decode_frame, resize_to_width
+from .motion import motion_difference, thumbnail
+from .quality import assess_photo
+
+
+class FrameDropped(Exception):
+    """Image abandonnée (trop ancienne ou serveur saturé)"""
+
+
+class FrameAnalysis:
+    ANALYSED = 'analysed'
+    STATIC = 'static'
+    STALE = 'stale'
+
+    def __init__(self, status, thumbnail=None, boxes=(), embeddings=None):
+        self.status = status
+        self.thumbnail = thumbnail
+        self.boxes = list(boxes)
+        self.embeddings = embeddings
+
+
+def analyse_frame(detector, embedder, data, reference_thumbnail, motion_threshold, detection_width, max_faces):
+    """
+    Décode, réduit, filtre le mouvement, détecte puis calcule les empreintes
+    des visages d'une image.
+
+    Args:
+        data: image encodée (octets, memoryview, base64 ou data URL)
+        reference_thumbnail: miniature de la dernière image analysée, ou None
+            pour imposer une analyse complète
+
+    Returns:
+        FrameAnalysis avec les boîtes dans les coordonnées de l'image d'origine
+    """
+    frame = decode_frame(data)
+    small, scale = resize_to_width(frame, detection_width)
+    current = thumbnail(small)
+
+    if reference_thumbnail is not None and motion_difference(reference_thumbnail, current) < motion_threshold:
+        return FrameAnalysis(FrameAnalysis.STATIC)
+
+    boxes = detector.detect(small, max_faces=max_faces)
+    embeddings = embedder.embed(small, boxes)
+    original_boxes = [tuple(int(round(v / scale)) for v in box) for box in boxes]
+    return FrameAnalysis(FrameAnalysis.ANALYSED, current, original_boxes, embeddings)
+
+
+def analyse_reference(detector, embedder, image, detection_width):
+    """
+    Empreinte et qualité d'une photo de référence (plus grand visage,
+    sinon image entière).
+
+    Returns:
+        (empreinte, PhotoQuality)
+    """
+    image, _ = resize_to_width(image, detection_width)
+    quality = assess_photo(image, detector)
+    if quality.box is not None:
+        box = quality.box
+    else:
+        height, width = image.shape[:2]
+        box = (0, width, height, 0)
+    return embedder.embed(image, [box])[0], quality
@@ -0,0 +1,111 @@
+"""
+Évaluation de la qualité des photos de référence.
+
+Une photo de référence floue, mal exposée, trop petite, de profil ou
+contenant plusieurs personnes produit une empreinte peu fiable : l'élève
+n'atteint pas le seuil de correspondance et la caméra doit envoyer de
+nombreuses images avant de le reconnaître. Chaque photo reçoit donc un
+score entre 0 et 1 au moment de son enregistrement ; les photos
+inutilisables sont désactivées et les autres pondèrent leurs similarités
+lors de la correspondance.
+"""
+import cv2
+import numpy as np
+
+from .config import get_setting
+
+# Côté (px) du visage recadré sur lequel sont calculés les critères
+CROP_SIZE = 128
+# Variance du laplacien d'un visage net (recadré à CROP_SIZE)
+SHARP_VARIANCE = 150.0
+# Hauteur (px, image réduite à DETECTION_WIDTH) d'un visage suffisamment grand
+GOOD_FACE_HEIGHT = 120
+
+WEIGHTS = {
+    'sharpness': 0.3,
+    'exposure': 0.25,
+    'face_size': 0.25,
+    'frontal': 0.2,
+}
+
+
+class PhotoQuality:
+    """Résultat de l'évaluation d'une photo de référence"""
+
+    def __init__(self, score, face_count, box=None, details=None, reason=''):
+        self.score = score
+        self.face_count = face_count
+        self.box = box
+        self.details = details or {}
+        self.reason = reason
+
+    @property
+    def usable(self):
+        return self.box is not None and self.score >= get_setting('QUALITY_MIN')
+
+
+def _clip(value):
+    return float(min(max(value, 0.0), 1.0))
+
+
+def assess_photo(image, detector):
+    """
+    Note une photo de référence (déjà réduite à la largeur de détection).
+
+    Critères : netteté (variance du laplacien), exposition (luminosité
+    moyenne et pixels saturés), taille du visage, pose frontale (symétrie
+    gauche/droite du visage) et nombre de visages détectés.
+
+    Returns:
+        PhotoQuality (``box`` : plus grand visage, None si aucun)
+    """
+    boxes = detector.detect(image, max_faces=5)
+    if not boxes:
+        return PhotoQuality(0.0, 0, reason='aucun visage détecté')
+
+    top, right, bottom, left = boxes[0]
+    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY) if image.ndim == 3 else image
+    face = cv2.resize(gray[max(top, 0):bottom, max(left, 0):right], (CROP_SIZE, CROP_SIZE),
+                      interpolation=cv2.INTER_AREA)
+
+    saturated = np.count_nonzero((face <= 10) | (face >= 245)) / face.size
+    # Symétrie des deux moitiés, sans tenir compte d'un éclairage latéral
+    half = CROP_SIZE // 2
+    smooth = cv2.GaussianBlur(face, (9, 9), 0).astype(np.float32)
+    difference = smooth[:, :half] - cv2.flip(smooth[:, half:], 1)
+    asymmetry = np.abs(difference - difference.mean()).mean()
+
+    details = {
+        'sharpness': _clip(cv2.Laplacian(face, cv2.CV_64F).var() / SHARP_VARIANCE),
+        'exposure': _clip(1 - abs(float(face.mean()) - 128) / 96 - saturated),
+        'face_size': _clip((bottom - top) / GOOD_FACE_HEIGHT),
+        'frontal': _clip(1 - asymmetry / 48),
+    }
+    # Moyenne géométrique pondérée : un critère très mauvais suffit à
+    # rendre la photo inutilisable
+    score = float(np.prod([max(value, 0.05) ** WEIGHTS[name] for name, value in details.items()]))
+
+    reason = ''
+    if len(boxes) > 1:
+        # Une seconde personne de taille comparable rend la photo ambiguë
+        second_height = boxes[1][2] - boxes[1][0]
+        ambiguous = second_height >= 0.6 * (bottom - top)
+        score *= 0.5 if ambiguous else 0.9
+        reason = f'{len(boxes)} visages détectés'
+    details = {name: round(value, 3) for name, value in details.items()}
+
+    if not reason and score < get_setting('QUALITY_MIN'):
+        weakest = min(details, key=details.get)
+        reason = f'critère insuffisant : {weakest}'
+    return PhotoQuality(round(score, 3), len(boxes), boxes[0], details, reason)
+
+
+def quality_weights(qualities):
+    """
+    Poids appliqués aux similarités de chaque photo de référence.
+
+    Une photo parfaite garde sa similarité, une photo de qualité nulle est
+    ramenée à ``QUALITY_WEIGHT_FLOOR`` fois sa similarité.
+    """
+    floor = get_setting('QUALITY_WEIGHT_FLOOR')
+    return (floor + (1 - floor) * np.asarray(qualities, dtype=np.float32)).astype(np.float32)
@@ -0,0 +1,168 @@
+"""
+Index persistant des empreintes de référence (modèle ``EmpreinteFaciale``).
+
+Chaque photo de référence active (``Eleve.photo_reference`` ou
+``PhotoReference``) possède une empreinte float32 stockée en BLOB, avec
+la qualité de la photo (voir ``quality.py``). Les empreintes sont
+recalculées uniquement quand la photo change, et une classe entière se
+charge en une seule requête, sans décoder d'image.
+"""
+import logging
+
+import numpy as np
+from django.db.models import Q
+
+from ..models import EmpreinteFaciale, PhotoReference
+from .frames import load_image
+from .quality import quality_weights
+
+logger = logging.getLogger(__name__)
+
+
+class ReferenceSet:
+    """
+    Empreintes de référence d'une classe (une ligne par photo).
+
+    Les lignes sont triées par élève : ``student_ids`` liste les élèves
+    distincts et ``group_starts`` l'indice de leur première photo.
+    ``weights`` pondère les similarités de chaque photo selon sa qualité
+    (None : toutes les photos se valent).
+    """
+
+    def __init__(self, eleve_ids, matrix, names, weights=None):
+        self.eleve_ids = eleve_ids
+        self.matrix = matrix
+        self.names = names
+        self.weights = weights
+        self.student_ids, self.group_starts = np.unique(eleve_ids, return_index=True)
+
+    def __len__(self):
+        return len(self.eleve_ids)
+
+
+def vector_to_bytes(vector):
+    return np.asarray(vector, dtype=np.float32).tobytes()
+
+
+def _get_engine(engine):
+    if engine is None:
+        from .engine import get_engine
+        engine = get_engine()
+    return engine
+
+
+def _compute(engine, path):
+    """Empreinte et qualité d'une photo, (None, None) si illisible"""
+    image = load_image(path)
+    if image is None:
+        logger.warning(f"Photo de référence illisible: {path}")
+        return None, None
+    return engine.analyse_reference(image)
+
+
+def sync_eleve_photo(eleve, engine=None):
+    """Met à jour l'empreinte de la photo principale d'un élève si elle a changé"""
+    engine = _get_engine(engine)
+    modele = engine.embedder.name
+    existing = EmpreinteFaciale.objects.filter(eleve=eleve, photo_reference__isnull=True, modele=modele)
+
+    if not eleve.photo_reference:
+        existing.delete()
+        return None
+
+    source = eleve.photo_reference.name
+    if existing.filter(source=source).exists():
+        return None
+
+    vector, quality = _compute(engine, eleve.photo_reference.path)
+    existing.delete()
+    if vector is None:
+        return None
+    if not quality.usable:
+        # La photo principale est conservée faute d'alternative, avec un poids réduit
+        logger.warning(
+            f"Photo principale de {eleve.matricule} de mauvaise qualité ({quality.score}): {quality.reason}"
+        )
+    return EmpreinteFaciale.objects.create(
+        eleve=eleve, photo_reference=None, source=source, modele=modele,
+        vecteur=vector_to_bytes(vector), qualite=quality.score,
+    )
+
+
+def sync_photo_reference(photo, engine=None):
+    """
+    Met à jour l'empreinte d'une PhotoReference (supprimée si désactivée).
+
+    La qualité calculée est enregistrée dans ``PhotoReference.qualite`` et
+    une photo inutilisable est désactivée.
+    """
+    engine = _get_engine(engine)
+    modele = engine.embedder.name
+    existing = EmpreinteFaciale.objects.filter(photo_reference=photo, modele=modele)
+
+    if not photo.active or not photo.photo:
+        existing.delete()
+        return None
+
+    source = photo.photo.name
+    if existing.filter(source=source).exists():
+        return None
+
+    vector, quality = _compute(engine, photo.photo.path)
+    existing.delete()
+    if vector is None:
+        return None
+
+    # update() : ne pas redéclencher le signal post_save de la photo
+    photo.qualite, photo.active = quality.score, quality.usable
+    PhotoReference.objects.filter(pk=photo.pk).update(qualite=photo.qualite, active=photo.active)
+    if not quality.usable:
+        logger.warning(f"Photo de référence {photo.id} désactivée ({quality.score}): {quality.reason}")
+        return None
+    return EmpreinteFaciale.objects.create(
+        eleve_id=photo.eleve_id, photo_reference=photo, source=source, modele=modele,
+        vecteur=vector_to_bytes(vector), qualite=quality.score,
+    )
+
+
+def sync_eleve(eleve, engine=None):
+    """Met à jour toutes les empreintes d'un élève"""
+    engine = _get_engine(engine)
+    sync_eleve_photo(eleve, engine)
+    for photo in eleve.photoreference_set.all():
+        sync_photo_reference(photo, engine)
+
+
+def load_class_references(classe_id, modele, dimension):
+    """
+    Charge les empreintes des élèves d'une classe en une seule requête.
+
+    Returns:
+        ReferenceSet avec une matrice contiguë (n_photos, dimension)
+    """
+    rows = EmpreinteFaciale.objects.filter(
+        eleve__classe_id=classe_id,
+        modele=modele,
+    ).filter(
+        Q(photo_reference__isnull=True) | Q(photo_reference__active=True)
+    ).order_by('eleve_id').values_list(
+        'eleve_id', 'vecteur', 'qualite', 'eleve__user__first_name', 'eleve__user__last_name'
+    )
+
+    expected_size = dimension * 4
+    ids = []
+    blobs = []
+    qualities = []
+    names = {}
+    for eleve_id, vecteur, qualite, first_name, last_name in rows:
+        if len(vecteur) != expected_size:
+            continue
+        ids.append(eleve_id)
+        blobs.append(vecteur)
+        qualities.append(qualite)
+        names[eleve_id] = f"{first_name} {last_name}".strip()
+
+    matrix = np.frombuffer(b''.join(blobs), dtype=np.float32).reshape(len(ids), dimension)
+    return ReferenceSet(
+        np.asarray(ids, dtype=np.int64), np.ascontiguousarray(matrix), names, quality_weights(qualities)
+    )
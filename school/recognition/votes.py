@@ -0,0 +1,80 @@
+"""
+Accumulation des reconnaissances sur plusieurs images.
+
+Une seule image ne suffit pas à décider de la présence d'un élève : les
+scores de correspondance sont cumulés sur une fenêtre glissante d'images
+par session d'appel, et la présence n'est validée qu'une fois le score
+cumulé au-dessus d'un seuil. Une présence validée n'est écrite qu'une fois.
+"""
+import threading
+from collections import OrderedDict, deque
+
+from .config import get_setting
+
+
+class VoteAccumulator:
+    """Votes d'une session d'appel"""
+
+    def __init__(self, window=None, commit_score=None):
+        self.frames = deque(maxlen=window or get_setting('VOTE_WINDOW'))
+        self.commit_score = commit_score or get_setting('VOTE_COMMIT_SCORE')
+        self.committed = set()
+
+    def add_frame(self, matches):
+        """
+        Ajoute les correspondances d'une image.
+
+        Args:
+            matches: dictionnaire {eleve_id: score} des élèves reconnus sur l'image
+
+        Returns:
+            liste de (eleve_id, confiance) des élèves nouvellement validés,
+            la confiance étant le score moyen sur les images où l'élève apparaît
+        """
+        self.frames.append(matches)
+
+        totals = {}
+        counts = {}
+        for frame in self.frames:
+            for eleve_id, score in frame.items():
+                totals[eleve_id] = totals.get(eleve_id, 0.0) + score
+                counts[eleve_id] = counts.get(eleve_id, 0) + 1
+
+        newly_committed = []
+        for eleve_id, total in totals.items():
+            if eleve_id in self.committed or total < self.commit_score:
+                continue
+            self.committed.add(eleve_id)
+            newly_committed.append((eleve_id, round(min(total / counts[eleve_id], 1.0), 3)))
+        return newly_committed
+
+    def is_committed(self, eleve_id):
+        return eleve_id in self.committed
+
+
+class SessionVotes:
+    """
+    Accumulateurs des sessions actives du processus (LRU borné).
+    """
+
+    def __init__(self, max_sessions=None):
+        self.max_sessions = max_sessions or get_setting('VOTE_MAX_SESSIONS')
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, session_id):
+        key = str(session_id)
+        with self._lock:
+            accumulator = self._sessions.get(key)
+            if accumulator is None:
+                accumulator = VoteAccumulator()
+                self._sessions[key] = accumulator
+                while len(self._sessions) > self.max_sessions:
+                    self._sessions.popitem(last=False)
+            else:
+                self._sessions.move_to_end(key)
+            return accumulator
+
+    def discard(self, session_id):
+        with self._lock:
+            self._sessions.pop(str(session_id), None)
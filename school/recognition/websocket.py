@@ -0,0 +1,213 @@
+"""
+Flux WebSocket de reconnaissance faciale (ASGI).
+
+URL : ``/ws/facial-recognition/<session_id>/``
+
+L'enseignant est authentifié et la session d'appel chargée une seule fois,
+à l'ouverture de la connexion. Le navigateur envoie ensuite ses images
+(messages binaires JPEG, ou texte JSON ``{"image": "data:..."}``) sur la
+même connexion et reçoit en retour, pour chaque image analysée, un
+événement JSON ``recognition`` identique à la réponse de
+``/api/facial-recognition/``.
+
+Si plusieurs images arrivent pendant une analyse, seule la plus récente
+est traitée. Nécessite un serveur ASGI (uvicorn, daphne...).
+"""
+import asyncio
+import json
+import logging
+import re
+import time
+import uuid
+from importlib import import_module
+from types import SimpleNamespace
+from urllib.parse import urlparse
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import get_user
+from django.http.request import validate_host
+
+from ..models import SessionAppel
+from .config import get_setting
+from .embeddings import RecognitionUnavailable
+from .frames import FrameDecodeError
+from .pipeline import FrameDropped
+
+logger = logging.getLogger(__name__)
+
+PATH_PATTERN = re.compile(r'^/ws/facial-recognition/(?P<session_id>[^/]+)/$')
+
+# Fréquence (s) de vérification que la session d'appel est toujours en cours
+SESSION_CHECK_INTERVAL = 30
+
+CLOSE_NOT_FOUND = 4404
+CLOSE_FORBIDDEN = 4403
+CLOSE_SESSION_ENDED = 4000
+
+
+def _headers(scope):
+    return {name.decode('latin1').lower(): value.decode('latin1') for name, value in scope.get('headers', [])}
+
+
+def _origin_allowed(headers):
+    """Refuse les connexions ouvertes depuis un autre site"""
+    origin = headers.get('origin')
+    if not origin:
+        return True
+    origin_host = urlparse(origin).hostname or ''
+    host = headers.get('host', '').split(':')[0]
+    allowed_hosts = settings.ALLOWED_HOSTS or (['localhost', '127.0.0.1', '[::1]'] if settings.DEBUG else [])
+    return origin_host == host or validate_host(origin_host, allowed_hosts)
+
+
+def _session_key(headers):
+    for chunk in headers.get('cookie', '').split(';'):
+        name, _, value = chunk.strip().partition('=')
+        if name == settings.SESSION_COOKIE_NAME:
+            return value
+    return None
+
+
+@sync_to_async
+def _load_session_appel(headers, session_id):
+    """Utilisateur (cookie de session Django) et session d'appel, ou None si non autorisé"""
+    session_key = _session_key(headers)
+    if not session_key:
+        return None
+    store = import_module(settings.SESSION_ENGINE).SessionStore(session_key)
+    user = get_user(SimpleNamespace(session=store))
+    if not user.is_authenticated or user.role != 'ENSEIGNANT':
+        return None
+    return SessionAppel.objects.select_related('cours').filter(
+        id=session_id,
+        enseignant__user=user,
+        statut='EN_COURS',
+    ).first()
+
+
+class RecognitionStream:
+    """Connexion WebSocket d'une session d'appel"""
+
+    def __init__(self, session_appel, send):
+        self.session_appel = session_appel
+        self.send = send
+        self.latest_frame = None
+        self.frame_ready = asyncio.Event()
+        self.closed = False
+        self.last_session_check = time.monotonic()
+
+    async def send_json(self, payload):
+        await self.send({'type': 'websocket.send', 'text': json.dumps(payload)})
+
+    async def run(self, receive):
+        processor = asyncio.create_task(self.process_frames())
+        try:
+            while True:
+                message = await receive()
+                if message['type'] == 'websocket.disconnect':
+                    break
+                if message['type'] != 'websocket.receive':
+                    continue
+
+                if message.get('bytes'):
+                    frame = message['bytes']
+                else:
+                    try:
+                        data = json.loads(message.get('text') or '{}')
+                    except json.JSONDecodeError:
+                        await self.send_json({'type': 'error', 'error': 'Données JSON invalides'})
+                        continue
+                    if data.get('type') == 'ping':
+                        await self.send_json({'type': 'pong'})
+                        continue
+                    frame = data.get('image')
+
+                if frame:
+                    # Une image non encore analysée est remplacée par la plus récente
+                    self.latest_frame = frame
+                    self.frame_ready.set()
+        finally:
+            self.closed = True
+            self.frame_ready.set()
+            await processor
+
+    async def process_frames(self):
+        while True:
+            await self.frame_ready.wait()
+            self.frame_ready.clear()
+            if self.closed:
+                return
+            frame, self.latest_frame = self.latest_frame, None
+            if frame is None:
+                continue
+
+            payload = await sync_to_async(self.recognize, thread_sensitive=False)(frame)
+            if self.closed:
+                return
+            await self.send_json(payload)
+            if payload['type'] == 'session_closed':
+                self.closed = True
+                await self.send({'type': 'websocket.close', 'code': CLOSE_SESSION_ENDED})
+                return
+
+    def recognize(self, frame):
+        """Analyse synchrone d'une image (exécutée dans un thread)"""
+        from .engine import get_engine
+
+        now = time.monotonic()
+        if now - self.last_session_check > SESSION_CHECK_INTERVAL:
+            self.last_session_check = now
+            if not SessionAppel.objects.filter(id=self.session_appel.id, statut='EN_COURS').exists():
+                return {'type': 'session_closed', 'message': 'La session d\'appel est terminée'}
+
+        try:
+            detected_faces = get_engine().recognize(self.session_appel, frame)
+        except FrameDecodeError as e:
+            return {'type': 'error', 'success': False, 'error': str(e)}
+        except FrameDropped as e:
+            return {'type': 'recognition', 'success': True, 'dropped': True, 'total_faces': 0,
+                    'detected_faces': [], 'message': str(e)}
+        except RecognitionUnavailable as e:
+            return {'type': 'error', 'success': False, 'error': str(e)}
+        except Exception as e:
+            logger.error(f'Erreur lors de la reconnaissance faciale (WebSocket): {str(e)}')
+            return {'type': 'error', 'success': False, 'error': str(e)}
+
+        recognized = [face for face in detected_faces if face['eleve_id']]
+        return {
+            'type': 'recognition',
+            'success': True,
+            'total_faces': len(detected_faces),
+            'recognized': len(recognized),
+            'detected_faces': detected_faces,
+            'message': f'{len(recognized)} élève(s) reconnu(s)' if detected_faces else 'Aucun visage détecté',
+            'frame_width': get_setting('DETECTION_WIDTH'),
+        }
+
+
+async def websocket_application(scope, receive, send):
+    """Application ASGI des connexions WebSocket"""
+    message = await receive()
+    if message['type'] != 'websocket.connect':
+        return
+
+    match = PATH_PATTERN.match(scope['path'])
+    try:
+        session_id = uuid.UUID(match['session_id']) if match else None
+    except ValueError:
+        session_id = None
+    if session_id is None:
+        await send({'type': 'websocket.close', 'code': CLOSE_NOT_FOUND})
+        return
+
+    headers = _headers(scope)
+    session_appel = None
+    if _origin_allowed(headers):
+        session_appel = await _load_session_appel(headers, session_id)
+    if session_appel is None:
+        await send({'type': 'websocket.close', 'code': CLOSE_FORBIDDEN})
+        return
+
+    await send({'type': 'websocket.accept'})
+    await RecognitionStream(session_appel, send).run(receive)
@@ -0,0 +1,188 @@
+"""
+Pool de processus pour l'analyse des images.
+
+Le détecteur et le modèle d'empreintes sont chargés une fois dans le
+processus du serveur, puis les processus de travail sont créés par
+``fork`` et en héritent sans les recharger. Les images transitent par des
+segments de mémoire partagée réutilisés ; seuls les petits résultats
+(boîtes, empreintes) reviennent par le pipe du pool.
+
+Contre-pression : une session n'a jamais plus d'une image en attente.
+Une nouvelle image remplace l'image encore en file d'attente de la même
+session, et les images trop anciennes ou arrivant quand tous les segments
+sont occupés sont abandonnées plutôt que mises en file indéfiniment.
+"""
+import atexit
+import logging
+import multiprocessing
+import threading
+import time
+from collections import deque
+from concurrent.futures import CancelledError, ProcessPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing.shared_memory import SharedMemory
+
+from .config import get_setting
+from .frames import frame_bytes
+from .pipeline import FrameAnalysis, analyse_frame
+
+logger = logging.getLogger(__name__)
+
+# Modèles hérités par fork dans les processus de travail
+_worker_models = None
+# Segments de mémoire partagée déjà ouverts par le processus de travail
+_attached_segments = {}
+
+
+def _init_worker():
+    """Initialisation d'un processus de travail"""
+    from django.db import connections
+
+    # Ne jamais réutiliser (ni fermer) les connexions héritées du parent
+    for conn in connections.all(initialized_only=True):
+        conn.connection = None
+
+
+def _attach(name):
+    segment = _attached_segments.get(name)
+    if segment is None:
+        # Avec fork, le suivi des segments est partagé avec le parent qui
+        # reste seul responsable de leur suppression
+        segment = SharedMemory(name=name)
+        _attached_segments[name] = segment
+    return segment
+
+
+def _analyse_in_worker(segment_name, length, payload, submitted_at, reference_thumbnail, params):
+    """Point d'entrée exécuté dans un processus de travail"""
+    if time.time() - submitted_at > params['max_age']:
+        return FrameAnalysis(FrameAnalysis.STALE)
+
+    detector, embedder = _worker_models
+    data = _attach(segment_name).buf[:length] if segment_name else payload
+    try:
+        return analyse_frame(
+            detector, embedder, data, reference_thumbnail,
+            params['motion_threshold'], params['detection_width'], params['max_faces'],
+        )
+    finally:
+        if isinstance(data, memoryview):
+            data.release()
+
+
+class RecognitionPool:
+    """Pool de processus d'analyse partagé par les requêtes du serveur"""
+
+    def __init__(self, detector, embedder, workers, params):
+        global _worker_models
+        _worker_models = (detector, embedder)
+
+        self.workers = workers
+        self.params = dict(params, max_age=get_setting('MAX_FRAME_AGE'))
+        self.timeout = get_setting('FRAME_TIMEOUT')
+        self.slot_size = get_setting('FRAME_SLOT_SIZE')
+        self._segments = [SharedMemory(create=True, size=self.slot_size) for _ in range(workers * 2)]
+        # Segments libres : rendus sans verrou par les callbacks des futures,
+        # qui peuvent s'exécuter dans le thread qui détient déjà ``_lock``
+        # (``cancel()``, ``shutdown(cancel_futures=True)``)
+        self._free = deque(range(len(self._segments)))
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._executor = self._create_executor()
+        atexit.register(self.close)
+
+    def _create_executor(self):
+        return ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context('fork'),
+            initializer=_init_worker,
+        )
+
+    def _release(self, slot):
+        self._free.append(slot)
+
+    def analyse(self, session_id, data, reference_thumbnail):
+        """
+        Analyse une image dans un processus de travail et attend le résultat.
+
+        Returns:
+            FrameAnalysis (statut STALE si l'image a été abandonnée)
+        """
+        data = frame_bytes(data)
+        key = str(session_id)
+
+        with self._lock:
+            previous = self._pending.get(key)
+            if previous is not None and not previous.done() and not previous.cancel():
+                # Une image de cette session est déjà en cours d'analyse
+                return FrameAnalysis(FrameAnalysis.STALE)
+            fits = len(data) <= self.slot_size
+            if fits and not self._free:
+                # Tous les segments sont occupés : serveur saturé
+                return FrameAnalysis(FrameAnalysis.STALE)
+            slot = self._free.pop() if fits else None
+
+        if slot is not None:
+            segment = self._segments[slot]
+            segment.buf[:len(data)] = data
+            args = (segment.name, len(data), None)
+        else:
+            args = (None, 0, data)
+
+        try:
+            future = self._executor.submit(
+                _analyse_in_worker, *args, time.time(), reference_thumbnail, self.params
+            )
+        except BrokenProcessPool:
+            if slot is not None:
+                self._release(slot)
+            self._restart()
+            return FrameAnalysis(FrameAnalysis.STALE)
+
+        if slot is not None:
+            future.add_done_callback(lambda f: self._release(slot))
+        with self._lock:
+            self._pending[key] = future
+
+        try:
+            return future.result(timeout=self.timeout)
+        except (CancelledError, FutureTimeoutError):
+            return FrameAnalysis(FrameAnalysis.STALE)
+        except BrokenProcessPool:
+            self._restart()
+            return FrameAnalysis(FrameAnalysis.STALE)
+        finally:
+            with self._lock:
+                if self._pending.get(key) is future:
+                    del self._pending[key]
+
+    def _restart(self):
+        logger.error("Pool de reconnaissance interrompu, redémarrage des processus de travail")
+        with self._lock:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = self._create_executor()
+
+    def close(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        for segment in self._segments:
+            try:
+                segment.close()
+                segment.unlink()
+            except FileNotFoundError:
+                pass
+        self._segments = []
+
+
+def create_pool(detector, embedder, params):
+    """Crée le pool configuré, ou None pour analyser dans le processus courant"""
+    workers = get_setting('WORKERS')
+    if not workers:
+        return None
+    if 'fork' not in multiprocessing.get_all_start_methods():
+        logger.warning("fork indisponible sur cette plateforme, reconnaissance dans le processus du serveur")
+        return None
+
+    # Charger la cascade avant le fork pour que les processus en héritent
+    detector.cascade
+    return RecognitionPool(detector, embedder, workers, params)
@@ -0,0 +1,273 @@
+"""
+Liste d'appel (roster) des sessions en cours, en cache.
+
+Le roster d'une session associe chaque élève de la classe (par id et par
+matricule) à sa présence, son nom et sa photo. Il est construit au
+démarrage de la session (pages de scan), avec les présences manquantes, et
+gardé dans le cache Django : un scan de QR code n'a alors plus besoin que
+d'une requête UPDATE.
+
+Le roster est invalidé à la fin de la session, et reconstruit si un élève
+de la classe est modifié (compteur de version par classe, comme pour les
+empreintes faciales). Le cache doit être partagé entre les processus
+(``CACHES`` dans les settings) ; le statut de la session est de toute façon
+revérifié à chaque écriture.
+
+Chaque processus garde aussi les rosters qu'il a lus, et ne relit la
+version d'une classe dans le cache Django qu'au plus une fois par
+``VERSION_CHECK_INTERVAL`` secondes : un scan ne fait alors aucune lecture
+du cache (avec le cache en base de données, chaque lecture est une requête
+SQL). Une modification faite par un autre processus est vue au bout de
+ce délai au plus ; dans le processus qui l'a faite, elle l'est aussitôt.
+"""
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+
+from .live import notify_presence_change
+from .models import Eleve, Presence, SessionAppel
+from .qrcodes import InvalidQRCode, parse_qr_payload
+
+ROSTER_KEY = 'appel:roster:{session_id}'
+VERSION_KEY = 'appel:roster_version:{classe_id}'
+
+# Durée maximale d'une session d'appel (s)
+ROSTER_TIMEOUT = 12 * 3600
+
+# Délai (s) entre deux lectures de la version d'une classe par un processus
+VERSION_CHECK_INTERVAL = 1
+
+# Nombre de rosters gardés en mémoire par processus
+LOCAL_ROSTERS = 64
+
+# Rosters lus par ce processus (LRU) et versions des classes avec la date
+# de leur prochaine lecture : {classe_id: (version, échéance)}
+_rosters = OrderedDict()
+_versions = {}
+_lock = threading.Lock()
+
+
+class SessionTerminee(Exception):
+    """La session d'appel du roster n'est plus en cours"""
+
+
+def _session_key(session_id):
+    try:
+        return ROSTER_KEY.format(session_id=uuid.UUID(str(session_id)))
+    except ValueError:
+        return None
+
+
+def roster_version(classe_id):
+    """Version courante des rosters d'une classe"""
+    return cache.get(VERSION_KEY.format(classe_id=classe_id), 0)
+
+
+def _recent_version(classe_id):
+    """Version des rosters d'une classe, relue au plus une fois par ``VERSION_CHECK_INTERVAL``"""
+    now = time.monotonic()
+    known = _versions.get(classe_id)
+    if known is not None and known[1] > now:
+        return known[0]
+    version = roster_version(classe_id)
+    _versions[classe_id] = (version, now + VERSION_CHECK_INTERVAL)
+    return version
+
+
+def _remember(key, roster):
+    with _lock:
+        _rosters[key] = roster
+        _rosters.move_to_end(key)
+        while len(_rosters) > LOCAL_ROSTERS:
+            _rosters.popitem(last=False)
+
+
+def _local_roster(key):
+    with _lock:
+        return _rosters.get(key)
+
+
+def bump_roster_version(classe_id):
+    """Invalide les rosters de toutes les sessions d'une classe"""
+    if classe_id is None:
+        return
+    key = VERSION_KEY.format(classe_id=classe_id)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, 1, None)
+    _versions.pop(classe_id, None)
+
+
+def open_roster(session_appel, methode='QR_CODE'):
+    """
+    Initialise la liste d'appel d'une session et la met en cache.
+
+    Les présences manquantes (élèves absents) sont créées en une seule
+    requête : le nombre de requêtes ne dépend pas de la taille de la classe.
+
+    Args:
+        session_appel: SessionAppel (avec cours et matière, idéalement
+            chargés par select_related)
+        methode: méthode de détection des présences créées
+
+    Returns:
+        (roster, présences de la classe avec élève et utilisateur joints,
+        triées par nom)
+    """
+    cours = session_appel.cours
+    version = _recent_version(cours.classe_id)
+    with transaction.atomic():
+        eleve_ids = Eleve.objects.filter(classe_id=cours.classe_id).values_list('id', flat=True)
+        Presence.objects.bulk_create(
+            [
+                Presence(session_appel=session_appel, eleve_id=eleve_id, statut='ABSENT',
+                         methode_detection=methode)
+                for eleve_id in eleve_ids
+            ],
+            ignore_conflicts=True,
+        )
+        presences = list(
+            Presence.objects.filter(session_appel=session_appel, eleve__classe_id=cours.classe_id)
+            .select_related('eleve__user', 'eleve__parent')
+            .order_by('eleve__user__last_name', 'eleve__user__first_name')
+        )
+
+    eleves = {}
+    for presence in presences:
+        eleve = presence.eleve
+        eleves[eleve.id] = {
+            'eleve_id': eleve.id,
+            'presence_id': presence.id,
+            'matricule': eleve.matricule,
+            'nom': eleve.user.get_full_name(),
+            'first_name': eleve.user.first_name,
+            'last_name': eleve.user.last_name,
+            'photo': eleve.photo_visage,
+            'parent_id': eleve.parent_id,
+            'parent_user_id': eleve.parent.user_id if eleve.parent else None,
+            'recap_quotidien': eleve.parent.recap_quotidien if eleve.parent else False,
+        }
+
+    roster = {
+        'session_id': str(session_appel.id),
+        'enseignant_user_id': session_appel.enseignant.user_id,
+        'cours_id': cours.id,
+        'classe_id': cours.classe_id,
+        'matiere': cours.matiere.nom,
+        'date': cours.date,
+        'version': version,
+        'eleves': eleves,
+        'matricules': {entry['matricule']: eleve_id for eleve_id, entry in eleves.items()},
+    }
+    key = _session_key(session_appel.id)
+    cache.set(key, roster, ROSTER_TIMEOUT)
+    _remember(key, roster)
+    return roster, presences
+
+
+def get_roster(session_id):
+    """
+    Roster d'une session en cours, depuis la mémoire du processus, le cache
+    partagé ou reconstruit.
+
+    Returns:
+        dict du roster, ou None si la session n'existe pas ou est terminée
+    """
+    key = _session_key(session_id)
+    if key is None:
+        return None
+    for lookup in (_local_roster, cache.get):
+        roster = lookup(key)
+        if roster is not None and roster['version'] == _recent_version(roster['classe_id']):
+            _remember(key, roster)
+            return roster
+
+    session_appel = (
+        SessionAppel.objects.select_related('cours__matiere', 'enseignant')
+        .filter(pk=session_id, statut='EN_COURS')
+        .first()
+    )
+    if session_appel is None:
+        return None
+    roster, _ = open_roster(session_appel)
+    return roster
+
+
+def invalidate_roster(session_id):
+    key = _session_key(session_id)
+    if key is not None:
+        cache.delete(key)
+        with _lock:
+            _rosters.pop(key, None)
+
+
+def roster_entry(roster, qr_data):
+    """
+    Élève du roster correspondant au contenu d'un QR code scanné.
+
+    Un QR code signé venant d'une autre classe (ou falsifié) est rejeté sans
+    requête ; les anciennes cartes (matricule seul) restent acceptées.
+
+    Returns:
+        entrée du roster, ou None si l'élève n'est pas dans la classe
+
+    Raises:
+        InvalidQRCode: QR code falsifié ou d'une autre classe
+    """
+    payload = parse_qr_payload(qr_data)
+    if payload is None:
+        eleve_id = roster['matricules'].get((qr_data or '').strip())
+        return roster['eleves'].get(eleve_id)
+
+    eleve_id, classe_id = payload
+    if classe_id != roster['classe_id']:
+        raise InvalidQRCode('Cet élève n\'appartient pas à cette classe')
+    return roster['eleves'].get(eleve_id)
+
+
+def record_presence(roster, entry, statut='PRESENT', methode='QR_CODE', niveau_confiance=None,
+                    only_if_absent=False):
+    """
+    Enregistre la présence d'un élève du roster (une requête UPDATE).
+
+    Args:
+        only_if_absent: ne modifie la présence que si l'élève est encore absent
+
+    Returns:
+        (présence modifiée, heure d'arrivée) ; la présence n'est pas modifiée
+        si l'élève est déjà présent avec ``only_if_absent``
+
+    Raises:
+        SessionTerminee: la session a été terminée depuis la mise en cache
+            du roster (le roster est alors invalidé)
+    """
+    now = timezone.now()
+    heure_arrivee = now.time() if statut in ['PRESENT', 'RETARD'] else None
+    values = {
+        'statut': statut,
+        'heure_arrivee': heure_arrivee,
+        'methode_detection': methode,
+        # update() n'applique pas auto_now
+        'date_modification': now,
+    }
+    if niveau_confiance is not None:
+        values['niveau_confiance'] = niveau_confiance
+
+    # Le statut de la session est vérifié par l'UPDATE lui-même : un roster
+    # en cache ne suffit pas à prouver que la session est encore en cours
+    presences = Presence.objects.filter(pk=entry['presence_id'], session_appel__statut='EN_COURS')
+    if only_if_absent:
+        presences = presences.filter(statut='ABSENT')
+    updated = presences.update(**values) > 0
+    if updated:
+        notify_presence_change(roster['session_id'])
+    elif not SessionAppel.objects.filter(pk=roster['session_id'], statut='EN_COURS').exists():
+        invalidate_roster(roster['session_id'])
+        raise SessionTerminee('Session d\'appel non trouvée ou terminée')
+    return updated, heure_arrivee
@@ -0,0 +1,142 @@
+"""
+Signaux de l'application school.
+"""
+import logging
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from .models import Eleve, EmpreinteFaciale, Parent, PhotoReference, Presence, SessionAppel
+
+logger = logging.getLogger(__name__)
+
+
+def invalider_empreintes_classe(*classe_ids):
+    """Invalide, après commit, le cache des empreintes des classes données"""
+    from .recognition.cache import bump_embeddings_version
+
+    def _bump():
+        for classe_id in set(classe_ids):
+            bump_embeddings_version(classe_id)
+
+    transaction.on_commit(_bump)
+
+
+def invalider_rosters_classe(*classe_ids):
+    """Invalide, après commit, les listes d'appel en cache des classes données"""
+    from .roster import bump_roster_version
+
+    def _bump():
+        for classe_id in set(classe_ids):
+            bump_roster_version(classe_id)
+
+    transaction.on_commit(_bump)
+
+
+@receiver(pre_save, sender=Eleve)
+def eleve_avant_enregistrement(sender, instance, raw=False, **kwargs):
+    """Mémorise la classe précédente pour détecter un changement de classe"""
+    if raw or instance.pk is None:
+        instance._classe_id_precedente = None
+        return
+    instance._classe_id_precedente = Eleve.objects.filter(pk=instance.pk).values_list('classe_id', flat=True).first()
+
+
+@receiver(post_save, sender=Eleve)
+def eleve_enregistre(sender, instance, raw=False, **kwargs):
+    """Recalcule l'empreinte faciale et les miniatures quand la photo principale change"""
+    if raw:
+        return
+
+    classe_precedente = getattr(instance, '_classe_id_precedente', None)
+    if classe_precedente and classe_precedente != instance.classe_id:
+        invalider_empreintes_classe(classe_precedente, instance.classe_id)
+    invalider_rosters_classe(*filter(None, [classe_precedente, instance.classe_id]))
+
+    def _sync():
+        from .recognition.store import sync_eleve_photo
+        try:
+            sync_eleve_photo(instance)
+        except Exception as e:
+            logger.error(f"Erreur lors du calcul de l'empreinte de {instance.matricule}: {str(e)}")
+
+    def _variantes():
+        from .photos import generate_variants
+        try:
+            generate_variants(instance.photo_reference.name)
+        except Exception as e:
+            logger.error(f"Erreur lors de la génération des miniatures de {instance.matricule}: {str(e)}")
+
+    transaction.on_commit(_sync)
+    if instance.photo_reference:
+        transaction.on_commit(_variantes)
+
+
+@receiver(post_delete, sender=Eleve)
+def eleve_supprime(sender, instance, **kwargs):
+    invalider_empreintes_classe(instance.classe_id)
+    invalider_rosters_classe(instance.classe_id)
+
+
+@receiver(post_save, sender=Parent)
+def parent_enregistre(sender, instance, raw=False, **kwargs):
+    """Les listes d'appel en cache contiennent la préférence de récapitulatif du parent"""
+    if raw or kwargs.get('created'):
+        return
+    invalider_rosters_classe(*Eleve.objects.filter(parent=instance).values_list('classe_id', flat=True))
+
+
+@receiver(post_save, sender=SessionAppel)
+def session_appel_enregistree(sender, instance, raw=False, **kwargs):
+    """
+    Fin d'une session : la liste d'appel en cache n'est plus utilisée et les
+    récapitulatifs en attente des parents partent sans attendre
+    """
+    if raw or instance.statut == 'EN_COURS':
+        return
+    from .live import notify_presence_change
+    from .outbox import flush_session_digests
+    from .roster import invalidate_roster
+
+    transaction.on_commit(lambda: invalidate_roster(instance.pk))
+    transaction.on_commit(lambda: flush_session_digests(instance.pk))
+    # Les flux en direct de la session se ferment
+    notify_presence_change(instance.pk)
+
+
+@receiver(post_save, sender=Presence)
+def presence_enregistree(sender, instance, raw=False, **kwargs):
+    """Transmet la modification aux flux en direct de la session"""
+    if raw:
+        return
+    from .live import notify_presence_change
+
+    notify_presence_change(instance.session_appel_id)
+
+
+@receiver(post_save, sender=PhotoReference)
+def photo_reference_enregistree(sender, instance, raw=False, **kwargs):
+    """Recalcule (ou supprime si désactivée) l'empreinte d'une photo de référence"""
+    if raw:
+        return
+
+    def _sync():
+        from .recognition.store import sync_photo_reference
+        try:
+            sync_photo_reference(instance)
+        except Exception as e:
+            logger.error(f"Erreur lors du calcul de l'empreinte de la photo {instance.id}: {str(e)}")
+
+    transaction.on_commit(_sync)
+
+
+@receiver(post_save, sender=EmpreinteFaciale)
+@receiver(post_delete, sender=EmpreinteFaciale)
+def empreinte_modifiee(sender, instance, raw=False, **kwargs):
+    """Toute écriture d'empreinte invalide le cache de la classe de l'élève"""
+    if raw:
+        return
+    classe_id = Eleve.objects.filter(pk=instance.eleve_id).values_list('classe_id', flat=True).first()
+    if classe_id:
+        invalider_empreintes_classe(classe_id)
@@ -15,6 +15,8 @@ class FacialRecognitionImproved {
     this.attendanceData = {};
     this.lastRecognitionTime = 0;
     this.recognitionCooldown = 2000; // 2 secondes entre les reconnaissances
+    this.frameWidth = 640; // largeur d'envoi, ajustée selon la réponse du serveur
+    this.socket = null; // flux WebSocket (serveur ASGI), sinon envoi HTTP
 
     this.initialize();
   }
@@ -173,6 +175,7 @@ class FacialRecognitionImproved {
       this.isActive = true;
       this.showRecognitionActive();
       this.logMessage("Démarrage de la reconnaissance faciale...");
+      this.openSocket();
 
       // Démarrer la capture d'images
       this.recognitionInterval = setInterval(() => {
@@ -204,6 +207,7 @@ class FacialRecognitionImproved {
       clearInterval(this.recognitionInterval);
       this.recognitionInterval = null;
     }
+    this.closeSocket();
 
     // Mettre à jour le bouton
     const startBtn = document.getElementById("startRecognition");
@@ -216,6 +220,46 @@ class FacialRecognitionImproved {
     this.logMessage("Reconnaissance faciale arrêtée");
   }
 
+  openSocket() {
+    if (!("WebSocket" in window) || this.socket) {
+      return;
+    }
+
+    const protocol = window.location.protocol === "https:" ? "wss:" : "ws:";
+    const socket = new WebSocket(
+      `${protocol}//${window.location.host}/ws/facial-recognition/${this.sessionId}/`
+    );
+    socket.binaryType = "arraybuffer";
+
+    socket.onopen = () => {
+      this.socket = socket;
+      this.logMessage("Flux WebSocket de reconnaissance connecté");
+    };
+    socket.onmessage = (event) => {
+      const data = JSON.parse(event.data);
+      if (data.type === "recognition" || data.type === "error") {
+        this.handleRecognitionResponse(data);
+      } else if (data.type === "session_closed") {
+        this.logMessage(data.message);
+        this.stopRecognition();
+      }
+    };
+    // Serveur sans WebSocket (WSGI) ou connexion perdue : retour à l'envoi HTTP
+    socket.onclose = () => {
+      if (this.socket === socket) {
+        this.socket = null;
+      }
+    };
+  }
+
+  closeSocket() {
+    if (this.socket) {
+      const socket = this.socket;
+      this.socket = null;
+      socket.close();
+    }
+  }
+
   async captureAndRecognize() {
     if (!this.isActive || !this.video.videoWidth) {
       return;
@@ -228,16 +272,29 @@ class FacialRecognitionImproved {
     }
 
     try {
-      // Capturer l'image de la vidéo
-      this.canvas.width = this.video.videoWidth;
-      this.canvas.height = this.video.videoHeight;
-      this.ctx.drawImage(this.video, 0, 0);
-
-      // Convertir en base64
-      const imageData = this.canvas.toDataURL("image/jpeg", 0.8);
-
-      // Envoyer à l'API de reconnaissance
-      await this.sendToRecognitionAPI(imageData);
+      // Capturer l'image de la vidéo, réduite à la taille utilisée par le détecteur
+      const scale = Math.min(1, this.frameWidth / this.video.videoWidth);
+      this.canvas.width = Math.round(this.video.videoWidth * scale);
+      this.canvas.height = Math.round(this.video.videoHeight * scale);
+      this.ctx.drawImage(
+        this.video,
+        0,
+        0,
+        this.canvas.width,
+        this.canvas.height
+      );
+
+      // Encoder en JPEG binaire (pas de base64)
+      const imageBlob = await new Promise((resolve) =>
+        this.canvas.toBlob(resolve, "image/jpeg", 0.8)
+      );
+
+      // Envoyer sur le flux WebSocket, sinon à l'API de reconnaissance
+      if (this.socket && this.socket.readyState === WebSocket.OPEN) {
+        this.socket.send(imageBlob);
+      } else {
+        await this.sendToRecognitionAPI(imageBlob);
+      }
 
       this.lastRecognitionTime = now;
     } catch (error) {
@@ -245,43 +302,25 @@ class FacialRecognitionImproved {
     }
   }
 
-  async sendToRecognitionAPI(imageData) {
+  async sendToRecognitionAPI(imageBlob) {
     try {
       // Afficher un indicateur de traitement
       this.showProcessingIndicator();
 
-      const response = await fetch("/api/facial-recognition/", {
+      const url =
+        "/api/facial-recognition/?session_id=" +
+        encodeURIComponent(this.sessionId);
+      const response = await fetch(url, {
         method: "POST",
         headers: {
-          "Content-Type": "application/json",
+          "Content-Type": "image/jpeg",
           "X-CSRFToken": this.getCSRFToken(),
         },
-        body: JSON.stringify({
-          session_id: this.sessionId,
-          image: imageData,
-        }),
+        body: imageBlob,
       });
 
       const data = await response.json();
-
-      if (data.success) {
-        if (data.total_faces > 0) {
-          this.handleRecognitionResults(data.detected_faces);
-          this.logMessage(
-            `Détection réussie: ${data.total_faces} visage(s) détecté(s)`
-          );
-        } else {
-          // Aucun visage détecté
-          this.logMessage(data.message || "Aucun visage détecté");
-          this.showNoFaceDetected();
-        }
-      } else {
-        console.error("Erreur API:", data.error);
-        this.logMessage(
-          "Erreur de reconnaissance: " + (data.error || "Erreur inconnue")
-        );
-        this.showErrorMessage("Erreur lors de la reconnaissance faciale");
-      }
+      this.handleRecognitionResponse(data);
     } catch (error) {
       console.error("Erreur lors de l'envoi à l'API:", error);
       this.logMessage("Erreur de connexion à l'API: " + error.message);
@@ -292,9 +331,34 @@ class FacialRecognitionImproved {
     }
   }
 
+  handleRecognitionResponse(data) {
+    if (data.success) {
+      if (data.frame_width) {
+        this.frameWidth = data.frame_width;
+      }
+      if (data.total_faces > 0) {
+        this.handleRecognitionResults(data.detected_faces);
+        this.logMessage(
+          `Détection réussie: ${data.total_faces} visage(s) détecté(s)`
+        );
+      } else if (!data.dropped) {
+        // Aucun visage détecté
+        this.logMessage(data.message || "Aucun visage détecté");
+        this.showNoFaceDetected();
+      }
+    } else {
+      console.error("Erreur API:", data.error);
+      this.logMessage(
+        "Erreur de reconnaissance: " + (data.error || "Erreur inconnue")
+      );
+      this.showErrorMessage("Erreur lors de la reconnaissance faciale");
+    }
+  }
+
   handleRecognitionResults(detectedFaces) {
     detectedFaces.forEach((face) => {
-      if (face.eleve_id && face.confidence > 0.6) {
+      // Le serveur ne confirme un élève qu'après plusieurs images concordantes
+      if (face.eleve_id && face.confirmed) {
         this.updateStudentStatus(face.eleve_id, "PRESENT", face.confidence);
         this.showLastRecognition(face);
         this.logMessage(
@@ -1,3 +1,1243 @@
-from django.test import TestCase
+import asyncio
+import base64
+import datetime
+import functools
+import io
+import itertools
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
 
-# Create your tests here.
+import cv2
+import numpy as np
+from django.conf import settings
+from django.core import mail
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.mail.backends.locmem import EmailBackend
+from django.core.management import call_command
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from PIL import Image
+
+from .historique import finalize_session
+from .live import POLL_INTERVAL, POLL_MAX_INTERVAL, PresenceFeed, presence_version, stream
+from .models import (
+    Classe, Cours, EmailSortant, Eleve, EmpreinteFaciale, Enseignant, HistoriquePresence, Matiere, Notification, Parent,
+    PhotoReference, Presence, SessionAppel, User,
+)
+from .notifications import NotificationBatch
+from .outbox import build_message, claim_batch, claim_rows, daily_digest_time, dispatch_batch, prefetch_recaps
+from .photos import VARIANTS, generate_variants, variant_name
+from .qrcodes import InvalidQRCode, parse_qr_payload
+from .recognition import RecognitionEngine, RecognitionUnavailable
+from .recognition.cache import VERSION_KEY as EMPREINTES_VERSION_KEY, ReferenceCache, embeddings_version
+from .recognition.detector import FaceDetector
+from .recognition.embeddings import PixelEmbedder, create_embedder, normalize_rows
+from .recognition.frames import decode_frame
+from .recognition.matching import linear_sum_assignment, match_faces
+from .recognition.pipeline import FrameAnalysis
+from .recognition.quality import assess_photo, quality_weights
+from .recognition.store import ReferenceSet, load_class_references, sync_eleve_photo
+from .recognition.votes import SessionVotes, VoteAccumulator
+from .recognition.websocket import CLOSE_NOT_FOUND, websocket_application
+from .recognition.workers import RecognitionPool, create_pool
+from .roster import VERSION_CHECK_INTERVAL, VERSION_KEY, SessionTerminee, get_roster, record_presence
+
+
+def isoler_memoire_des_processus(test):
+    """
+    Les versions en cache (table en base) sont annulées à la fin de chaque
+    test : les rosters et versions gardés par le processus doivent l'être aussi
+    """
+    for memoire in ('school.roster._rosters', 'school.roster._versions', 'school.recognition.cache._versions'):
+        memoire = mock.patch.dict(memoire, clear=True)
+        memoire.start()
+        test.addCleanup(memoire.stop)
+
+
+class OuvertureAppelTests(TestCase):
+    """Le nombre de requêtes des pages d'appel ne dépend pas de la taille de la classe"""
+
+    def setUp(self):
+        isoler_memoire_des_processus(self)
+        # Version relue à chaque ouverture : nombre de requêtes indépendant de la durée du test
+        intervalle = mock.patch('school.roster.VERSION_CHECK_INTERVAL', 0)
+        intervalle.start()
+        self.addCleanup(intervalle.stop)
+        self.classe = Classe.objects.create(nom='6A')
+        user = User.objects.create_user('enseignant', password='secret', role='ENSEIGNANT')
+        enseignant = Enseignant.objects.create(user=user, date_embauche=datetime.date(2020, 9, 1))
+        self.cours = Cours.objects.create(
+            matiere=Matiere.objects.create(nom='Mathématiques'),
+            classe=self.classe,
+            enseignant=enseignant,
+            date=timezone.now().date(),
+            heure_debut=datetime.time(8),
+            heure_fin=datetime.time(9),
+        )
+        self.nombre_eleves = 0
+        self.client.login(username='enseignant', password='secret')
+
+    def ajouter_eleves(self, nombre):
+        for _ in range(nombre):
+            self.nombre_eleves += 1
+            user = User.objects.create_user(
+                f'eleve{self.nombre_eleves}', role='ELEVE',
+                first_name='Eleve', last_name=f'Numero{self.nombre_eleves}',
+            )
+            Eleve.objects.create(user=user, classe=self.classe)
+
+    def requetes(self, url):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response, len(context.captured_queries)
+
+    def test_scan_qr_eleves_nombre_de_requetes_constant(self):
+        url = reverse('scan_qr_eleves', args=[self.cours.id])
+        self.ajouter_eleves(3)
+        self.requetes(url)  # ouverture de la session
+        _, petite_classe = self.requetes(url)
+
+        self.ajouter_eleves(30)
+        response, grande_classe = self.requetes(url)
+
+        self.assertEqual(grande_classe, petite_classe)
+        self.assertEqual(len(response.context['eleves_with_presence']), 33)
+        self.assertEqual(Presence.objects.filter(statut='ABSENT').count(), 33)
+
+    def test_qr_code_scan_nombre_de_requetes_constant(self):
+        url = reverse('qr_code_scan', args=[self.cours.id])
+        self.ajouter_eleves(3)
+        self.requetes(url)  # ouverture de la session
+        _, petite_classe = self.requetes(url)
+
+        self.ajouter_eleves(30)
+        response, grande_classe = self.requetes(url)
+
+        self.assertEqual(grande_classe, petite_classe)
+        self.assertEqual(len(response.context['eleves']), 33)
+
+    def test_qr_codes_servis_par_url(self):
+        self.ajouter_eleves(2)
+        response = self.client.get(reverse('qr_code_scan', args=[self.cours.id]))
+
+        self.assertNotContains(response, 'data:image/png;base64')
+        for eleve in Eleve.objects.all():
+            url = eleve.get_qr_code_url()
+            self.assertContains(response, f'src="{url}"')
+            self.assertEqual(self.client.get(url)['Content-Type'], 'image/png')
+
+
+class ConnexionComptee(EmailBackend):
+    """Backend locmem qui compte ses connexions et peut échouer"""
+
+    def __init__(self, echecs=0, **kwargs):
+        super().__init__(**kwargs)
+        self.ouvertures = 0
+        self.echecs = echecs
+
+    def open(self):
+        self.ouvertures += 1
+        return super().open()
+
+    def send_messages(self, messages):
+        if self.echecs:
+            self.echecs -= 1
+            raise ConnectionError('Serveur indisponible')
+        return super().send_messages(messages)
+
+
+class SeanceAvecParents:
+    """Séance en cours d'une classe de trois élèves ayant chacun un parent"""
+
+    def setUp(self):
+        isoler_memoire_des_processus(self)
+        classe = Classe.objects.create(nom='6A')
+        user = User.objects.create_user('enseignant', password='secret', role='ENSEIGNANT')
+        enseignant = Enseignant.objects.create(user=user, date_embauche=datetime.date(2020, 9, 1))
+        cours = Cours.objects.create(
+            matiere=Matiere.objects.create(nom='Mathématiques'),
+            classe=classe,
+            enseignant=enseignant,
+            date=timezone.now().date(),
+            heure_debut=datetime.time(8),
+            heure_fin=datetime.time(9),
+        )
+        self.session = SessionAppel.objects.create(cours=cours, enseignant=enseignant)
+        self.presences = []
+        for i in range(3):
+            parent = Parent.objects.create(user=User.objects.create_user(
+                f'parent{i}', email=f'parent{i}@example.com', role='PARENT',
+            ))
+            eleve = Eleve.objects.create(
+                user=User.objects.create_user(f'eleve{i}', role='ELEVE', first_name='Eleve', last_name=f'Numero{i}'),
+                classe=classe, parent=parent,
+            )
+            self.presences.append(Presence.objects.create(session_appel=self.session, eleve=eleve))
+        self.client.login(username='enseignant', password='secret')
+
+
+class MediaTemporaire:
+    """Fichiers envoyés écrits dans un dossier temporaire"""
+
+    def setUp(self):
+        super().setUp()
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        media = override_settings(MEDIA_ROOT=self.media_root)
+        media.enable()
+        self.addCleanup(media.disable)
+
+
+class MoteurPixels:
+    """Moteur partagé (signaux, miniatures) aux empreintes pixels"""
+
+    def setUp(self):
+        super().setUp()
+        self.engine = RecognitionEngine(embedder=PixelEmbedder())
+        engine = mock.patch('school.recognition.engine._engine', self.engine)
+        engine.start()
+        self.addCleanup(engine.stop)
+
+
+@override_settings(EMAIL_OUTBOX={'RATE_LIMIT': 0, 'MAX_ATTEMPTS': 2, 'RETRY_DELAY': 60})
+class FileEmailsTests(SeanceAvecParents, TestCase):
+    """Les emails aux parents passent par la file d'envoi"""
+
+    def scan(self, presence, statut):
+        response = self.client.post(
+            reverse('api_update_presence_from_scan'),
+            {'eleve_id': presence.eleve_id, 'session_id': str(self.session.id), 'statut': statut},
+            content_type='application/json',
+        )
+        self.assertEqual(response.status_code, 200)
+
+    def terminer_appel(self):
+        """Fin de l'appel : les récapitulatifs en attente partent au prochain lot"""
+        with self.captureOnCommitCallbacks(execute=True):
+            self.session.statut = 'TERMINE'
+            self.session.save()
+
+    def test_scan_ajoute_l_email_a_la_file_sans_l_envoyer(self):
+        self.scan(self.presences[0], 'PRESENT')
+        self.assertEqual(len(mail.outbox), 0)
+        email = EmailSortant.objects.get()
+        self.assertEqual((email.type_email, email.statut), ('RECAP_SESSION', 'EN_ATTENTE'))
+        self.assertGreater(email.prochain_essai, timezone.now())
+
+    def test_un_seul_recapitulatif_par_parent_et_par_seance(self):
+        parent = self.presences[0].eleve.parent
+        frere = Eleve.objects.create(
+            user=User.objects.create_user('frere', role='ELEVE', first_name='Frere', last_name='Numero0'),
+            classe=self.presences[0].eleve.classe, parent=parent,
+        )
+        Presence.objects.create(session_appel=self.session, eleve=frere)
+        for statut in ['PRESENT', 'RETARD', 'PRESENT']:
+            self.scan(self.presences[0], statut)
+        self.scan(Presence.objects.get(eleve=frere), 'ABSENT')
+        self.assertEqual(EmailSortant.objects.count(), 1)
+
+        # Rien ne part avant la fin de l'appel (ou du délai de regroupement)
+        self.assertEqual(dispatch_batch(connection=ConnexionComptee()), 0)
+        self.terminer_appel()
+        self.assertEqual(dispatch_batch(connection=ConnexionComptee()), 1)
+
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, ['parent0@example.com'])
+        html = mail.outbox[0].alternatives[0][0]
+        self.assertIn('Eleve Numero0', html)
+        self.assertIn('Frere Numero0', html)
+        self.assertIn('>Présent<', html)
+        self.assertNotIn('>Retard<', html)
+
+    def test_recapitulatif_quotidien(self):
+        parent = self.presences[0].eleve.parent
+        parent.recap_quotidien = True
+        parent.save()
+        self.scan(self.presences[0], 'ABSENT')
+
+        email = EmailSortant.objects.get()
+        self.assertEqual((email.type_email, email.date), ('RECAP_JOUR', timezone.localdate()))
+        self.assertGreaterEqual(email.prochain_essai, daily_digest_time(timezone.localdate()))
+
+    def test_lot_envoye_sur_une_seule_connexion(self):
+        for presence in self.presences:
+            self.scan(presence, 'ABSENT')
+        self.terminer_appel()
+        backend = ConnexionComptee()
+
+        self.assertEqual(dispatch_batch(connection=backend), 3)
+
+        self.assertEqual(backend.ouvertures, 1)
+        self.assertEqual(sorted(m.to[0] for m in mail.outbox),
+                         ['parent0@example.com', 'parent1@example.com', 'parent2@example.com'])
+        self.assertEqual(EmailSortant.objects.filter(statut='ENVOYE').count(), 3)
+        self.assertEqual(dispatch_batch(connection=backend), 0)
+
+    def test_echec_reessaye_plus_tard_puis_abandonne(self):
+        self.scan(self.presences[0], 'RETARD')
+        self.terminer_appel()
+
+        dispatch_batch(connection=ConnexionComptee(echecs=1))
+        email = EmailSortant.objects.get()
+        self.assertEqual((email.statut, email.tentatives), ('ENVOI', 1))
+        self.assertGreater(email.prochain_essai, timezone.now())
+        self.assertEqual(dispatch_batch(connection=ConnexionComptee()), 0)  # pas encore
+
+        EmailSortant.objects.update(prochain_essai=timezone.now())
+        dispatch_batch(connection=ConnexionComptee(echecs=1))
+        email.refresh_from_db()
+        self.assertEqual((email.statut, email.tentatives), ('ECHEC', 2))
+        self.assertEqual(len(mail.outbox), 0)
+
+    def test_changement_apres_reservation_ouvre_un_nouveau_recapitulatif(self):
+        self.scan(self.presences[0], 'PRESENT')
+        self.terminer_appel()
+        [email] = claim_batch()
+        self.assertEqual(email.statut, 'ENVOI')
+
+        # Le récapitulatif réservé ne reçoit plus de changements
+        self.scan(self.presences[0], 'RETARD')
+        self.assertEqual(EmailSortant.objects.filter(statut='EN_ATTENTE').count(), 1)
+        self.assertEqual(EmailSortant.objects.count(), 2)
+
+    def test_reservation_par_un_seul_processus(self):
+        self.scan(self.presences[0], 'PRESENT')
+        self.terminer_appel()
+        rows = list(EmailSortant.objects.values_list('id', 'statut', 'prochain_essai'))
+        fin = timezone.now() + datetime.timedelta(minutes=5)
+
+        # Deux processus ont lu la même ligne : le second ne la réserve pas
+        self.assertEqual(claim_rows(rows, fin), [rows[0][0]])
+        self.assertEqual(claim_rows(rows, fin), [])
+        self.assertEqual(claim_batch(), [])
+
+        # Réservation expirée (processus arrêté) : l'email est repris
+        EmailSortant.objects.update(prochain_essai=timezone.now())
+        self.assertEqual(len(claim_batch()), 1)
+
+    def test_emails_d_un_lot_construits_en_une_requete(self):
+        for presence in self.presences:
+            self.scan(presence, 'ABSENT')
+        self.terminer_appel()
+        emails = claim_batch()
+
+        with self.assertNumQueries(1):
+            prefetch_recaps(emails)
+            messages = [build_message(email) for email in emails]
+
+        self.assertEqual(len(messages), 3)
+        message = next(message for message in messages if message.to == ['parent0@example.com'])
+        self.assertIn('Eleve Numero0', message.body)
+        self.assertNotIn('<div', message.body)
+        self.assertIn('<div', message.alternatives[0][0])
+
+    @override_settings(EMAIL_OUTBOX={'RATE_LIMIT': 2})
+    def test_debit_limite(self):
+        for presence in self.presences:
+            self.scan(presence, 'PRESENT')
+        self.terminer_appel()
+        attentes = []
+
+        dispatch_batch(connection=ConnexionComptee(), sleep=attentes.append)
+
+        self.assertEqual(len(mail.outbox), 3)
+        self.assertEqual(len(attentes), 2)
+        self.assertTrue(all(0 < attente <= 0.5 for attente in attentes))
+
+
+class NotificationsParentsTests(SeanceAvecParents, TestCase):
+    """Les notifications aux parents sont écrites en une requête, sans chargement à la demande"""
+
+    def test_notifications_d_une_session_en_deux_requetes(self):
+        for presence in self.presences:
+            presence.statut = 'ABSENT'
+            presence.save()
+
+        with self.assertNumQueries(2):
+            with NotificationBatch() as notifications:
+                notifications.add_presences([presence.id for presence in self.presences])
+
+        self.assertEqual(Notification.objects.filter(type_notification='ABSENCE').count(), 3)
+
+    def test_presences_validees_par_la_reconnaissance_faciale(self):
+        engine = RecognitionEngine(embedder=PixelEmbedder())
+        self.presences[2].statut = 'PRESENT'
+        self.presences[2].save()
+
+        # 3 UPDATE, get_or_create de l'élève déjà présent, puis les notifications en deux requêtes
+        with self.assertNumQueries(6):
+            engine.record_presences(self.session, {presence.eleve_id: 0.9 for presence in self.presences})
+
+        notifications = Notification.objects.filter(type_notification='PRESENCE')
+        self.assertEqual(sorted(notifications.values_list('destinataire__username', flat=True)), ['parent0', 'parent1'])
+
+    def test_mise_a_jour_de_presence(self):
+        response = self.client.post(
+            reverse('api_update_presence'),
+            {'presence_id': self.presences[0].id, 'statut': 'RETARD'},
+            content_type='application/json',
+        )
+        self.assertEqual(response.status_code, 200)
+
+        notification = Notification.objects.get()
+        self.assertEqual(notification.destinataire, self.presences[0].eleve.parent.user)
+        self.assertEqual(notification.type_notification, 'RETARD')
+        self.assertIn('Mathématiques', notification.message)
+
+
+class FinalisationSessionTests(SeanceAvecParents, TestCase):
+    """Terminer ou valider une session écrit l'historique en un nombre constant de requêtes"""
+
+    def valider(self):
+        response = self.client.post(
+            reverse('api_validate_session'), {'session_id': str(self.session.id)}, content_type='application/json',
+        )
+        self.assertEqual(response.status_code, 200)
+
+    def test_validation_repetee_met_a_jour_l_historique(self):
+        self.valider()
+        Presence.objects.filter(pk=self.presences[0].pk).update(statut='JUSTIFIE')
+        self.valider()
+
+        self.assertEqual(HistoriquePresence.objects.count(), 3)
+        self.assertEqual(HistoriquePresence.objects.get(eleve=self.presences[0].eleve).statut, 'JUSTIFIE')
+
+    def test_fin_d_appel_partage_le_meme_chemin(self):
+        self.presences[1].statut = 'RETARD'
+        self.presences[1].save()
+        response = self.client.post(
+            reverse('api_finish_call'),
+            {'session_id': str(self.session.id), 'cours_id': self.session.cours_id},
+            content_type='application/json',
+        )
+
+        self.assertEqual(response.json()['stats'], {'present': 0, 'retard': 1, 'absent': 2, 'total': 3})
+        self.assertEqual(HistoriquePresence.objects.count(), 3)
+        self.valider()
+        self.assertEqual(HistoriquePresence.objects.count(), 3)
+
+    def test_nombre_de_requetes_constant(self):
+        session = SessionAppel.objects.select_related('cours')
+        with CaptureQueriesContext(connection) as petite_classe:
+            finalize_session(session.get(pk=self.session.pk))
+
+        classe = self.presences[0].eleve.classe
+        for i in range(20):
+            eleve = Eleve.objects.create(user=User.objects.create_user(f'autre{i}', role='ELEVE'), classe=classe)
+            Presence.objects.create(session_appel=self.session, eleve=eleve)
+        with CaptureQueriesContext(connection) as grande_classe:
+            finalize_session(session.get(pk=self.session.pk))
+
+        self.assertEqual(len(grande_classe), len(petite_classe))
+        self.assertEqual(HistoriquePresence.objects.count(), 23)
+
+
+class ReconnaissanceFacialeTests(SeanceAvecParents, TestCase):
+    """Moteur de reconnaissance faciale de l'appel"""
+
+    def test_empreintes_de_secours_sans_enregistrement(self):
+        engine = RecognitionEngine(embedder=PixelEmbedder(fallback=True))
+        with mock.patch('school.recognition.engine._engine', engine):
+            response = self.client.post(
+                reverse('api_facial_recognition') + f'?session_id={self.session.id}',
+                b'image', content_type='image/jpeg',
+            )
+
+        self.assertEqual(response.status_code, 503)
+        self.assertFalse(Presence.objects.exclude(statut='ABSENT').exists())
+        with self.assertRaises(RecognitionUnavailable):
+            engine.recognize(self.session, b'image')
+
+    @override_settings(FACIAL_RECOGNITION={'EMBEDDING_BACKEND': 'pixels', 'WORKERS': 0, 'VOTE_COMMIT_SCORE': 2.0})
+    def test_images_fixes_ne_valident_pas_la_presence(self):
+        engine = RecognitionEngine()
+        eleve_id = self.presences[0].eleve_id
+        resultat = ([(0, 10, 10, 0)], [(0, eleve_id, 0.95)], {eleve_id: 'Eleve Numero0'})
+        analyses = [FrameAnalysis(FrameAnalysis.ANALYSED, thumbnail='miniature')] + [FrameAnalysis(FrameAnalysis.STATIC)] * 5
+
+        with mock.patch.object(engine, 'analyse', side_effect=analyses), \
+                mock.patch.object(engine, 'match', return_value=resultat):
+            for _ in analyses:
+                faces = engine.recognize(self.session, b'image')
+                self.assertEqual(faces[0]['eleve_id'], eleve_id)
+                self.assertFalse(faces[0]['confirmed'])
+
+        self.assertEqual(Presence.objects.get(pk=self.presences[0].pk).statut, 'ABSENT')
+
+    def test_session_invalide(self):
+        url = reverse('api_facial_recognition')
+        response = self.client.post(url + '?session_id=pas-un-uuid', b'image', content_type='image/jpeg')
+        self.assertEqual(response.status_code, 400)
+        response = self.client.post(url + f'?session_id={uuid.uuid4()}', b'image', content_type='image/jpeg')
+        self.assertEqual(response.status_code, 404)
+
+    @override_settings(FACIAL_RECOGNITION={'EMBEDDING_BACKEND': 'pixels'})
+    def test_seuil_calibre_par_calculateur(self):
+        embedder = create_embedder()
+        self.assertFalse(embedder.fallback)
+        self.assertEqual(RecognitionEngine(embedder=embedder).threshold, PixelEmbedder.match_threshold)
+        with override_settings(FACIAL_RECOGNITION={'MATCH_THRESHOLD': 0.7}):
+            self.assertEqual(RecognitionEngine(embedder=embedder).threshold, 0.7)
+
+
+class ApiReconnaissanceTests(SeanceAvecParents, TestCase):
+    """Formats d'envoi des images de la caméra à l'API de reconnaissance"""
+
+    def setUp(self):
+        super().setUp()
+        self.url = reverse('api_facial_recognition')
+        self.image = image_jpeg()
+        eleve_id = self.presences[0].eleve_id
+        self.engine = mock.Mock()
+        self.engine.recognize.return_value = [
+            {'eleve_id': eleve_id, 'confirmed': False}, {'eleve_id': None, 'confirmed': False},
+        ]
+        engine = mock.patch('school.recognition.engine._engine', self.engine)
+        engine.start()
+        self.addCleanup(engine.stop)
+
+    def image_recue(self, response):
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.json()['total_faces'], response.json()['recognized']), (2, 1))
+        session, image = self.engine.recognize.call_args.args
+        self.assertEqual(session.pk, self.session.pk)
+        return decode_frame(image)
+
+    def test_image_binaire(self):
+        response = self.client.post(f'{self.url}?session_id={self.session.id}', self.image, content_type='image/jpeg')
+        self.assertEqual(self.image_recue(response).shape, (240, 320, 3))
+
+        response = self.client.post(
+            self.url, self.image, content_type='image/jpeg', HTTP_X_SESSION_ID=str(self.session.id),
+        )
+        self.assertEqual(self.image_recue(response).shape, (240, 320, 3))
+
+    def test_image_multipart(self):
+        response = self.client.post(self.url, {
+            'session_id': str(self.session.id),
+            'image': SimpleUploadedFile('image.jpg', self.image, content_type='image/jpeg'),
+        })
+        self.assertEqual(self.image_recue(response).shape, (240, 320, 3))
+
+    def test_image_json_en_data_url(self):
+        response = self.client.post(self.url, {
+            'session_id': str(self.session.id),
+            'image': 'data:image/jpeg;base64,' + base64.b64encode(self.image).decode(),
+        }, content_type='application/json')
+        self.assertEqual(self.image_recue(response).shape, (240, 320, 3))
+
+    def test_largeur_de_detection_indiquee_au_client(self):
+        url = f'{self.url}?session_id={self.session.id}'
+        self.assertEqual(self.client.post(url, self.image, content_type='image/jpeg').json()['frame_width'], 640)
+        with override_settings(FACIAL_RECOGNITION={'DETECTION_WIDTH': 320}):
+            response = self.client.post(url, self.image, content_type='image/jpeg')
+        self.assertEqual(response.json()['frame_width'], 320)
+
+    def test_image_trop_volumineuse(self):
+        url = f'{self.url}?session_id={self.session.id}'
+        with override_settings(FACIAL_RECOGNITION={'MAX_FRAME_SIZE': len(self.image) - 1}):
+            self.assertEqual(self.client.post(url, self.image, content_type='image/jpeg').status_code, 413)
+        # Limite de Django atteinte avant celle de l'API
+        with override_settings(DATA_UPLOAD_MAX_MEMORY_SIZE=len(self.image) - 1):
+            self.assertEqual(self.client.post(url, self.image, content_type='image/jpeg').status_code, 413)
+        self.engine.recognize.assert_not_called()
+
+
+@mock.patch('school.recognition.matching._scipy_linear_sum_assignment', None)
+class AffectationVisagesTests(SimpleTestCase):
+    """Affectation un-à-un des visages aux élèves (algorithme hongrois sans SciPy)"""
+
+    def test_cout_minimal_comme_la_force_brute(self):
+        rng = np.random.default_rng(0)
+        for n, m in [(1, 1), (2, 3), (3, 3), (4, 2), (3, 5), (5, 5)]:
+            for _ in range(20):
+                cost = rng.random((n, m))
+                rows, cols = linear_sum_assignment(cost)
+
+                self.assertEqual(len(rows), min(n, m))
+                self.assertEqual(len(set(cols)), len(cols))
+                if n <= m:
+                    best = min(cost[range(n), perm].sum() for perm in itertools.permutations(range(m), n))
+                else:
+                    best = min(cost[perm, range(m)].sum() for perm in itertools.permutations(range(n), m))
+                self.assertAlmostEqual(cost[rows, cols].sum(), best)
+
+    def references(self, vectors, eleve_ids):
+        return ReferenceSet(np.array(eleve_ids), normalize_rows(np.array(vectors, dtype=np.float32)), {})
+
+    def test_seuil_et_visages_sans_eleve(self):
+        references = self.references([[1, 0, 0], [0, 1, 0]], [10, 20])
+        faces = normalize_rows(np.array([[0, 1, 0.1], [1, 0.1, 0], [0, 0, 1]], dtype=np.float32))
+
+        matches = match_faces(faces, references, 0.9)
+
+        self.assertEqual([eleve_id for _, eleve_id, _ in matches], [20, 10, None])
+        self.assertEqual(matches[2][2], 0.0)
+        self.assertEqual([eleve_id for _, eleve_id, _ in match_faces(faces, references, 0.999)], [None, None, None])
+
+    def test_un_eleve_attribue_a_un_seul_visage(self):
+        references = self.references([[1, 0], [0.8, 0.6], [0, 1]], [10, 10, 20])
+        faces = normalize_rows(np.array([[1, 0.05], [0.9, 0.1]], dtype=np.float32))
+
+        matches = match_faces(faces, references, 0.5)
+
+        # Le second visage ressemble aussi à l'élève 10, déjà attribué : il reste inconnu
+        self.assertEqual([eleve_id for _, eleve_id, _ in matches], [10, None])
+
+
+class VotesPresenceTests(SimpleTestCase):
+    """Une présence n'est validée qu'après plusieurs images concordantes"""
+
+    def test_validation_apres_cumul_des_scores(self):
+        votes = VoteAccumulator(window=5, commit_score=2.0)
+
+        self.assertEqual(votes.add_frame({1: 0.9, 2: 0.7}), [])
+        self.assertEqual(votes.add_frame({1: 0.8}), [])
+        self.assertEqual(votes.add_frame({1: 0.7, 2: 0.7}), [(1, 0.8)])
+        self.assertTrue(votes.is_committed(1))
+        self.assertFalse(votes.is_committed(2))
+        # Un élève validé ne l'est qu'une fois
+        self.assertEqual(votes.add_frame({1: 0.9, 2: 0.7}), [(2, 0.7)])
+        self.assertEqual(votes.add_frame({1: 0.9}), [])
+
+    def test_scores_oublies_hors_de_la_fenetre(self):
+        votes = VoteAccumulator(window=3, commit_score=2.0)
+
+        for matches in [{1: 0.9}, {}, {}, {1: 0.9}, {}, {}]:
+            self.assertEqual(votes.add_frame(matches), [])
+        self.assertEqual(votes.add_frame({1: 0.6}), [])
+        self.assertEqual(votes.add_frame({1: 0.7}), [])
+        self.assertEqual(votes.add_frame({1: 0.8}), [(1, 0.7)])
+
+    def test_sessions_les_plus_anciennes_evincees(self):
+        sessions = SessionVotes(max_sessions=2)
+        premiere = sessions.get('a')
+        sessions.get('b')
+        sessions.get('a')
+        sessions.get('c')
+
+        self.assertEqual(list(sessions._sessions), ['a', 'c'])
+        self.assertIs(sessions.get('a'), premiere)
+
+
+class FluxWebSocketTests(SimpleTestCase):
+    """Ouverture du flux WebSocket de reconnaissance faciale"""
+
+    def connecter(self, path):
+        messages = []
+
+        async def receive():
+            return {'type': 'websocket.connect'}
+
+        async def send(message):
+            messages.append(message)
+
+        asyncio.run(websocket_application({'type': 'websocket', 'path': path, 'headers': []}, receive, send))
+        return messages
+
+    def test_identifiant_de_session_invalide(self):
+        for session_id in ['pas-un-uuid', '-' * 36, 'g' * 32]:
+            self.assertEqual(
+                self.connecter(f'/ws/facial-recognition/{session_id}/'),
+                [{'type': 'websocket.close', 'code': CLOSE_NOT_FOUND}],
+            )
+
+
+class ScanQRCodeTests(SeanceAvecParents, TestCase):
+    """Contenu signé des QR codes des élèves"""
+
+    def scanner(self, qr_code_data):
+        return self.client.post(
+            reverse('api_qr_code_scan'),
+            {'session_id': str(self.session.id), 'qr_code_data': qr_code_data},
+            content_type='application/json',
+        )
+
+    def statut(self, presence):
+        return Presence.objects.get(pk=presence.pk).statut
+
+    def test_qr_code_signe(self):
+        eleve = self.presences[0].eleve
+        self.assertEqual(parse_qr_payload(eleve.get_qr_payload().lower()), (eleve.id, eleve.classe_id))
+
+        response = self.scanner(eleve.get_qr_payload())
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.statut(self.presences[0]), 'PRESENT')
+
+    def test_qr_code_falsifie(self):
+        eleve = self.presences[0].eleve
+        autre = self.presences[1].eleve
+        _, id_eleve, id_classe, signature = eleve.get_qr_payload().split('.')
+        falsifie = '.'.join(['FT1', autre.get_qr_payload().split('.')[1], id_classe, signature])
+
+        for contenu in [falsifie, f'FT1.{id_eleve}.{id_classe}', f'FT1.{id_eleve}.{id_classe}.{signature[:-1]}A']:
+            with self.assertRaises(InvalidQRCode):
+                parse_qr_payload(contenu)
+            self.assertEqual(self.scanner(contenu).status_code, 400)
+        self.assertEqual(self.statut(self.presences[1]), 'ABSENT')
+
+    def test_qr_code_d_une_autre_classe(self):
+        autre_classe = Classe.objects.create(nom='5B')
+        eleve = Eleve.objects.create(user=User.objects.create_user('intrus', role='ELEVE'), classe=autre_classe)
+
+        response = self.scanner(eleve.get_qr_payload())
+
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Presence.objects.filter(eleve=eleve).exists())
+
+    def test_ancienne_carte_au_matricule(self):
+        self.assertIsNone(parse_qr_payload(self.presences[2].eleve.matricule))
+
+        response = self.scanner(f' {self.presences[2].eleve.matricule} ')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.statut(self.presences[2]), 'PRESENT')
+        self.assertEqual(self.scanner('MATRICULE-INCONNU').status_code, 404)
+
+
+class CheckinMobileTests(SeanceAvecParents, TestCase):
+    """Confirmation de présence depuis l'interface mobile"""
+
+    def checkin(self, **donnees):
+        donnees = {'session_id': str(self.session.id), 'cours_id': self.session.cours_id, **donnees}
+        return self.client.post(reverse('api_mobile_checkin'), donnees, content_type='application/json')
+
+    def test_presence_confirmee(self):
+        response = self.checkin(eleve_id=str(self.presences[0].eleve_id))
+
+        self.assertTrue(response.json()['success'])
+        self.assertEqual(Presence.objects.get(pk=self.presences[0].pk).statut, 'PRESENT')
+
+    def test_parametres_invalides(self):
+        for donnees, erreur in [
+            ({'eleve_id': 'abc'}, 'eleve_id invalide'),
+            ({'eleve_id': None}, 'eleve_id invalide'),
+            ({'eleve_id': [self.presences[0].eleve_id]}, 'eleve_id invalide'),
+            ({'eleve_id': self.presences[0].eleve_id, 'statut': 'INCONNU'}, 'Statut invalide'),
+        ]:
+            response = self.checkin(**donnees)
+            self.assertEqual(response.status_code, 400)
+            self.assertEqual(response.json(), {'success': False, 'error': erreur})
+        self.assertFalse(Presence.objects.exclude(statut='ABSENT').exists())
+
+
+class CacheEmpreintesTests(MoteurPixels, MediaTemporaire, SeanceAvecParents, TestCase):
+    """Les empreintes d'une classe restent en mémoire jusqu'à la modification d'un élève"""
+
+    def setUp(self):
+        super().setUp()
+        self.classe_id = self.presences[0].eleve.classe_id
+        self.references = ReferenceCache()
+        self.chargement = mock.Mock(side_effect=lambda classe_id: object())
+        self.premier = self.references.get(self.classe_id, self.chargement)
+
+    def references_rechargees(self):
+        version = embeddings_version(self.classe_id)
+        references = self.references.get(self.classe_id, self.chargement)
+        self.assertIsNot(references, self.premier)
+        self.assertEqual(self.chargement.call_count, 2)
+        self.assertEqual(len(self.references), 1)
+        self.assertGreater(version, 0)
+
+    def test_lecture_sans_requete(self):
+        with self.assertNumQueries(0):
+            self.assertIs(self.references.get(self.classe_id, self.chargement), self.premier)
+        self.assertEqual(self.chargement.call_count, 1)
+
+    def test_changement_de_photo(self):
+        eleve = self.presences[0].eleve
+        with self.captureOnCommitCallbacks(execute=True):
+            eleve.photo_reference = SimpleUploadedFile('eleve0.jpg', image_jpeg(), content_type='image/jpeg')
+            eleve.save()
+
+        self.references_rechargees()
+
+    def test_changement_de_classe(self):
+        eleve = self.presences[0].eleve
+        with self.captureOnCommitCallbacks(execute=True):
+            eleve.classe = Classe.objects.create(nom='5B')
+            eleve.save()
+
+        self.references_rechargees()
+
+    def test_modification_par_un_autre_processus(self):
+        cache.set(EMPREINTES_VERSION_KEY.format(classe_id=self.classe_id), 1, None)
+
+        self.assertIs(self.references.get(self.classe_id, self.chargement), self.premier)
+        with mock.patch('school.recognition.cache.time.monotonic', return_value=time.monotonic() + 1):
+            self.references_rechargees()
+
+
+class ListeAppelTests(SeanceAvecParents, TestCase):
+    """Liste d'appel en cache partagé, invalidée quand la classe ou la session change"""
+
+    def test_reconstruite_quand_la_classe_change(self):
+        roster = get_roster(self.session.id)
+        self.assertEqual(len(roster['eleves']), 3)
+
+        classe = self.presences[0].eleve.classe
+        partant = self.presences[0].eleve
+        with self.captureOnCommitCallbacks(execute=True):
+            partant.classe = Classe.objects.create(nom='5B')
+            partant.save()
+            nouveau = Eleve.objects.create(user=User.objects.create_user('nouveau', role='ELEVE'), classe=classe)
+
+        roster = get_roster(self.session.id)
+        self.assertNotIn(partant.id, roster['eleves'])
+        self.assertIn(nouveau.id, roster['eleves'])
+        self.assertTrue(Presence.objects.filter(session_appel=self.session, eleve=nouveau).exists())
+
+    def test_invalidee_a_la_fin_de_la_session(self):
+        self.assertIsNotNone(get_roster(self.session.id))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            finalize_session(SessionAppel.objects.select_related('cours').get(pk=self.session.pk))
+
+        self.assertIsNone(get_roster(self.session.id))
+
+    def test_ecriture_refusee_si_la_session_est_terminee(self):
+        roster = get_roster(self.session.id)
+        # Fin de session non signalée au cache (autre processus, update() direct)
+        SessionAppel.objects.filter(pk=self.session.pk).update(statut='TERMINE')
+
+        entry = roster['eleves'][self.presences[0].eleve_id]
+        with self.assertRaises(SessionTerminee):
+            record_presence(roster, entry)
+
+        self.assertEqual(Presence.objects.get(pk=self.presences[0].pk).statut, 'ABSENT')
+        self.assertIsNone(get_roster(self.session.id))
+
+    def test_lecture_en_memoire_du_processus(self):
+        roster = get_roster(self.session.id)
+
+        with self.assertNumQueries(0):
+            self.assertIs(get_roster(self.session.id), roster)
+
+    def test_modification_par_un_autre_processus(self):
+        roster = get_roster(self.session.id)
+        partant = self.presences[0].eleve
+        # Changement de classe signalé par un autre processus : seul le cache partagé change
+        Eleve.objects.filter(pk=partant.pk).update(classe=Classe.objects.create(nom='5B'))
+        cache.set(VERSION_KEY.format(classe_id=roster['classe_id']), roster['version'] + 1, None)
+
+        self.assertIs(get_roster(self.session.id), roster)
+        with mock.patch('school.roster.time.monotonic', return_value=time.monotonic() + VERSION_CHECK_INTERVAL):
+            self.assertNotIn(partant.id, get_roster(self.session.id)['eleves'])
+
+
+class FluxPresencesTests(SeanceAvecParents, TestCase):
+    """Le flux en direct n'envoie que les présences modifiées depuis son curseur"""
+
+    def modifier(self, objet, statut):
+        with self.captureOnCommitCallbacks(execute=True):
+            objet.statut = statut
+            objet.save()
+
+    def evenements(self, chunks):
+        evenements = []
+        for chunk in chunks:
+            champs = dict(line.split(': ', 1) for line in chunk.splitlines() if ': ' in line)
+            if 'event' in champs:
+                evenements.append((champs['event'], champs.get('id'), json.loads(champs['data'])))
+        return evenements
+
+    def test_curseur_des_modifications(self):
+        feed = PresenceFeed(self.session.id, timezone.now().isoformat())
+        self.assertEqual(self.evenements(feed.start()), [])
+
+        self.modifier(self.presences[0], 'PRESENT')
+        [(event, curseur, data)] = self.evenements(feed.poll())
+        self.assertEqual(event, 'presences')
+        self.assertEqual([update['presence_id'] for update in data['updates']], [self.presences[0].id])
+        self.assertEqual(curseur, self.presences[0].date_modification.isoformat())
+
+        # Rien de nouveau : seul le compteur de version est lu
+        with self.assertNumQueries(1):
+            self.assertEqual(feed.poll(), [])
+
+        self.modifier(self.presences[1], 'RETARD')
+        [(_, curseur, data)] = self.evenements(feed.poll())
+        self.assertEqual([update['statut'] for update in data['updates']], ['RETARD'])
+
+        # Reconnexion avec le dernier curseur reçu (Last-Event-ID) : rien n'est renvoyé
+        reconnexion = PresenceFeed(self.session.id, curseur)
+        self.assertEqual(self.evenements(reconnexion.start()), [])
+
+        self.modifier(self.session, 'TERMINE')
+        self.assertEqual(self.evenements(reconnexion.poll()), [('session_closed', None, {'statut': 'TERMINE'})])
+        self.assertTrue(reconnexion.closed)
+
+    def test_lectures_espacees_tant_que_rien_ne_change(self):
+        feed = PresenceFeed(self.session.id)
+        feed.start()
+        for _ in range(10):
+            feed.poll()
+        self.assertEqual(feed.interval, POLL_MAX_INTERVAL)
+
+        self.modifier(self.presences[0], 'PRESENT')
+        self.assertEqual(len(self.evenements(feed.poll())), 1)
+        self.assertEqual(feed.interval, POLL_INTERVAL)
+
+    def test_reponse_courte_sous_wsgi(self):
+        curseur = timezone.now().isoformat()
+        self.modifier(self.presences[0], 'PRESENT')
+        chunks = list(stream(PresenceFeed(self.session.id, curseur)))
+
+        self.assertTrue(chunks[0].startswith('retry: '))
+        [(event, _, data)] = self.evenements(chunks)
+        self.assertEqual([update['presence_id'] for update in data['updates']], [self.presences[0].id])
+
+    def test_presence_creee_par_la_reconnaissance_faciale(self):
+        eleve = Eleve.objects.create(
+            user=User.objects.create_user('retardataire', role='ELEVE'), classe=self.presences[0].eleve.classe,
+        )
+        feed = PresenceFeed(self.session.id, timezone.now().isoformat())
+        feed.start()
+        version = presence_version(self.session.id)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            RecognitionEngine(embedder=PixelEmbedder()).record_presences(self.session, {eleve.id: 0.9})
+
+        self.assertNotEqual(presence_version(self.session.id), version)
+        [(_, _, data)] = self.evenements(feed.poll())
+        self.assertEqual([update['eleve_id'] for update in data['updates']], [eleve.id])
+
+    def test_curseur_invalide(self):
+        self.modifier(self.presences[2], 'PRESENT')
+        feed = PresenceFeed(self.session.id, 'pas-une-date')
+        self.assertEqual(self.evenements(feed.start()), [])
+
+
+def image_jpeg(largeur=320, hauteur=240, graine=0):
+    image = np.random.default_rng(graine).integers(0, 255, (hauteur, largeur, 3), dtype=np.uint8)
+    return cv2.imencode('.jpg', image)[1].tobytes()
+
+
+@functools.lru_cache(maxsize=None)
+def photo_eleve(flou=False):
+    """Photo d'élève du dépôt (un seul visage), réduite, floue à la demande"""
+    image = cv2.imread(str(settings.BASE_DIR / 'media' / 'photos_eleves' / 'pexels.jpg'), cv2.IMREAD_REDUCED_COLOR_8)
+    if flou:
+        image = cv2.GaussianBlur(image, (31, 31), 0)
+    return cv2.imencode('.jpg', image)[1].tobytes()
+
+
+def decoder(contenu):
+    return cv2.imdecode(np.frombuffer(contenu, dtype=np.uint8), cv2.IMREAD_COLOR)
+
+
+def attendre(condition, delai=10):
+    fin = time.monotonic() + delai
+    while not condition():
+        if time.monotonic() > fin:
+            raise AssertionError('Condition non atteinte')
+        time.sleep(0.01)
+
+
+class PoolAnalyseTests(SimpleTestCase):
+    """Pool de processus d'analyse des images"""
+
+    PARAMS = {'motion_threshold': 0.0, 'detection_width': 320, 'max_faces': 5}
+
+    @override_settings(FACIAL_RECOGNITION={'WORKERS': 1})
+    def test_images_concurrentes_et_segments_reutilises(self):
+        pool = create_pool(FaceDetector(), PixelEmbedder(), self.PARAMS)
+        self.addCleanup(pool.close)
+        segments = len(pool._free)
+
+        for i in range(4):
+            analysis = pool.analyse(f'session{i % 2}', image_jpeg(graine=i), None)
+            self.assertEqual(analysis.status, FrameAnalysis.ANALYSED)
+
+        resultats = []
+        threads = [
+            threading.Thread(target=lambda i=i: resultats.append(pool.analyse(f'session{i}', image_jpeg(graine=i), None)))
+            for i in range(3)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(10)
+
+        self.assertEqual(len(resultats), 3)
+        self.assertTrue(all(r.status in (FrameAnalysis.ANALYSED, FrameAnalysis.STALE) for r in resultats))
+        attendre(lambda: len(pool._free) == segments)
+
+    def test_image_en_attente_remplacee_par_la_suivante(self):
+        pool = RecognitionPool(FaceDetector(), PixelEmbedder(), 1, self.PARAMS)
+        self.addCleanup(pool.close)
+        # Exécuteur à un thread dont on bloque le seul travailleur : l'image reste en file
+        pool._executor.shutdown()
+        pool._executor = ThreadPoolExecutor(max_workers=1)
+        bloque = threading.Event()
+        self.addCleanup(bloque.set)
+        pool._executor.submit(bloque.wait)
+
+        resultats = {}
+
+        def analyser(nom):
+            resultats[nom] = pool.analyse('session', image_jpeg(), None)
+
+        premiere = threading.Thread(target=analyser, args=['premiere'], daemon=True)
+        premiere.start()
+        attendre(lambda: 'session' in pool._pending)
+        en_file = pool._pending['session']
+
+        seconde = threading.Thread(target=analyser, args=['seconde'], daemon=True)
+        seconde.start()
+        attendre(lambda: pool._pending.get('session') not in (None, en_file))
+        bloque.set()
+        premiere.join(10)
+        seconde.join(10)
+
+        self.assertFalse(seconde.is_alive(), "analyse() bloquée par l'annulation de l'image précédente")
+        self.assertEqual(resultats['premiere'].status, FrameAnalysis.STALE)
+        self.assertEqual(resultats['seconde'].status, FrameAnalysis.ANALYSED)
+        attendre(lambda: len(pool._free) == 2)
+
+    @override_settings(FACIAL_RECOGNITION={'WORKERS': 0})
+    def test_analyse_dans_le_processus_sans_pool(self):
+        engine = RecognitionEngine(embedder=PixelEmbedder())
+
+        self.assertIsNone(engine.pool)
+        self.assertEqual(engine.analyse('session', image_jpeg()).status, FrameAnalysis.ANALYSED)
+
+
+class EmpreintesReferenceTests(MoteurPixels, MediaTemporaire, SeanceAvecParents, TestCase):
+    """Empreintes des photos de référence stockées en base, recalculées quand la photo change"""
+
+    def setUp(self):
+        super().setUp()
+        self.eleve = self.presences[0].eleve
+
+    def changer_photo(self, contenu, nom='eleve0.jpg'):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.eleve.photo_reference = SimpleUploadedFile(nom, contenu, content_type='image/jpeg')
+            self.eleve.save()
+        return EmpreinteFaciale.objects.get(eleve=self.eleve, photo_reference=None)
+
+    def test_classe_chargee_depuis_les_empreintes_stockees(self):
+        empreinte = self.changer_photo(photo_eleve())
+        self.assertEqual(empreinte.source, self.eleve.photo_reference.name)
+        self.assertEqual(len(empreinte.vecteur), self.engine.embedder.dimension * 4)
+
+        with self.assertNumQueries(1):
+            references = load_class_references(self.eleve.classe_id, 'pixels', self.engine.embedder.dimension)
+
+        self.assertEqual(list(references.eleve_ids), [self.eleve.id])
+        np.testing.assert_array_equal(references.matrix[0], np.frombuffer(empreinte.vecteur, dtype=np.float32))
+        self.assertEqual(references.names, {self.eleve.id: 'Eleve Numero0'})
+
+    def test_recalcul_seulement_si_la_photo_change(self):
+        premiere = self.changer_photo(photo_eleve())
+        with mock.patch('school.recognition.store._compute') as calcul:
+            self.assertIsNone(sync_eleve_photo(self.eleve, self.engine))
+        calcul.assert_not_called()
+
+        seconde = self.changer_photo(photo_eleve(flou=True), 'eleve0_flou.jpg')
+        self.assertNotEqual(seconde.source, premiere.source)
+        self.assertNotEqual(seconde.vecteur, premiere.vecteur)
+        self.assertEqual(EmpreinteFaciale.objects.filter(eleve=self.eleve).count(), 1)
+
+
+class QualitePhotosTests(MoteurPixels, MediaTemporaire, SeanceAvecParents, TestCase):
+    """Qualité des photos de référence : score, désactivation des photos inutilisables"""
+
+    def test_criteres_de_qualite(self):
+        detector = FaceDetector()
+        nette = assess_photo(decoder(photo_eleve()), detector)
+        floue = assess_photo(decoder(photo_eleve(flou=True)), detector)
+        sans_visage = assess_photo(decoder(image_jpeg()), detector)
+
+        self.assertTrue(nette.usable)
+        self.assertEqual(nette.face_count, 1)
+        self.assertFalse(floue.usable)
+        self.assertLess(floue.details['sharpness'], nette.details['sharpness'])
+        self.assertEqual(floue.reason, 'critère insuffisant : sharpness')
+        self.assertEqual((sans_visage.score, sans_visage.box, sans_visage.usable), (0.0, None, False))
+
+    def test_poids_des_similarites(self):
+        np.testing.assert_allclose(quality_weights([0.0, 0.5, 1.0]), [0.8, 0.9, 1.0], rtol=1e-6)
+
+    def test_photo_inutilisable_desactivee(self):
+        eleve = self.presences[0].eleve
+        with self.captureOnCommitCallbacks(execute=True):
+            nette = PhotoReference.objects.create(eleve=eleve, photo=SimpleUploadedFile('nette.jpg', photo_eleve()))
+            floue = PhotoReference.objects.create(
+                eleve=eleve, photo=SimpleUploadedFile('floue.jpg', photo_eleve(flou=True)),
+            )
+
+        nette.refresh_from_db()
+        floue.refresh_from_db()
+        self.assertTrue(nette.active)
+        self.assertGreaterEqual(nette.qualite, 0.35)
+        self.assertFalse(floue.active)
+        self.assertLess(floue.qualite, 0.35)
+        empreintes = EmpreinteFaciale.objects.filter(eleve=eleve)
+        self.assertEqual(list(empreintes.values_list('photo_reference', 'qualite')), [(nette.pk, nette.qualite)])
+
+
+@override_settings(FACIAL_RECOGNITION={'EMBEDDING_BACKEND': 'pixels'})
+class ImportPhotosTests(MediaTemporaire, SeanceAvecParents, TestCase):
+    """Import en masse des photos de référence nommées par matricule"""
+
+    def setUp(self):
+        super().setUp()
+        self.source = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.source, ignore_errors=True)
+        self.eleves = [presence.eleve for presence in self.presences]
+
+    def ajouter_photo(self, nom, contenu):
+        with open(os.path.join(self.source, nom), 'wb') as f:
+            f.write(contenu)
+
+    def importer(self, *args):
+        sortie = io.StringIO()
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('import_photos', self.source, '--workers', '0', *args, stdout=sortie)
+        return sortie.getvalue()
+
+    def test_import_d_un_dossier(self):
+        self.ajouter_photo(f'{self.eleves[0].matricule.lower()}.jpg', photo_eleve())
+        self.ajouter_photo(f'{self.eleves[1].matricule}.jpg', photo_eleve(flou=True))
+        self.ajouter_photo('INCONNU.jpg', photo_eleve())
+        self.ajouter_photo('notes.txt', b'')
+        version = embeddings_version(self.eleves[0].classe_id)
+
+        sortie = self.importer()
+
+        self.assertIn('2 photos à importer, 0 élèves ayant déjà une photo, 1 fichiers sans élève', sortie)
+        self.assertIn('2 photos importées, 0 en erreur', sortie)
+        self.assertIn(f'{self.eleves[1].matricule}.jpg: qualité', sortie)
+        self.assertGreater(embeddings_version(self.eleves[0].classe_id), version)
+
+        eleve = Eleve.objects.get(pk=self.eleves[0].pk)
+        self.assertEqual(eleve.photo_reference.name, f'photos_eleves/{eleve.matricule}.jpg')
+        with Image.open(eleve.photo_reference.path) as photo:
+            self.assertEqual(photo.size, (400, 400))
+        self.assertTrue(default_storage.exists(variant_name(eleve.photo_reference.name, 'face')))
+        self.assertFalse(Eleve.objects.get(pk=self.eleves[2].pk).photo_reference)
+
+        empreintes = EmpreinteFaciale.objects.filter(photo_reference=None, modele='pixels').order_by('eleve_id')
+        self.assertEqual([empreinte.eleve_id for empreinte in empreintes], [self.eleves[0].id, self.eleves[1].id])
+        self.assertTrue(all(len(empreinte.vecteur) == PixelEmbedder().dimension * 4 for empreinte in empreintes))
+
+    def test_photos_existantes_conservees_sauf_remplacement(self):
+        self.ajouter_photo(f'{self.eleves[0].matricule}.jpg', photo_eleve())
+        self.importer()
+        empreinte = EmpreinteFaciale.objects.get(eleve=self.eleves[0])
+
+        self.assertIn('0 photos à importer, 1 élèves ayant déjà une photo', self.importer())
+
+        self.ajouter_photo(f'{self.eleves[0].matricule}.jpg', photo_eleve(flou=True))
+        self.assertIn('1 photos importées', self.importer('--replace'))
+        remplacee = EmpreinteFaciale.objects.get(eleve=self.eleves[0])
+        self.assertEqual(remplacee.pk, empreinte.pk)
+        self.assertNotEqual(remplacee.vecteur, empreinte.vecteur)
+
+
+class VariantesPhotosTests(MoteurPixels, MediaTemporaire, SeanceAvecParents, TestCase):
+    """Miniatures et visages recadrés des photos de référence, générés une seule fois"""
+
+    def test_variantes_generees_une_seule_fois(self):
+        nom = default_storage.save('photos_eleves/eleve.jpg', ContentFile(photo_eleve()))
+
+        crees = generate_variants(nom)
+
+        self.assertEqual(sorted(crees), sorted(variant_name(nom, variante) for variante in VARIANTS))
+        for variante, cote in VARIANTS.items():
+            with default_storage.open(variant_name(nom, variante)) as f, Image.open(f) as image:
+                self.assertEqual(image.size, (cote, cote))
+        with mock.patch('school.photos._face_box') as detection:
+            self.assertEqual(generate_variants(nom), [])
+        detection.assert_not_called()
+
+    def test_visage_recadre_sur_le_visage_detecte(self):
+        nom = default_storage.save('photos_eleves/eleve.jpg', ContentFile(photo_eleve()))
+        generate_variants(nom)
+        with default_storage.open(variant_name(nom, 'face')) as f, Image.open(f) as image:
+            visage = cv2.cvtColor(np.asarray(image.convert('RGB')), cv2.COLOR_RGB2BGR)
+
+        # Visage au centre (un recadrage centré sur la photo le laisserait dans le tiers supérieur)
+        [(haut, droite, bas, gauche)] = self.engine.detector.detect(visage, max_faces=5)
+        cote = VARIANTS['face']
+        self.assertAlmostEqual((haut + bas) / 2 / cote, 0.5, delta=0.1)
+        self.assertAlmostEqual((gauche + droite) / 2 / cote, 0.5, delta=0.1)
+
+    def test_urls_des_variantes_de_la_photo_d_un_eleve(self):
+        eleve = self.presences[0].eleve
+        with self.captureOnCommitCallbacks(execute=False):
+            eleve.photo_reference = SimpleUploadedFile('eleve0.jpg', photo_eleve(), content_type='image/jpeg')
+            eleve.save()
+        self.assertEqual(eleve.photo_miniature, eleve.photo_reference.url)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            eleve.save()
+
+        self.assertEqual(eleve.photo_miniature, default_storage.url(variant_name(eleve.photo_reference.name, 'thumb')))
+        self.assertEqual(eleve.photo_visage, default_storage.url(variant_name(eleve.photo_reference.name, 'face')))
+
+
+class CartesQRTests(SeanceAvecParents, TestCase):
+    """Cartes QR imprimables : une carte par élève, un PDF par classe, rien de refait sans changement"""
+
+    def setUp(self):
+        super().setUp()
+        self.sortie = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.sortie, ignore_errors=True)
+        self.pdf = os.path.join(self.sortie, '6A', 'cartes_6A.pdf')
+
+    def generer(self, *args):
+        sortie = io.StringIO()
+        call_command('generate_qr_cards', '--output', self.sortie, '--workers', '0', *args, stdout=sortie)
+        return sortie.getvalue()
+
+    def test_cartes_inchangees_non_refaites(self):
+        self.assertIn('3 cartes à générer, 0 inchangées', self.generer())
+        with open(self.pdf, 'rb') as f:
+            self.assertTrue(f.read().startswith(b'%PDF'))
+        for presence in self.presences:
+            with Image.open(os.path.join(self.sortie, '6A', f'{presence.eleve.matricule}.png')) as carte:
+                self.assertEqual(carte.size, (500, 600))
+        modification = os.stat(self.pdf).st_mtime_ns
+
+        sortie = self.generer()
+        self.assertIn('0 cartes à générer, 3 inchangées', sortie)
+        self.assertNotIn('cartes_6A.pdf', sortie)
+        self.assertEqual(os.stat(self.pdf).st_mtime_ns, modification)
+
+        user = self.presences[0].eleve.user
+        user.last_name = 'Renommé'
+        user.save()
+        sortie = self.generer()
+        self.assertIn('1 cartes à générer, 2 inchangées', sortie)
+        self.assertIn('cartes_6A.pdf (3 cartes)', sortie)
+
+    def test_un_fichier_imprimable_par_classe(self):
+        classe = Classe.objects.create(nom='5B')
+        Eleve.objects.create(user=User.objects.create_user('eleve5b', role='ELEVE'), classe=classe)
+
+        self.generer('--format', 'both')
+
+        self.assertTrue(os.path.exists(self.pdf))
+        self.assertTrue(os.path.exists(os.path.join(self.sortie, '5B', 'cartes_5B.pdf')))
+        with zipfile.ZipFile(os.path.join(self.sortie, '6A', 'cartes_6A.zip')) as archive:
+            self.assertEqual(
+                sorted(archive.namelist()), sorted(f'{presence.eleve.matricule}.png' for presence in self.presences),
+            )
@@ -16,9 +16,12 @@ urlpatterns = [
     
     # Reconnaissance faciale
     path('qr-code-scan/<int:cours_id>/', views.qr_code_scan, name='qr_code_scan'),
-    path('mobile-qr-scanner/<int:session_id>/', views.mobile_qr_scanner, name='mobile_qr_scanner'),
+    path('mobile-qr-scanner/<uuid:session_id>/', views.mobile_qr_scanner, name='mobile_qr_scanner'),
     path('api/qr-code-scan/', views.api_qr_code_scan, name='api_qr_code_scan'),
     path('api/mobile-qr-scan/', views.api_mobile_qr_scan, name='api_mobile_qr_scan'),
+    path('api/facial-recognition/', views.api_facial_recognition, name='api_facial_recognition'),
+    path('api/facial-recognition/stats/', views.api_facial_recognition_stats, name='api_facial_recognition_stats'),
+    path('qr-codes/<str:key>.png', views.qr_code_image, name='qr_code_image'),
     
     # API pour la gestion des présences
     path('api/update-presence/', views.api_update_presence, name='api_update_presence'),
@@ -58,6 +61,7 @@ urlpatterns = [
     path('api/mobile-checkin/', views.api_mobile_checkin, name='api_mobile_checkin'),
     path('api/check-presence-status/', views.api_check_presence_status, name='api_check_presence_status'),
     path('api/check-session-updates/', views.api_check_session_updates, name='api_check_session_updates'),
+    path('api/session-presences-stream/<uuid:session_id>/', views.api_session_presences_stream, name='api_session_presences_stream'),
     path('api/notify-teacher-redirect/', views.api_notify_teacher_redirect, name='api_notify_teacher_redirect'),
     path('api/authenticate-teacher/', views.api_authenticate_teacher, name='api_authenticate_teacher'),
     path('api/log-unauthorized-access/', views.api_log_unauthorized_access, name='api_log_unauthorized_access'),
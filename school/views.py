@@ -2,21 +2,34 @@ from django.contrib.auth.decorators import login_required
 from django.contrib.auth import authenticate, login, logout
 from django.shortcuts import render, redirect, get_object_or_404
 from django.urls import reverse
-from django.http import HttpResponse, JsonResponse
+from django.core.exceptions import RequestDataTooBig
+from django.core.handlers.asgi import ASGIRequest
+from django.http import Http404, HttpResponse, JsonResponse, StreamingHttpResponse
 from django.contrib import messages
 from django.utils import timezone
 from django.db.models import Q, Count
 from django.core.paginator import Paginator
-from django.views.decorators.http import require_http_methods
+from django.views.decorators.http import etag, require_http_methods
+from django.views.decorators.cache import cache_control
 from django.views.decorators.csrf import csrf_exempt
 import json
+import logging
+import uuid
 from datetime import datetime, timedelta
 import numpy as np
 import os
 from PIL import Image
 import base64
 from .forms import LoginForm
-from .models import User, Classe, Matiere, Eleve, Enseignant, Parent, Cours, SessionAppel, Presence, Notification, PhotoReference, HistoriquePresence
+from .historique import finalize_session
+from .live import PresenceFeed, astream, serialize_presence, stream
+from .notifications import PRESENCE_RELATED as NOTIFICATION_RELATED, NotificationBatch
+from .outbox import enqueue_parent_digest
+from .qrcodes import InvalidQRCode
+from .roster import SessionTerminee, get_roster, open_roster, record_presence, roster_entry
+from .models import User, Classe, Matiere, Eleve, Enseignant, Parent, Cours, SessionAppel, Presence, PhotoReference
+
+logger = logging.getLogger(__name__)
 
 @login_required
 def teacher_classes(request):
@@ -279,8 +292,6 @@ def teacher_attendance_today(request):
         return render(request, 'teacher_attendance_today.html', context)
     except Exception as e:
         # En cas d'erreur, utiliser des données par défaut
-        import logging
-        logger = logging.getLogger(__name__)
         logger.error(f'Erreur lors du chargement du tableau de bord: {str(e)}')
         context = {
             'user': request.user,
@@ -607,8 +618,6 @@ def admin_create_user(request):
                     pass
             
             # Log de l'erreur pour le débogage
-            import logging
-            logger = logging.getLogger(__name__)
             logger.error(f'Erreur lors de la création d\'utilisateur: {str(e)}')
             
             return JsonResponse({
@@ -682,15 +691,18 @@ def admin_get_users(request):
                     eleve = Eleve.objects.get(user=user)
                     user_data['classe'] = eleve.classe.nom if eleve.classe else 'Non assigné'
                     user_data['matricule'] = eleve.matricule
-                    # Ajouter la photo de référence
+                    # Ajouter la photo de référence (et sa miniature pour la liste)
                     if eleve.photo_reference:
                         user_data['photo_reference'] = eleve.photo_reference.url
+                        user_data['photo_miniature'] = eleve.photo_miniature
                     else:
                         user_data['photo_reference'] = None
+                        user_data['photo_miniature'] = None
                 except Eleve.DoesNotExist:
                     user_data['classe'] = 'Non assigné'
                     user_data['matricule'] = 'N/A'
                     user_data['photo_reference'] = None
+                    user_data['photo_miniature'] = None
             
             elif user.role == 'ENSEIGNANT':
                 try:
@@ -739,8 +751,6 @@ def admin_get_users(request):
         })
         
     except Exception as e:
-        import logging
-        logger = logging.getLogger(__name__)
         logger.error(f'Erreur lors de la récupération des utilisateurs: {str(e)}')
         
         return JsonResponse({
@@ -1093,9 +1103,6 @@ def qr_code_scan(request, cours_id):
             messages.error(request, 'Ce cours n\'est pas prévu aujourd\'hui.')
             return redirect('enseignant_dashboard')
         
-        # Récupérer les élèves de la classe
-        eleves = Eleve.objects.filter(classe=cours.classe).order_by('user__last_name', 'user__first_name')
-        
         # Vérifier s'il y a déjà une session d'appel
         session_appel, created = SessionAppel.objects.get_or_create(
             cours=cours,
@@ -1104,16 +1111,9 @@ def qr_code_scan(request, cours_id):
             defaults={'methode': 'QR_CODE'}
         )
         
-        # Créer les enregistrements de présence s'ils n'existent pas
-        for eleve in eleves:
-            Presence.objects.get_or_create(
-                session_appel=session_appel,
-                eleve=eleve,
-                defaults={
-                    'statut': 'ABSENT',
-                    'methode_detection': 'QR_CODE'
-                }
-            )
+        # Créer les présences manquantes et mettre la liste d'appel en cache
+        _, presences = open_roster(session_appel, 'QR_CODE')
+        eleves = [presence.eleve for presence in presences]
         
         context = {
             'cours': cours,
@@ -1145,9 +1145,6 @@ def scan_qr_eleves(request, cours_id):
             messages.error(request, 'Ce cours n\'est pas prévu aujourd\'hui.')
             return redirect('enseignant_dashboard')
         
-        # Récupérer les élèves de la classe
-        eleves = Eleve.objects.filter(classe=cours.classe).order_by('user__last_name', 'user__first_name')
-        
         # Créer ou récupérer la session d'appel
         session_appel, created = SessionAppel.objects.get_or_create(
             cours=cours,
@@ -1156,33 +1153,23 @@ def scan_qr_eleves(request, cours_id):
             defaults={'methode': 'QR_CODE_SMARTPHONE'}
         )
         
-        # Créer les enregistrements de présence s'ils n'existent pas
-        for eleve in eleves:
-            Presence.objects.get_or_create(
-                session_appel=session_appel,
-                eleve=eleve,
-                defaults={
-                    'statut': 'ABSENT',
-                    'methode_detection': 'QR_CODE_SMARTPHONE'
-                }
-            )
-        
-        # Récupérer les présences actuelles
-        presences = Presence.objects.filter(session_appel=session_appel)
+        # Créer les présences manquantes et mettre la liste d'appel en cache ;
+        # les présences sont chargées avec leur élève en une seule requête
+        _, presences = open_roster(session_appel, 'QR_CODE_SMARTPHONE')
+        presences_since = timezone.now()
         
         # Préparer les données des élèves avec leurs présences
-        eleves_with_presence = []
-        for eleve in eleves:
-            presence = presences.filter(eleve=eleve).first()
-            eleves_with_presence.append({
-                'eleve': eleve,
-                'presence': presence
-            })
+        eleves_with_presence = [
+            {'eleve': presence.eleve, 'presence': presence}
+            for presence in presences
+        ]
         
         context = {
             'cours': cours,
             'eleves_with_presence': eleves_with_presence,
             'session_appel': session_appel,
+            # Curseur du flux en direct des présences
+            'presences_since': presences_since.isoformat(),
         }
         
         return render(request, 'scan_qr_eleves.html', context)
@@ -1209,10 +1196,12 @@ def api_update_presence(request):
         nouveau_statut = data.get('statut')
         commentaire = data.get('commentaire', '')
         
-        presence = get_object_or_404(Presence, id=presence_id)
+        presence = get_object_or_404(
+            Presence.objects.select_related('session_appel__enseignant', *NOTIFICATION_RELATED), id=presence_id
+        )
         
         # Vérifier que l'enseignant est bien celui du cours
-        if presence.session_appel.enseignant.user != request.user:
+        if presence.session_appel.enseignant.user_id != request.user.id:
             return JsonResponse({'error': 'Accès non autorisé'}, status=403)
         
         # Mettre à jour le statut
@@ -1226,14 +1215,8 @@ def api_update_presence(request):
         presence.save()
         
         # Créer une notification pour le parent si absent ou en retard
-        if nouveau_statut in ['ABSENT', 'RETARD'] and presence.eleve.parent:
-            Notification.objects.create(
-                destinataire=presence.eleve.parent.user,
-                type_notification='ABSENCE' if nouveau_statut == 'ABSENT' else 'RETARD',
-                titre=f"{nouveau_statut.title()} - {presence.eleve.user.get_full_name()}",
-                message=f"Votre enfant {presence.eleve.user.get_full_name()} est {nouveau_statut.lower()} au cours de {presence.session_appel.cours.matiere.nom} le {presence.session_appel.cours.date.strftime('%d/%m/%Y')}.",
-                lien=f"/parent/dashboard"
-            )
+        with NotificationBatch() as notifications:
+            notifications.add_presence(presence, statuts=['ABSENT', 'RETARD'])
         
         return JsonResponse({
             'success': True,
@@ -1270,7 +1253,7 @@ def api_update_presence_from_scan(request):
             return JsonResponse({'error': 'Paramètres manquants'}, status=400)
         
         # Récupérer ou créer la présence
-        presence, created = Presence.objects.get_or_create(
+        presence, created = Presence.objects.select_related(*NOTIFICATION_RELATED).get_or_create(
             eleve_id=eleve_id,
             session_appel_id=session_id,
             defaults={
@@ -1289,28 +1272,14 @@ def api_update_presence_from_scan(request):
                 presence.heure_arrivee = None
             presence.save()
         
-        # Envoyer un email au parent selon le statut
-        from .email_service import ParentNotificationService
-        
-        if nouveau_statut == 'PRESENT':
-            # Envoyer un email de confirmation de présence
-            ParentNotificationService.send_presence_confirmation_email(presence.id)
-        elif nouveau_statut == 'RETARD':
-            # Envoyer un email de notification de retard
-            ParentNotificationService.send_retard_notification_email(presence.id)
-        elif nouveau_statut == 'ABSENT':
-            # Envoyer un email de notification d'absence
-            ParentNotificationService.send_absence_notification_email(presence.id)
+        # Récapitulatif au parent (envoyé par la commande dispatch_emails)
+        parent = presence.eleve.parent
+        if parent:
+            enqueue_parent_digest(parent.id, session_id, parent.recap_quotidien)
         
         # Créer une notification pour le parent si absent ou en retard
-        if nouveau_statut in ['ABSENT', 'RETARD'] and presence.eleve.parent:
-            Notification.objects.create(
-                destinataire=presence.eleve.parent.user,
-                type_notification='ABSENCE' if nouveau_statut == 'ABSENT' else 'RETARD',
-                titre=f"{nouveau_statut.title()} - {presence.eleve.user.get_full_name()}",
-                message=f"Votre enfant {presence.eleve.user.get_full_name()} est {nouveau_statut.lower()} au cours de {presence.session_appel.cours.matiere.nom} le {presence.session_appel.cours.date.strftime('%d/%m/%Y')}.",
-                lien=f"/parent/dashboard"
-            )
+        with NotificationBatch() as notifications:
+            notifications.add_presence(presence, statuts=['ABSENT', 'RETARD'])
         
         return JsonResponse({
             'success': True,
@@ -1341,29 +1310,14 @@ def api_validate_session(request):
         data = json.loads(request.body)
         session_id = data.get('session_id')
         
-        session_appel = get_object_or_404(SessionAppel, id=session_id)
+        session_appel = get_object_or_404(SessionAppel.objects.select_related('cours', 'enseignant'), id=session_id)
         
         # Vérifier que l'enseignant est bien celui de la session
-        if session_appel.enseignant.user != request.user:
+        if session_appel.enseignant.user_id != request.user.id:
             return JsonResponse({'error': 'Accès non autorisé'}, status=403)
         
-        # Finaliser la session
-        session_appel.statut = 'TERMINE'
-        session_appel.date_fin = timezone.now()
-        session_appel.save()
-        
-        # Créer l'historique des présences
-        presences = Presence.objects.filter(session_appel=session_appel)
-        for presence in presences:
-            HistoriquePresence.objects.create(
-                eleve=presence.eleve,
-                cours=presence.session_appel.cours,
-                statut=presence.statut,
-                date=presence.session_appel.cours.date,
-                heure_arrivee=presence.heure_arrivee,
-                methode_detection=presence.methode_detection,
-                commentaire=presence.commentaire
-            )
+        # Finaliser la session et créer (ou mettre à jour) l'historique des présences
+        finalize_session(session_appel)
         
         return JsonResponse({
             'success': True,
@@ -1394,81 +1348,62 @@ def api_qr_code_scan(request):
         session_id = data.get('session_id')
         qr_code_data = data.get('qr_code_data')
         
-        # Récupérer la session d'appel et les élèves concernés
-        session_appel = get_object_or_404(SessionAppel, id=session_id)
+        # Liste d'appel de la session (cache partagé, construite au démarrage)
+        roster = get_roster(session_id)
+        if roster is None:
+            return JsonResponse({'error': 'Session d\'appel non trouvée ou terminée'}, status=404)
         
         # Vérifier que l'enseignant est bien celui du cours
-        if session_appel.enseignant.user != request.user:
+        if roster['enseignant_user_id'] != request.user.id:
             return JsonResponse({'error': 'Accès non autorisé'}, status=403)
         
-        # Rechercher l'élève par son matricule (contenu du QR code)
+        # Rechercher l'élève du QR code (signé, ou matricule des anciennes cartes)
         try:
-            eleve = Eleve.objects.get(matricule=qr_code_data)
-            
-            # Vérifier que l'élève appartient à la classe du cours
-            if eleve.classe != session_appel.cours.classe:
-                return JsonResponse({
-                    'error': 'Cet élève n\'appartient pas à cette classe',
-                    'status': 'error'
-                }, status=400)
-            
-            # Récupérer ou créer l'enregistrement de présence
-            presence, created = Presence.objects.get_or_create(
-                            session_appel=session_appel,
-                eleve=eleve,
-                defaults={
-                    'statut': 'PRESENT',
-                    'methode_detection': 'QR_CODE',
-                    'heure_arrivee': timezone.now().time(),
-                    'niveau_confiance': 1.0  # QR code = 100% de confiance
-                }
-            )
-            
-            # Si la présence existe déjà, mettre à jour le statut
-            if not created:
-                if presence.statut == 'ABSENT':
-                    presence.statut = 'PRESENT'
-                    presence.heure_arrivee = timezone.now().time()
-                    presence.methode_detection = 'QR_CODE'
-                    presence.niveau_confiance = 1.0
-                    presence.save()
-                else:
-                    return JsonResponse({
-                        'message': f'{eleve.user.get_full_name()} est déjà marqué comme présent',
-                        'status': 'already_present',
-                        'eleve_name': eleve.user.get_full_name()
-                    })
-            
-            # Créer une notification pour le parent
-            if eleve.parent:
-                Notification.objects.create(
-                    destinataire=eleve.parent.user,
-                    type_notification='PRESENCE',
-                    titre=f"Présence confirmée - {eleve.user.get_full_name()}",
-                    message=f"Votre enfant {eleve.user.get_full_name()} a été marqué présent au cours de {session_appel.cours.matiere.nom} le {session_appel.cours.date.strftime('%d/%m/%Y')}",
-                    lien=f"/parent/dashboard"
-                )
-            
+            entry = roster_entry(roster, qr_code_data)
+        except InvalidQRCode as e:
             return JsonResponse({
-                'success': True,
-                'message': f'Présence confirmée pour {eleve.user.get_full_name()}',
-                'eleve': {
-                    'id': eleve.id,
-                    'name': f"{eleve.user.first_name} {eleve.user.last_name}",
-                    'matricule': eleve.matricule,
-                    'status': 'present',
-                    'confidence': 1.0
-                }
-            })
-            
-        except Eleve.DoesNotExist:
+                'error': str(e),
+                'status': 'error'
+            }, status=400)
+        
+        if entry is None:
             return JsonResponse({
-                'error': 'QR code non reconnu - Élève non trouvé',
+                'error': 'QR code non reconnu - Élève non trouvé dans cette classe',
                 'status': 'error'
             }, status=404)
+        
+        # Marquer l'élève présent s'il est encore absent
+        updated, _ = record_presence(
+            roster, entry, methode='QR_CODE', niveau_confiance=1.0,  # QR code = 100% de confiance
+            only_if_absent=True
+        )
+        if not updated:
+            return JsonResponse({
+                'message': f"{entry['nom']} est déjà marqué comme présent",
+                'status': 'already_present',
+                'eleve_name': entry['nom']
+            })
+        
+        # Créer une notification pour le parent
+        with NotificationBatch() as notifications:
+            notifications.add_roster_entry(roster, entry, 'PRESENT')
+        
+        return JsonResponse({
+            'success': True,
+            'message': f"Présence confirmée pour {entry['nom']}",
+            'eleve': {
+                'id': entry['eleve_id'],
+                'name': f"{entry['first_name']} {entry['last_name']}",
+                'matricule': entry['matricule'],
+                'status': 'present',
+                'confidence': 1.0
+            }
+        })
             
     except json.JSONDecodeError:
         return JsonResponse({'error': 'Données JSON invalides'}, status=400)
+    except SessionTerminee as e:
+        return JsonResponse({'error': str(e)}, status=404)
     except Exception as e:
         return JsonResponse({'error': str(e)}, status=500)
 
@@ -1489,51 +1424,43 @@ def api_mobile_qr_scan(request):
         if not matricule or not session_id:
             return JsonResponse({'error': 'Matricule et session_id requis'}, status=400)
         
-        # Récupérer la session d'appel
-        session_appel = get_object_or_404(SessionAppel, id=session_id, enseignant__user=request.user)
-        
-        # Récupérer l'élève par matricule
-        eleve = get_object_or_404(Eleve, matricule=matricule, classe=session_appel.cours.classe)
+        # Liste d'appel de la session (cache partagé, construite au démarrage)
+        roster = get_roster(session_id)
+        if roster is None or roster['enseignant_user_id'] != request.user.id:
+            return JsonResponse({'error': 'Session d\'appel non trouvée'}, status=404)
         
-        # Récupérer ou créer la présence
-        presence, created = Presence.objects.get_or_create(
-            session_appel=session_appel,
-            eleve=eleve,
-            defaults={
-                'statut': 'PRESENT',
-                'methode_detection': 'QR_CODE',
-                'heure_arrivee': timezone.now().time()
-            }
-        )
+        # Récupérer l'élève du QR code (signé, ou matricule des anciennes cartes)
+        try:
+            entry = roster_entry(roster, matricule)
+        except InvalidQRCode as e:
+            return JsonResponse({'error': str(e)}, status=400)
+        if entry is None:
+            return JsonResponse({'error': 'Élève non trouvé'}, status=404)
         
-        # Si la présence existe déjà, mettre à jour le statut
-        if not created:
-            presence.statut = 'PRESENT'
-            presence.heure_arrivee = timezone.now().time()
-            presence.methode_detection = 'QR_CODE'
-            presence.save()
+        # Marquer l'élève présent
+        _, heure_arrivee = record_presence(roster, entry, methode='QR_CODE')
         
         # Créer une notification de succès
         return JsonResponse({
             'success': True,
-            'message': f'Présence confirmée pour {eleve.user.get_full_name()}',
+            'message': f"Présence confirmée pour {entry['nom']}",
             'eleve': {
-                'id': eleve.id,
-                'nom': eleve.user.get_full_name(),
-                'matricule': eleve.matricule,
-                'photo': eleve.photo_reference.url if eleve.photo_reference else None
+                'id': entry['eleve_id'],
+                'nom': entry['nom'],
+                'matricule': entry['matricule'],
+                'photo': entry['photo']
             },
             'presence': {
-                'id': presence.id,
-                'statut': presence.statut,
-                'heure_arrivee': presence.heure_arrivee.isoformat() if presence.heure_arrivee else None
+                'id': entry['presence_id'],
+                'statut': 'PRESENT',
+                'heure_arrivee': heure_arrivee.isoformat()
             }
         })
         
-    except Eleve.DoesNotExist:
-        return JsonResponse({'error': 'Élève non trouvé'}, status=404)
-    except SessionAppel.DoesNotExist:
-        return JsonResponse({'error': 'Session d\'appel non trouvée'}, status=404)
+    except json.JSONDecodeError:
+        return JsonResponse({'error': 'Données JSON invalides'}, status=400)
+    except SessionTerminee as e:
+        return JsonResponse({'error': str(e)}, status=404)
     except Exception as e:
         return JsonResponse({'error': f'Erreur: {str(e)}'}, status=500)
 
@@ -1842,67 +1769,58 @@ def api_mobile_checkin(request):
     """
     try:
         data = json.loads(request.body)
-        eleve_id = data.get('eleve_id')
         session_id = data.get('session_id')
         cours_id = data.get('cours_id')
         statut = data.get('statut', 'PRESENT')
         
-        # Récupérer les objets
-        eleve = get_object_or_404(Eleve, id=eleve_id)
-        session_appel = get_object_or_404(SessionAppel, id=session_id)
-        cours = get_object_or_404(Cours, id=cours_id)
+        try:
+            eleve_id = int(data.get('eleve_id'))
+        except (TypeError, ValueError):
+            return JsonResponse({'success': False, 'error': 'eleve_id invalide'}, status=400)
+        if statut not in dict(Presence.STATUT_CHOICES):
+            return JsonResponse({'success': False, 'error': 'Statut invalide'}, status=400)
+        
+        # Liste d'appel de la session (cache partagé, construite au démarrage)
+        roster = get_roster(session_id)
+        if roster is None:
+            return JsonResponse({
+                'success': False,
+                'error': 'Session d\'appel non trouvée ou terminée'
+            })
         
         # Vérifier la cohérence
-        if session_appel.cours != cours:
+        if str(roster['cours_id']) != str(cours_id):
             return JsonResponse({
                 'success': False,
                 'error': 'Session d\'appel invalide pour ce cours'
             })
         
-        # Mettre à jour ou créer la présence
-        presence, created = Presence.objects.get_or_create(
-            eleve=eleve,
-            session_appel=session_appel,
-            defaults={
-                'statut': statut,
-                'heure_arrivee': timezone.now(),
-                'methode_detection': 'QR_CODE'
-            }
-        )
-        
-        if not created:
-            # Mettre à jour une présence existante
-            presence.statut = statut
-            presence.heure_arrivee = timezone.now()
-            presence.methode_detection = 'QR_CODE'
-            presence.save()
+        entry = roster['eleves'].get(eleve_id)
+        if entry is None:
+            return JsonResponse({
+                'success': False,
+                'error': 'Élève non trouvé dans cette classe'
+            })
         
-        # Envoyer un email au parent selon le statut
-        from .email_service import ParentNotificationService
+        # Mettre à jour la présence
+        _, heure_arrivee = record_presence(roster, entry, statut=statut, methode='QR_CODE')
         
-        if statut == 'PRESENT':
-            # Envoyer un email de confirmation de présence
-            ParentNotificationService.send_presence_confirmation_email(presence.id)
-        elif statut == 'RETARD':
-            # Envoyer un email de notification de retard
-            ParentNotificationService.send_retard_notification_email(presence.id)
-        elif statut == 'ABSENT':
-            # Envoyer un email de notification d'absence
-            ParentNotificationService.send_absence_notification_email(presence.id)
+        # Récapitulatif au parent (envoyé par la commande dispatch_emails)
+        enqueue_parent_digest(entry.get('parent_id'), session_id, entry.get('recap_quotidien', False))
         
         return JsonResponse({
             'success': True,
-            'message': f'Présence confirmée pour {eleve.user.get_full_name()}',
-            'eleve_name': eleve.user.get_full_name(),
+            'message': f"Présence confirmée pour {entry['nom']}",
+            'eleve_name': entry['nom'],
             'statut': statut,
-            'heure_arrivee': presence.heure_arrivee.strftime('%H:%M')
+            'heure_arrivee': heure_arrivee.strftime('%H:%M') if heure_arrivee else None
         })
         
     except json.JSONDecodeError:
         return JsonResponse({
             'success': False,
             'error': 'Données JSON invalides'
-        })
+        }, status=400)
     except Exception as e:
         return JsonResponse({
             'success': False,
@@ -1976,28 +1894,18 @@ def api_check_session_updates(request):
             try:
                 last_check_time = timezone.datetime.fromisoformat(last_check.replace('Z', '+00:00'))
                 presences_query = presences_query.filter(
-                    updated_at__gt=last_check_time
+                    date_modification__gt=last_check_time
                 )
             except (ValueError, TypeError):
                 # Si le timestamp est invalide, ignorer le filtre
                 pass
         
         # Récupérer les présences mises à jour
-        presences = presences_query.select_related('eleve__user').order_by('-updated_at')
-        
-        updates = []
-        for presence in presences:
-            updates.append({
-                'eleve_id': presence.eleve.id,
-                'eleve_name': presence.eleve.user.get_full_name(),
-                'statut': presence.statut,
-                'heure_arrivee': presence.heure_arrivee.strftime('%H:%M') if presence.heure_arrivee else None,
-                'updated_at': presence.updated_at.isoformat()
-            })
+        presences = presences_query.select_related('eleve__user').order_by('-date_modification')
         
         return JsonResponse({
             'success': True,
-            'updates': updates,
+            'updates': [serialize_presence(presence) for presence in presences],
             'timestamp': timezone.now().isoformat()
         })
         
@@ -2008,6 +1916,28 @@ def api_check_session_updates(request):
         })
 
 
+@login_required
+def api_session_presences_stream(request, session_id):
+    """
+    Flux Server-Sent Events des présences modifiées d'une session d'appel
+    (voir school/live.py). Reprend après le curseur ``Last-Event-ID`` ou le
+    paramètre GET ``since``.
+    """
+    if request.user.role != 'ENSEIGNANT':
+        return JsonResponse({'error': 'Accès non autorisé'}, status=403)
+    
+    if not SessionAppel.objects.filter(id=session_id, enseignant__user=request.user).exists():
+        return JsonResponse({'error': 'Session d\'appel non trouvée'}, status=404)
+    
+    feed = PresenceFeed(session_id, request.headers.get('Last-Event-ID') or request.GET.get('since'))
+    # Sous ASGI, l'attente entre deux lectures n'occupe pas de thread
+    content = astream(feed) if isinstance(request, ASGIRequest) else stream(feed)
+    response = StreamingHttpResponse(content, content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
 @require_http_methods(["POST"])
 @csrf_exempt
 def api_notify_teacher_redirect(request):
@@ -2148,33 +2078,164 @@ def api_finish_call(request):
             return JsonResponse({'success': False, 'error': 'Paramètres manquants'}, status=400)
         
         # Récupérer la session d'appel
-        session_appel = get_object_or_404(SessionAppel, id=session_id)
+        session_appel = get_object_or_404(SessionAppel.objects.select_related('cours'), id=session_id)
         
         # Vérifier que la session correspond au cours
         if session_appel.cours.id != cours_id:
             return JsonResponse({'success': False, 'error': 'Session ne correspond pas au cours'}, status=400)
         
-        # Mettre à jour le statut de la session
-        session_appel.statut = 'TERMINE'
-        session_appel.date_fin = timezone.now()
-        session_appel.save()
-        
-        # Calculer les statistiques finales
-        presences = Presence.objects.filter(session_appel=session_appel)
-        present_count = presences.filter(statut='PRESENT').count()
-        retard_count = presences.filter(statut='RETARD').count()
-        absent_count = presences.filter(statut='ABSENT').count()
+        # Terminer la session, enregistrer l'historique et calculer les statistiques finales
+        stats = finalize_session(session_appel)
         
         return JsonResponse({
             'success': True,
             'message': 'Appel terminé avec succès',
-            'stats': {
-                'present': present_count,
-                'retard': retard_count,
-                'absent': absent_count,
-                'total': presences.count()
-            }
+            'stats': stats
+        })
+        
+    except Exception as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=500)
+
+
+@login_required
+def api_facial_recognition(request):
+    """
+    API de reconnaissance faciale : reçoit une image de la caméra et marque les élèves reconnus
+    
+    Formats acceptés :
+    - corps binaire image/jpeg (ou image/png), session_id en paramètre GET ou en-tête X-Session-Id
+    - multipart/form-data avec les champs image et session_id
+    - JSON {session_id, image} avec l'image en data URL base64 (ancien format)
+    
+    Une requête de plus de MAX_FRAME_SIZE octets est refusée (413) sans être lue.
+    """
+    if request.method != 'POST':
+        return JsonResponse({'success': False, 'error': 'Méthode non autorisée'}, status=405)
+    
+    if request.user.role != 'ENSEIGNANT':
+        return JsonResponse({'success': False, 'error': 'Accès non autorisé'}, status=403)
+    
+    from .recognition import get_engine, FrameDecodeError, FrameDropped, RecognitionUnavailable
+    from .recognition.config import get_setting
+    
+    try:
+        content_length = int(request.META.get('CONTENT_LENGTH') or 0)
+    except ValueError:
+        content_length = 0
+    if content_length > get_setting('MAX_FRAME_SIZE'):
+        return JsonResponse({'success': False, 'error': 'Image trop volumineuse'}, status=413)
+    
+    try:
+        if request.content_type.startswith('image/'):
+            # Image brute : décodée directement depuis le corps de la requête
+            session_id = request.GET.get('session_id') or request.headers.get('X-Session-Id')
+            image = request.body
+        elif request.content_type == 'multipart/form-data':
+            session_id = request.POST.get('session_id')
+            upload = request.FILES.get('image')
+            image = upload.read() if upload else None
+        else:
+            data = json.loads(request.body)
+            session_id = data.get('session_id')
+            image = data.get('image')
+        
+        if not session_id or not image:
+            return JsonResponse({'success': False, 'error': 'session_id et image requis'}, status=400)
+        
+        try:
+            session_id = uuid.UUID(str(session_id))
+        except ValueError:
+            return JsonResponse({'success': False, 'error': 'session_id invalide'}, status=400)
+        
+        session_appel = SessionAppel.objects.select_related('cours').filter(
+            id=session_id,
+            enseignant__user=request.user
+        ).first()
+        if session_appel is None:
+            return JsonResponse({'success': False, 'error': 'Session d\'appel introuvable'}, status=404)
+        
+        if session_appel.statut != 'EN_COURS':
+            return JsonResponse({'success': False, 'error': 'La session d\'appel est terminée'}, status=400)
+        
+        detected_faces = get_engine().recognize(session_appel, image)
+        recognized = [face for face in detected_faces if face['eleve_id']]
+        
+        return JsonResponse({
+            'success': True,
+            'total_faces': len(detected_faces),
+            'recognized': len(recognized),
+            'detected_faces': detected_faces,
+            'message': f'{len(recognized)} élève(s) reconnu(s)' if detected_faces else 'Aucun visage détecté',
+            # Largeur d'image utilisée par le détecteur : le client peut réduire ses images à cette taille
+            'frame_width': get_setting('DETECTION_WIDTH'),
         })
         
+    except json.JSONDecodeError:
+        return JsonResponse({'success': False, 'error': 'Données JSON invalides'}, status=400)
+    except RequestDataTooBig:
+        # Corps sans Content-Length dépassant DATA_UPLOAD_MAX_MEMORY_SIZE
+        return JsonResponse({'success': False, 'error': 'Image trop volumineuse'}, status=413)
+    except FrameDecodeError as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=400)
+    except FrameDropped as e:
+        # Image ignorée : la suivante sera analysée
+        return JsonResponse({
+            'success': True,
+            'dropped': True,
+            'total_faces': 0,
+            'detected_faces': [],
+            'message': str(e)
+        })
+    except RecognitionUnavailable as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=503)
     except Exception as e:
+        logger.error(f'Erreur lors de la reconnaissance faciale: {str(e)}')
         return JsonResponse({'success': False, 'error': str(e)}, status=500)
+
+
+@login_required
+def api_facial_recognition_stats(request):
+    """API des compteurs de la chaîne de reconnaissance faciale (processus courant)"""
+    if request.user.role != 'ADMIN':
+        return JsonResponse({'success': False, 'error': 'Accès non autorisé'}, status=403)
+    
+    from .recognition import get_engine
+    
+    engine = get_engine()
+    stats = engine.stats.snapshot()
+    frames = stats.get('frames', 0)
+    skipped = stats.get('motion_skipped', 0) + stats.get('no_face_skipped', 0)
+    
+    return JsonResponse({
+        'success': True,
+        'pid': os.getpid(),
+        'embedder': engine.embedder.name,
+        'stats': stats,
+        'embedding_skip_rate': round(skipped / frames, 3) if frames else 0.0,
+        'reference_cache': {
+            'classes': len(engine.references),
+            'hits': engine.references.hits,
+            'misses': engine.references.misses,
+        }
+    })
+
+
+@login_required
+@cache_control(private=True, max_age=31536000, immutable=True)
+@etag(lambda request, key: f'"{key}"')
+def qr_code_image(request, key):
+    """
+    Image PNG d'un QR code d'élève, par clé de contenu (voir school/qrcodes.py).
+
+    Une clé désigne toujours la même image : la réponse est immuable et le
+    navigateur la revalide par ETag sans qu'aucun rendu ni requête SQL ne
+    soit fait.
+    """
+    from .qrcodes import KEY_PATTERN, cached_png
+
+    if not KEY_PATTERN.match(key):
+        raise Http404
+    png = cached_png(key)
+    if png is None:
+        raise Http404
+    return HttpResponse(png, content_type='image/png')